@@ -0,0 +1,336 @@
+# backend/assetcache.py
+from __future__ import annotations
+import base64
+import hashlib
+import io
+import mimetypes
+import os
+import struct
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+from assetpack import AssetPack, variant_key
+from workpool import single_flight
+
+try:  # optioneel: zonder Pillow geen verkleinde varianten, dan gaat altijd het origineel mee
+    from PIL import Image as PILImage
+except ImportError:  # pragma: no cover
+    PILImage = None
+
+# Gedeelde asset-cache voor load_pngs_as_b64 (protocol.py) en read_asset_b64 (backend.py).
+# Sleutel is het pad; per entry bewaren we de ruwe bytes, de content-hash en de
+# base64-string. Bij elke lookup checken we mtime/size via os.stat zodat een
+# gewijzigd bestand automatisch opnieuw wordt ingelezen. Grootte wordt begrensd in bytes (LRU).
+# Grote PNG's (Start.png, Error.png) krijgen daarnaast verkleinde varianten per breedteklasse
+# (VARIANT_WIDTHS); die staan in dezelfde cache onder "<pad>@<breedte>" en verlopen mee met het origineel.
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# breedteklassen voor varianten; kleinere bestanden dan VARIANT_MIN_BYTES gaan altijd origineel
+VARIANT_WIDTHS: Tuple[int, ...] = (320, 640, 960, 1280, 1600, 1920, 2560)
+VARIANT_MIN_BYTES = int(os.getenv("ASSET_VARIANT_MIN_BYTES", str(256 * 1024)))
+# een variant moet echt schelen (anders het origineel, dat de client misschien al heeft)
+VARIANT_MAX_RATIO = 0.9
+
+
+class AssetEntry:
+    """Eén ingelezen asset: bytes + base64 + content-hash + mime.
+    Uit een asset-pack (assetpack.py): `data` is een memoryview op de gedeelde mmap en de
+    base64 wordt pas bij eerste gebruik een str, in dit proces (digest staat al in de pack)."""
+    __slots__ = ("name", "path", "mtime_ns", "size", "digest", "mime", "data", "_b64", "_b64_raw", "variant")
+
+    def __init__(self, name: str, path: Path, mtime_ns: int, size: int, data: bytes, variant: int = 0,
+                 digest: Optional[str] = None, b64_raw: Optional[memoryview] = None):
+        # mtime_ns/size zijn altijd die van het bronbestand; variant = breedteklasse (0 = origineel)
+        self.name = name
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.data = data
+        self.variant = variant
+        self.digest = digest or hashlib.sha256(data).hexdigest()[:16]
+        mime, _ = mimetypes.guess_type(name)
+        self.mime = mime or "application/octet-stream"
+        self._b64_raw = b64_raw
+        self._b64 = base64.b64encode(data).decode("ascii") if b64_raw is None else None
+
+    @property
+    def b64(self) -> str:
+        if self._b64 is None:
+            self._b64 = str(self._b64_raw, "ascii")
+        return self._b64
+
+    @property
+    def shared(self) -> bool:
+        return self._b64_raw is not None
+
+    @property
+    def nbytes(self) -> int:
+        # uit de pack: de ruwe bytes zijn page cache (gedeeld), de base64-str is van dit proces
+        if self._b64_raw is not None:
+            return len(self._b64_raw)
+        return len(self.data) + len(self._b64)
+
+
+class AssetCache:
+    """Thread-safe LRU-cache van AssetEntry's, begrensd op totaal aantal bytes."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, AssetEntry]" = OrderedDict()
+        # (naam, content-hash) -> (cache-key, breedteklasse) van elke entry die we ooit uitgaven; blijft
+        # staan na LRU-eviction (zie issued), verdwijnt pas als het bestand zelf verandert
+        self._by_digest: Dict[Tuple[str, str], Tuple[str, int]] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # varianten die niet kleiner werden dan het origineel: key -> (mtime_ns, size) van de bron
+        self._no_gain: Dict[str, Tuple[int, int]] = {}
+        # multi-worker: gedeelde read-only pack (attach_pack)
+        self._pack: Optional[AssetPack] = None
+
+    def attach_pack(self, pack: AssetPack) -> None:
+        """Assets voortaan eerst uit de gedeelde pack halen. Entries daaruit staan gewoon in de LRU
+        en tellen mee voor het budget met hun base64 (die per proces een str wordt); de ruwe bytes
+        blijven in de page cache. Gewijzigde bestanden worden gewoon gelezen."""
+        with self._lock:
+            self._pack = pack
+
+    def get(self, assets_dir: Path, name: str) -> AssetEntry:
+        """Geef de (verse) entry voor assets_dir/name; leest alleen van schijf bij miss of wijziging."""
+        path = assets_dir / name
+        key = str(path)
+        st = os.stat(path)  # FileNotFoundError bubbelt door naar de caller
+        with self._lock:
+            e = self._entries.get(key)
+            if e is not None and e.mtime_ns == st.st_mtime_ns and e.size == st.st_size:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return e
+            e = self._from_pack(key, name, st.st_mtime_ns, st.st_size)
+            if e is not None:
+                self.hits += 1
+                return e
+            self.misses += 1
+
+        e = AssetEntry(name, path, st.st_mtime_ns, st.st_size, path.read_bytes())
+        with self._lock:
+            self._put(key, e)
+        return e
+
+    def peek(self, assets_dir: Path, name: str) -> Optional[AssetEntry]:
+        """Verse gecachte entry zonder te lezen (alleen os.stat); None bij miss of wijziging."""
+        path = assets_dir / name
+        st = os.stat(path)
+        with self._lock:
+            e = self._entries.get(str(path))
+            if e is not None and e.mtime_ns == st.st_mtime_ns and e.size == st.st_size:
+                self._entries.move_to_end(str(path))
+                self.hits += 1
+                return e
+            e = self._from_pack(str(path), name, st.st_mtime_ns, st.st_size)
+            if e is not None:
+                self.hits += 1
+            return e
+
+    def get_variant(self, assets_dir: Path, name: str, width: int) -> AssetEntry:
+        """Variant van assets_dir/name met breedte `width` (lazy gebouwd, gecachet).
+        Zonder Pillow, bij een niet-PNG of als de variant nauwelijks kleiner uitvalt: het origineel."""
+        orig = self.get(assets_dir, name)
+        if PILImage is None or width <= 0:
+            return orig
+        key = f"{orig.path}@{width}"
+        with self._lock:
+            e = self._entries.get(key)
+            if e is not None and e.mtime_ns == orig.mtime_ns and e.size == orig.size:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return e
+            if self._no_gain.get(key) == (orig.mtime_ns, orig.size):
+                return orig
+            e = self._from_pack(key, variant_key(name, width), orig.mtime_ns, orig.size)
+            if e is not None:
+                self.hits += 1
+                return e
+            if orig.shared and self._pack.meta(variant_key(name, width)) == {"alias": name}:
+                return orig  # supervisor vond deze variant al niet kleiner
+            self.misses += 1
+
+        data = _resize_png(orig.data, width)
+        if data is None or len(data) > orig.size * VARIANT_MAX_RATIO:
+            with self._lock:
+                self._no_gain[key] = (orig.mtime_ns, orig.size)
+            return orig
+        e = AssetEntry(orig.name, orig.path, orig.mtime_ns, orig.size, data, variant=width)
+        with self._lock:
+            self._put(key, e)
+        return e
+
+    def best_fit(self, assets_dir: Path, name: str, box_w: float, box_h: float) -> AssetEntry:
+        """Kleinste variant die een box van box_w x box_h (device-)pixels dekt; anders het origineel."""
+        orig = self.get(assets_dir, name)
+        if PILImage is None or orig.size < VARIANT_MIN_BYTES:
+            return orig
+        dims = png_size(orig.data)
+        if dims is None:
+            return orig
+        width = size_class(dims[0], dims[1], box_w, box_h)
+        return orig if width is None else self.get_variant(assets_dir, name, width)
+
+    def lookup(self, name: str, digest: str) -> Optional[AssetEntry]:
+        """Zoek een gecachte entry op (bestandsnaam, content-hash), zonder schijf-I/O."""
+        with self._lock:
+            hit = self._by_digest.get((name, digest))
+            e = self._entries.get(hit[0]) if hit is not None else None
+            return e if e is not None and e.digest == digest else None
+
+    def issued(self, name: str, digest: str, width: int) -> bool:
+        """Hoort (naam, content-hash, breedteklasse) bij een entry die deze cache (of de gedeelde pack)
+        ooit uitgaf, ook als die inmiddels uit de LRU is? Zo niet, dan is opnieuw bouwen zinloos."""
+        with self._lock:
+            hit = self._by_digest.get((name, digest))
+            if hit is not None:
+                return hit[1] == width
+            return self._pack is not None and self._pack.variant_of(name, digest) == width
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_digest.clear()
+            self._no_gain.clear()
+            self._bytes = 0
+
+    def entries(self) -> Iterable[AssetEntry]:
+        """Snapshot van alle gecachte entries (originelen + varianten), bv. voor write_pack."""
+        with self._lock:
+            return list(self._entries.values())
+
+    def no_gain_keys(self) -> Iterable[Tuple[str, str]]:
+        """(pack-key, naam) van varianten die het origineel bleven (aliassen in de pack)."""
+        with self._lock:
+            keys = list(self._no_gain)
+        out = []
+        for key in keys:
+            path, _, width = key.rpartition("@")
+            name = Path(path).name
+            out.append((variant_key(name, int(width)), name))
+        return out
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses,
+                    "shared": sum(1 for e in self._entries.values() if e.shared)}
+
+    # ---- intern (lock moet vastgehouden worden) ----
+    def _from_pack(self, key: str, pack_key: str, mtime_ns: int, size: int) -> Optional[AssetEntry]:
+        if self._pack is None:
+            return None
+        meta = self._pack.meta(pack_key)
+        if meta is None or "alias" in meta or meta["mtime_ns"] != mtime_ns or meta["size"] != size:
+            return None
+        e = AssetEntry(meta["name"], Path(key.rpartition("@")[0] if meta["variant"] else key),
+                       mtime_ns, size, self._pack.data(meta), variant=meta["variant"],
+                       digest=meta["digest"], b64_raw=self._pack.b64(meta))
+        self._put(key, e)
+        return e
+
+    def _put(self, key: str, e: AssetEntry) -> None:
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old.nbytes
+            if old.digest != e.digest:
+                self._by_digest.pop((old.name, old.digest), None)  # bestand gewijzigd: oude URL's verlopen
+        self._by_digest[(e.name, e.digest)] = (key, e.variant)
+        if e.nbytes > self.max_bytes:
+            return  # te groot om te cachen; caller krijgt 'm wel terug
+        self._entries[key] = e
+        self._bytes += e.nbytes
+        while self._bytes > self.max_bytes and self._entries:
+            _, victim = self._entries.popitem(last=False)
+            self._bytes -= victim.nbytes
+
+
+def png_size(data: bytes) -> Optional[Tuple[int, int]]:
+    """(breedte, hoogte) uit de IHDR-chunk, zonder te decoderen; None als het geen PNG is."""
+    if len(data) < 24 or data[:8] != b"\x89PNG\r\n\x1a\n" or data[12:16] != b"IHDR":
+        return None
+    return struct.unpack(">II", data[16:24])
+
+
+def size_class(orig_w: int, orig_h: int, box_w: float, box_h: float) -> Optional[int]:
+    """Kleinste breedteklasse waarvan de (proportioneel geschaalde) afbeelding de box dekt;
+    None als geen klasse kleiner is dan het origineel (dan gaat het origineel mee)."""
+    if orig_w <= 0 or orig_h <= 0:
+        return None
+    need_w = max(box_w, box_h * orig_w / orig_h)
+    for width in VARIANT_WIDTHS:
+        if width >= orig_w:
+            return None
+        if width >= need_w:
+            return width
+    return None
+
+
+def _resize_png(data: bytes, width: int) -> Optional[bytes]:
+    try:
+        with PILImage.open(io.BytesIO(data)) as im:
+            if width >= im.width:
+                return None
+            if im.mode not in ("RGB", "RGBA", "L", "LA"):
+                im = im.convert("RGBA")
+            height = max(1, round(im.height * width / im.width))
+            out = io.BytesIO()
+            im.resize((width, height), PILImage.LANCZOS).save(out, format="PNG", compress_level=6)
+            return out.getvalue()
+    except Exception:
+        return None  # kapotte/onbekende afbeelding: origineel blijft bruikbaar
+
+
+# Eén gedeelde cache voor het hele proces
+ASSET_CACHE = AssetCache(int(os.getenv("ASSET_CACHE_BYTES", str(DEFAULT_MAX_BYTES))))
+
+
+def get_asset(assets_dir: Path, name: str) -> AssetEntry:
+    return ASSET_CACHE.get(assets_dir, name)
+
+
+async def aget_asset(assets_dir: Path, name: str) -> AssetEntry:
+    """get_asset zonder de event loop te blokkeren: cache-hit direct, inlezen + base64 in de
+    thread-pool (workpool.py), gelijktijdige misses op hetzelfde bestand maar één keer."""
+    e = ASSET_CACHE.peek(assets_dir, name)
+    if e is not None:
+        return e
+    return await single_flight(("asset", str(assets_dir / name)), ASSET_CACHE.get, assets_dir, name)
+
+
+async def abest_fit(assets_dir: Path, name: str, box_w: float, box_h: float) -> AssetEntry:
+    """best_fit via de thread-pool (schalen met Pillow kan honderden ms kosten)."""
+    e = ASSET_CACHE.peek(assets_dir, name)
+    if e is not None and (PILImage is None or e.size < VARIANT_MIN_BYTES):
+        return e  # krijgt nooit een variant
+    return await single_flight(("fit", str(assets_dir / name), box_w, box_h),
+                               ASSET_CACHE.best_fit, assets_dir, name, box_w, box_h)
+
+
+def prewarm(assets_dir: Path, widths: Iterable[int] = VARIANT_WIDTHS) -> int:
+    """Alle grote PNG's + hun varianten alvast in de cache zetten (startup); geeft het aantal varianten."""
+    n = 0
+    for path in sorted(assets_dir.glob("*.png")):
+        try:
+            orig = ASSET_CACHE.get(assets_dir, path.name)
+        except OSError:
+            continue
+        dims = png_size(orig.data)
+        if PILImage is None or dims is None or orig.size < VARIANT_MIN_BYTES:
+            continue
+        for width in widths:
+            if width < dims[0] and ASSET_CACHE.get_variant(assets_dir, path.name, width) is not orig:
+                n += 1
+    return n
+
+
+__all__ = ["AssetEntry", "AssetCache", "ASSET_CACHE", "VARIANT_WIDTHS", "get_asset", "aget_asset", "abest_fit",
+           "png_size", "size_class", "prewarm"]
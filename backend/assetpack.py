@@ -0,0 +1,96 @@
+# backend/assetpack.py
+from __future__ import annotations
+import json
+import mmap
+import os
+import struct
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+# Read-only asset-pack voor multi-worker mode (workers.py). De supervisor leest alle assets
+# (+ verkleinde varianten) één keer in en schrijft ze met hun base64 naar één bestand; elke
+# worker mmapt dat bestand. Ruwe bytes gaan als memoryview naar binary frames/HTTP (geen kopie,
+# gedeeld via de page cache). De base64 staat erin zodat workers niet opnieuw encoden of schalen,
+# maar wordt per worker een str zodra de inline/asset-transport hem in een JSON-antwoord zet; die
+# strings tellen mee voor het LRU-budget van de worker (ASSET_CACHE_BYTES), dus dat deel van het
+# geheugen groeit wel met het aantal workers, begrensd per worker.
+#
+#   b"APAK" | u32 len(index) | index (JSON) | blobs
+#   index: {key: {name, mtime_ns, size, digest, mime, variant, off, len, b64_off, b64_len}}
+#          key = bestandsnaam, of "<naam>@<breedte>" voor een variant;
+#          {"alias": naam} = variant die niet kleiner was, gebruik het origineel.
+
+PACK_MAGIC = b"APAK"
+
+
+def variant_key(name: str, width: int) -> str:
+    return f"{name}@{width}" if width else name
+
+
+def write_pack(path: Path, entries: Iterable[Any], aliases: Iterable[Tuple[str, str]] = ()) -> int:
+    """AssetEntry's (+ aliassen key -> naam) naar `path` schrijven (atomisch); geeft de grootte."""
+    index: Dict[str, Dict[str, Any]] = {}
+    blobs = []
+    off = 0
+    for e in entries:
+        b64 = e.b64.encode("ascii")
+        index[variant_key(e.name, e.variant)] = {
+            "name": e.name, "mtime_ns": e.mtime_ns, "size": e.size, "digest": e.digest,
+            "mime": e.mime, "variant": e.variant,
+            "off": off, "len": len(e.data), "b64_off": off + len(e.data), "b64_len": len(b64),
+        }
+        blobs += [bytes(e.data), b64]
+        off += len(e.data) + len(b64)
+    for key, name in aliases:
+        index.setdefault(key, {"alias": name})
+    head = json.dumps(index).encode("utf-8")
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".apak-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(PACK_MAGIC + struct.pack("!I", len(head)) + head)
+        for b in blobs:
+            f.write(b)
+    os.replace(tmp, path)
+    return 8 + len(head) + off
+
+
+class AssetPack:
+    """Gemapte pack; slices zijn zero-copy memoryviews op het (gedeelde) page-cache geheugen."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:4] != PACK_MAGIC:
+            raise ValueError(f"not an asset pack: {path}")
+        (n,) = struct.unpack("!I", self._mm[4:8])
+        self._index: Dict[str, Dict[str, Any]] = json.loads(self._mm[8:8 + n])
+        self._base = 8 + n
+        self._view = memoryview(self._mm)
+        # (naam, content-hash) -> breedteklasse, voor /assets (AssetCache.issued)
+        self._digests: Dict[Tuple[str, str], int] = {
+            (m["name"], m["digest"]): m["variant"] for m in self._index.values() if "alias" not in m}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def meta(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._index.get(key)
+
+    def variant_of(self, name: str, digest: str) -> Optional[int]:
+        """Breedteklasse van de entry met deze naam en content-hash (0 = origineel), of None."""
+        return self._digests.get((name, digest))
+
+    def data(self, meta: Dict[str, Any]) -> memoryview:
+        start = self._base + meta["off"]
+        return self._view[start:start + meta["len"]]
+
+    def b64(self, meta: Dict[str, Any]) -> memoryview:
+        start = self._base + meta["b64_off"]
+        return self._view[start:start + meta["b64_len"]]
+
+
+__all__ = ["PACK_MAGIC", "AssetPack", "write_pack", "variant_key"]
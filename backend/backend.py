@@ -3,162 +3,474 @@ import asyncio
 import logging
 import os
 import json
-import base64
-import mimetypes
+import time
 from pathlib import Path
-from typing import Optional, Tuple, List, Union
+from typing import Optional, Tuple, List
+from urllib.parse import parse_qs, quote, unquote, urlsplit
 
 import websockets
 from websockets.server import WebSocketServerProtocol
 
 # Protocol / Handlers
-from protocol import MessageType, Message
+from protocol import MessageType, Message, ErrorReply, error_reply, pack_asset_frame_header, adumps
 from handlers import registry  # central registry: MessageType -> async handler
+from assetcache import ASSET_CACHE, VARIANT_WIDTHS, get_asset, aget_asset, abest_fit, prewarm, AssetEntry
+from connstate import state_for, session_of, parse_asset_report, parse_dpr, TRANSPORTS, FORMATS
+from sessions import UnknownSession, parse_session_id
+from simstream import parse_stream
+from viewcache import ViewResponse
+from compact import encode_message as encode_compact
+from scenediff import diff_scene, scene_of, is_scene_type, SCENE_KEYS
+from scheduler import ConnectionScheduler
+import metrics
+import msglog
+import sessions
+import simpool
+import workpool
+from workpool import BIG_DUMPS_BYTES
 
 # ---------- logging ----------
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s %(name)s | %(message)s",
-)
+# via een queue en een achtergrondthread; per-message regels gesampled (msglog.py)
+msglog.setup()
 log = logging.getLogger("alignment-backend")
 
 BASE_DIR = Path(__file__).parent
 ASSETS_DIR = BASE_DIR / "assets"  # afbeeldingen voor asset-requests
 
 # ---------- helpers ----------
-def read_asset_b64(name: str):
-    """Lees een asset uit backend/assets en geef (data_b64, mime) terug."""
+def _safe_asset(name: str) -> AssetEntry:
+    """Asset uit backend/assets via de gedeelde cache (zie assetcache.py), zonder path traversal."""
     f = (ASSETS_DIR / name)
     # sandboxing: geen path traversal
-    if not str(f.resolve()).startswith(str(ASSETS_DIR.resolve())):
+    if not f.resolve().is_relative_to(ASSETS_DIR.resolve()) or not f.is_file():
+        raise FileNotFoundError("forbidden path")
+    return get_asset(ASSETS_DIR, name)
+
+def read_asset_b64(name: str):
+    """Lees een asset uit backend/assets en geef (data_b64, mime) terug."""
+    entry = _safe_asset(name)
+    return entry.b64, entry.mime
+
+async def aread_asset_b64(name: str):
+    """read_asset_b64 zonder de event loop te blokkeren (cache-miss: lezen + base64 in de pool)."""
+    f = ASSETS_DIR / name
+    if not f.resolve().is_relative_to(ASSETS_DIR.resolve()) or not f.is_file():
         raise FileNotFoundError("forbidden path")
-    data = f.read_bytes()
-    mime, _ = mimetypes.guess_type(f.name)
-    return base64.b64encode(data).decode("ascii"), (mime or "application/octet-stream")
+    entry = await aget_asset(ASSETS_DIR, name)
+    return entry.b64, entry.mime
+
+def asset_url(entry: AssetEntry) -> str:
+    """Content-hashed URL waaronder process_request de asset serveert (immutable cachebaar)."""
+    url = f"/assets/{entry.digest}/{quote(entry.name)}"
+    return f"{url}?w={entry.variant}" if entry.variant else url
 
 # ---------- message handling ----------
-async def handle_text_message(text: str, *, ws: Optional[WebSocketServerProtocol]=None) -> str:
+async def handle_text_message(text: str, *, ws: Optional[WebSocketServerProtocol]=None,
+                              frames: Optional[List[AssetEntry]]=None) -> str:
     """DUNNE DISPATCH:
     a) JSON parsen → messagetype ophalen
     b) handler opzoeken → aanroepen met payload
     c) antwoord serialiseren → JSON string terug
     Overige: ping/asset blijven hier voor eenvoud.
+    Geeft de caller een `frames`-lijst mee en koos de client binary transport (hello),
+    dan gaan de PNG's daarin (als binary frames te versturen) i.p.v. base64 in de JSON.
     """
     # 1) JSON parse
     try:
         msg = json.loads(text)
     except json.JSONDecodeError:
-        return json.dumps({"type": "error", "error": "invalid json"})
+        return error_reply("invalid json")
+    return await handle_message(msg, ws=ws, frames=frames)
+
+async def handle_message(msg, *, ws: Optional[WebSocketServerProtocol]=None,
+                         frames: Optional[List[AssetEntry]]=None) -> str:
+    """Zelfde als handle_text_message, maar voor een al geparste request (scheduler.py parst
+    zelf om SHOW*-requests te herkennen). Per-verbinding state wordt pas bijgewerkt nadat de
+    handler klaar is, zodat een gecancelde build (nieuwere view) niets achterlaat."""
+    if msg is None:
+        metrics.count("invalid", error=True)
+        return error_reply("invalid json")
+    if not isinstance(msg, dict):
+        metrics.count("invalid", error=True)
+        return error_reply("invalid message")
 
     # 2) eenvoudige non-game types
     t = (msg.get("type") or "").lower()
+    if t in ("ping", "hello", "asset"):
+        metrics.count(t)
     if t == "ping":
         return json.dumps({"type": "pong"})
+    if t == "hello":
+        # client meldt bij connect welke assets (filename -> hash) hij al heeft
+        # hoe hij PNG's wil ontvangen ("transport") en in welk wire-format de scène ("format")
+        st = state_for(ws)
+        st.known_assets = parse_asset_report(msg.get("assets"))
+        if msg.get("transport") in TRANSPORTS:
+            st.transport = msg["transport"]
+        if msg.get("format") in FORMATS:
+            st.format = msg["format"]
+        if "diff" in msg:
+            st.diff = bool(msg["diff"])
+            st.last_scene = st.last_view = None
+        if "dpr" in msg:
+            st.dpr = parse_dpr(msg["dpr"], st.dpr)
+        if "stream" in msg:
+            st.stream = parse_stream(msg["stream"], st.stream)
+        # sessie: de client bewaart het id (ook een door ons gekozen id) en stuurt het bij reconnect mee;
+        # "resumed": false = die sessie was verlopen (of nooit gezien) en begint opnieuw op dag 0
+        requested = parse_session_id(msg.get("session"))
+        resumed = False
+        if requested is not None:
+            st.session = requested
+            resumed = sessions.registry().create(requested)
+        # debuggen: "debug": "<LOG_DEBUG_TOKEN>" logt deze sessie volledig, "debug": false zet het weer uit
+        if msg.get("debug") is False:
+            msglog.trace(session_of(ws), False)
+        elif "debug" in msg and msglog.debug_allowed(msg["debug"]):
+            msglog.trace(session_of(ws))
+        return json.dumps({"type": "hello", "transport": st.transport, "format": st.format, "diff": st.diff,
+                           "dpr": st.dpr, "session": session_of(ws), "resumed": resumed,
+                           "stream": st.stream is not None, "debug": msglog.traced(session_of(ws))})
     if t == "asset":
         name = msg.get("name")
         if not name:
-            return json.dumps({"type": "error", "error": "missing name"})
+            return error_reply("missing name")
         try:
-            b64, mime = read_asset_b64(name)
-            return json.dumps({"type": "asset", "name": name, "mime": mime, "data_b64": b64})
+            b64, mime = await aread_asset_b64(name)
+            return await adumps({"type": "asset", "name": name, "mime": mime, "data_b64": b64}, len(b64))
         except FileNotFoundError:
-            return json.dumps({"type": "error", "error": f"asset not found: {name}"})
+            return error_reply(f"asset not found: {name}")
         except Exception as e:
             log.exception("asset error")
-            return json.dumps({"type": "error", "error": f"asset error: {e}"})
+            return error_reply(f"asset error: {e}")
 
     # 3) Centrale dispatch voor game messages
     mt_raw = msg.get("messagetype")
     if not mt_raw:
-        return json.dumps({"type": "error", "error": "missing messagetype"})
+        metrics.count("invalid", error=True)
+        return error_reply("missing messagetype")
     try:
         mt = MessageType(mt_raw)
     except Exception:
-        return json.dumps({"type": "error", "error": f"unknown messagetype: {mt_raw}"})
+        metrics.count("invalid", error=True)
+        return error_reply(f"unknown messagetype: {mt_raw}")
 
     handler = registry.get(mt)
     if not handler:
-        return json.dumps({"type": "error", "error": f"no handler for messagetype: {mt.value}"})
+        metrics.count(mt.value, error=True)
+        return error_reply(f"no handler for messagetype: {mt.value}")
 
     # Payload (conventies)
     numbers = msg.get("numbers") or []
     texts = msg.get("texts") or []
+    if "assets" in msg:
+        # client mag per request zijn imageCache melden; handlers laten die PNG's dan weg
+        state_for(ws).known_assets = parse_asset_report(msg.get("assets"))
+    full = bool(msg.get("full"))  # diff-mode: client vraagt expliciet de hele scène
 
     # 4) Execute handler with strict error boundary
+    t0 = time.perf_counter()
     try:
         result = await handler(ws, numbers=numbers, texts=texts, assets_dir=ASSETS_DIR)
+    except UnknownSession as e:
+        # verlopen sessie (TTL/LRU): geen crash, de client begint opnieuw (hello zonder session of reset)
+        text = error_reply(str(e))
+        metrics.record(mt.value, time.perf_counter() - t0, 0.0, len(text), error=True)
+        return text
     except Exception as e:
         log.exception("handler %s crashed", mt.value)
-        return json.dumps({"type": "error", "error": f"handler error in {mt.value}: {e}"})
+        text = error_reply(f"handler error in {mt.value}: {e}")
+        metrics.record(mt.value, time.perf_counter() - t0, 0.0, len(text), error=True)
+        return text
+
+    # 5) Serialize; handler- en serialisatietijd en omvang per type naar metrics.py
+    t1 = time.perf_counter()
+    n_frames = len(frames) if frames is not None else 0
+    text = await _serialize(result, mt, ws, frames, full)
+    nbytes = len(text) + (sum(len(e.data) for e in frames[n_frames:]) if frames else 0)
+    metrics.record(mt.value, t1 - t0, time.perf_counter() - t1, nbytes, error=isinstance(text, ErrorReply))
+    return text
 
-    # 5) Serialize (zonder .to_json referentie)
+
+async def _serialize(result, mt: MessageType, ws, frames: Optional[List[AssetEntry]], full: bool) -> str:
+    """Handler-resultaat -> JSON-tekst (+ PNG's in `frames` bij binary transport).
+    Zwaar werk (varianten, grote dumps) gaat via de thread-pool; de per-verbinding state
+    (known_assets, diff-scène) wordt pas na de laatste await bijgewerkt (zie scheduler.py)."""
+    st = state_for(ws)
+    if isinstance(result, ViewResponse):
+        # gecachte view: geometrie is al JSON, alleen numbers/texts + PNG-velden erbij plakken
+        tail = {"png_payloads": result.png_payloads}
+        entries = await _fit_entries(result.png_payloads, result.view.scene["images"], st.dpr)
+        hashes = _deliver_png_payloads(tail, ws, frames, entries)
+        patch_json = None
+        diffed = ws is not None and st.diff and is_scene_type(result.view.messagetype)
+        if diffed and st.last_scene is not None and not full:
+            patch_json = result.view.patch_json_from(st.last_view, st.last_scene)
+            if len(patch_json) >= len(result.view.fragment(st.format)):
+                patch_json = None  # bijna alles anders (bv. na SHOWSTART): hele scène is kleiner
+        size = _payload_bytes(tail)
+        if size >= BIG_DUMPS_BYTES:
+            text = await workpool.run(result.to_json, tail, st.format, patch_json)
+        else:
+            text = result.to_json(tail, st.format, patch_json)
+        _commit(st, ws, hashes, (result.view.scene, result.view) if diffed else None)
+        return text
     if isinstance(result, Message):
         # Message uit protocol.py heeft to_jsonable()
         try:
-            return json.dumps(result.to_jsonable())
+            resp = result.to_jsonable()
         except Exception:
             # Fallback: serialize dataclass
             from dataclasses import asdict
-            return json.dumps(asdict(result))
+            resp = asdict(result)
     elif isinstance(result, dict):
         # Legacy handlers die al een jsonable dict teruggeven
-        return json.dumps(result)
+        resp = result
     else:
-        return json.dumps({"type": "error", "error": f"invalid handler return for {mt.value}"})
+        return error_reply(f"invalid handler return for {mt.value}")
+
+    entries = await _fit_entries(resp.get("png_payloads") or {}, resp.get("images") or [], st.dpr)
+    hashes = _deliver_png_payloads(resp, ws, frames, entries)
+    size = _payload_bytes(resp)
+    full_text = await adumps(encode_compact(resp) if st.format == "compact" else resp, size)
+    if ws is None or not (st.diff and is_scene_type(mt.value)):
+        _commit(st, ws, hashes, None)
+        return full_text
+    scene = scene_of(resp)
+    prev = st.last_scene
+    text = full_text
+    if prev is not None and not full:
+        # alleen de verschillen met de vorige scène; overige velden blijven staan
+        patched = {}
+        for k, v in resp.items():
+            if k == "rectangles":
+                patched["patch"] = diff_scene(prev, scene)
+            if k not in SCENE_KEYS:
+                patched[k] = v
+        patched_text = await adumps(patched, size)
+        if len(patched_text) < len(full_text):
+            text = patched_text
+    _commit(st, ws, hashes, (scene, None))
+    return text
+
+
+def _commit(st, ws, hashes: dict, scene) -> None:
+    """Per-verbinding state bijwerken zodra het antwoord klaar is (geen await meer tot het versturen):
+    de client heeft nu deze PNG's en, in diff-mode, deze scène (+ PreparedView of None)."""
+    if ws is None:
+        return
+    st.known_assets.update(hashes)
+    if scene is not None:
+        st.last_scene, st.last_view = scene
+
+def _payload_bytes(resp: dict) -> int:
+    return sum(len(v) for v in (resp.get("png_payloads") or {}).values())
+
+def _deliver_png_payloads(resp: dict, ws, frames: Optional[List[AssetEntry]], entries: dict) -> dict:
+    """Zet per meegestuurde PNG de content-hash erbij; geeft {filename: hash} terug om na het
+    serialiseren als 'heeft de client nu' te onthouden (_commit).
+    `entries` (zie _fit_entries) is per PNG de kleinste variant die de grootste Image-box (x dpr van
+    de client) dekt; staat die variant al bij de client, dan valt de PNG weg.
+    In binary mode verhuizen de PNG's van de JSON naar `frames` (ruwe bytes, geen base64),
+    in url mode krijgt de client alleen `png_urls` (HTTP, browser/CDN-cache)."""
+    st = state_for(ws)
+    if ws is not None:
+        entries = {fn: e for fn, e in entries.items() if st.known_assets.get(fn) != e.digest}
+    hashes = {fn: e.digest for fn, e in entries.items()}
+    resp["png_hashes"] = hashes
+    resp["png_payloads"] = {fn: e.b64 for fn, e in entries.items()}
+    if ws is None:
+        return hashes
+    if frames is not None and st.transport == "binary" and entries:
+        frames.extend(entries.values())
+        resp["png_payloads"] = {}
+    elif st.transport == "url" and entries:
+        resp["png_urls"] = {fn: asset_url(e) for fn, e in entries.items()}
+        resp["png_payloads"] = {}
+    return hashes
+
+async def _fit_entries(payloads: dict, images: List[dict], dpr: float) -> dict:
+    """filename -> AssetEntry (variant of origineel) voor de PNG's in `payloads`."""
+    boxes = {}
+    for im in images:
+        fn = im.get("filename")
+        if fn in payloads:
+            bw, bh = boxes.get(fn, (0.0, 0.0))
+            boxes[fn] = (max(bw, float(im.get("w") or 0)), max(bh, float(im.get("h") or 0)))
+    names = list(payloads)
+    jobs = []
+    for fn in names:
+        bw, bh = boxes.get(fn, (0.0, 0.0))
+        if bw > 0 and bh > 0:
+            jobs.append(abest_fit(ASSETS_DIR, fn, bw * dpr, bh * dpr))
+        else:
+            jobs.append(aget_asset(ASSETS_DIR, fn))  # geen box bekend: origineel
+    return dict(zip(names, await asyncio.gather(*jobs)))
+
+
+
+def _collect_metrics() -> None:
+    """Gauges/tellers die elders bijgehouden worden, pas bij het uitlezen van /metrics."""
+    cache = ASSET_CACHE.stats()
+    metrics.ASSET_HITS.set((), cache["hits"])
+    metrics.ASSET_MISSES.set((), cache["misses"])
+    lookups = cache["hits"] + cache["misses"]
+    metrics.ASSET_HIT_RATIO.set((), cache["hits"] / lookups if lookups else 0.0)
+    metrics.SESSIONS.set((), sessions.registry().sessions())
+    metrics.SIM_RUNS.set((), simpool.running())
+    metrics.IO_INFLIGHT.set((), workpool.inflight())
+    metrics.LOG_DROPPED.set((), msglog.dropped())
 
+metrics.add_collector(_collect_metrics)
 
 
 # ---------- WS server ----------
 async def handler(ws: WebSocketServerProtocol):
     log.info("client connected: %s", ws.remote_address)
+    metrics.CONNECTIONS.inc()
+    metrics.CONNECTIONS_TOTAL.inc()
+
+    async def build(msg, frames: List[AssetEntry]) -> str:
+        return await handle_message(msg, ws=ws, frames=frames)
+
+    async def deliver(frames: List[AssetEntry], resp: str) -> None:
+        # binary mode: eerst de PNG's (header + ruwe bytes als twee fragmenten, geen concat-kopie),
+        # dan de JSON met geometrie + png_hashes als verwijzing
+        for e in frames:
+            await ws.send([pack_asset_frame_header(e.name, e.digest, len(e.data)), e.data])
+        await ws.send(resp)
+
+    def interrupt(msg) -> None:
+        # reset/rewind/branch (RUNSIMULATION [-1]/[-2]/[-3]) breekt een lopende simulatie van deze sessie direct af
+        if simpool.is_reset(msg) and simpool.cancel_session(session_of(ws)):
+            log.info("simulation run cancelled (reset, rewind or branch)")
+
+    def report(msg, in_bytes: int, frames: List[AssetEntry], resp: str, timings) -> None:
+        # één gestructureerde regel per request (groottes + tijden), gesampled en begrensd;
+        # de rest van deze functie kost alleen iets voor de requests die gelogd worden
+        session = session_of(ws)
+        error = isinstance(resp, ErrorReply)
+        if not msglog.wanted(session, error):
+            return
+        if isinstance(msg, dict):
+            mtype = str(msg.get("messagetype") or msg.get("type") or "invalid")
+        else:
+            mtype = "invalid"
+        out_bytes = len(resp) + sum(len(e.data) for e in frames)
+        line = msglog.message_line(mtype, session, in_bytes, out_bytes, len(frames), *timings, error=error)
+        if msglog.traced(session):
+            log.info("%s\n  <- %s\n  -> %s", line, json.dumps(msg), msglog.excerpt(resp))
+        elif error:
+            log.warning("%s", line)
+        else:
+            log.info("%s", line)
+
+    # lezen en verwerken lopen los van elkaar: een nieuwe klik (SHOW*) vervangt nog niet
+    # verstuurde oudere views, RUNSIMULATION/ping houden hun volgorde (scheduler.py)
+    sched = ConnectionScheduler(build, deliver, interrupt=interrupt, report=report)
+    worker = asyncio.create_task(sched.run())
     try:
         async for message in ws:
-            if isinstance(message, bytes):
-                # bytes: niet ondersteund
-                await ws.send(json.dumps({"type": "error", "error": "binary frames not supported"}))
-                continue
-
-           # log compacte sample (max 300 chars), type-safe
             if isinstance(message, (bytes, bytearray, memoryview)):
                 # binary frames zijn niet ondersteund; stuur fout en ga door
-                await ws.send(json.dumps({"type": "error", "error": "binary frames not supported"}))
+                await sched.submit_reply(error_reply("binary frames not supported"))
                 continue
 
             msg_text: str = message  # nu gegarandeerd str voor de type-checker
-            sample = (msg_text[:300] + "…") if len(msg_text) > 300 else msg_text
-            log.info("<- %s", sample)
-
-            resp = await handle_text_message(message, ws=ws)
-
-            # Ook hier loggen we compact
-            rsample = (resp[:300] + "…") if len(resp) > 300 else resp
-            log.info("-> %s", rsample)
-
-            await ws.send(resp)
+            await sched.submit(msg_text)
+            if worker.done():
+                break  # verbinding bij het versturen gesloten
     except websockets.ConnectionClosedOK:
         pass
     except websockets.ConnectionClosedError:
         pass
     finally:
+        sched.close()
+        worker.cancel()
+        try:
+            await worker
+        except (asyncio.CancelledError, websockets.ConnectionClosed):
+            pass
+        except Exception:
+            log.exception("connection worker crashed")
+        metrics.CONNECTIONS.dec()
         log.info("client disconnected: %s", ws.remote_address)
 
-# ---------- kleine HTTP health endpoint, WS-upgrade op "/" ----------
-def _http_response(status: int, body: bytes, content_type: str = "text/plain; charset=utf-8"):
+# ---------- kleine HTTP endpoints (health + assets), WS-upgrade op "/" ----------
+def _http_response(status: int, body: bytes, content_type: str = "text/plain; charset=utf-8",
+                   cache_control: str = "no-cache", extra_headers: Optional[List[Tuple[str, str]]] = None):
     headers = [
         ("Content-Type", content_type),
         ("Content-Length", str(len(body))),
-        ("Cache-Control", "no-cache"),
+        ("Cache-Control", cache_control),
     ]
+    headers.extend(extra_headers or [])
     return (status, headers, body)
 
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags or ("W/" + etag) in tags
+
+async def _serve_asset(path: str, query: str, request_headers):
+    """GET /assets/<hash>/<name>[?w=<breedte>]: hash moet de huidige content-hash zijn
+    (van het origineel, of van de variant met die breedteklasse), anders 404."""
+    parts = path[len("/assets/"):].split("/")
+    if len(parts) != 2:
+        return _http_response(404, b"not found\n")
+    digest, name = parts[0], unquote(parts[1])
+    if not name or name.startswith(".") or "/" in name or "\\" in name:
+        return _http_response(404, b"not found\n")
+    # alleen de breedteklassen die we zelf uitgeven (asset_url): elke andere ?w= zou een resize kosten
+    raw_w = parse_qs(query).get("w", ["0"])[0]
+    if not (raw_w.isascii() and raw_w.isdigit()):
+        return _http_response(404, b"not found\n")
+    width = int(raw_w)
+    if width and width not in VARIANT_WIDTHS:
+        return _http_response(404, b"not found\n")
+    # geldige URL van een entry die nog in de cache staat: direct, zonder stat of thread-pool
+    entry = ASSET_CACHE.lookup(name, digest)
+    if entry is None:
+        # een variant alleen (opnieuw) bouwen voor een hash die we ooit uitgaven; het origineel lezen
+        # kost geen resize, daar volstaat de hash-check hieronder
+        if width and not ASSET_CACHE.issued(name, digest, width):
+            return _http_response(404, b"stale asset url\n")
+        try:
+            entry = await workpool.run(_safe_asset, name)
+            if width:
+                entry = await workpool.single_flight(("variant", name, width), ASSET_CACHE.get_variant,
+                                                     ASSETS_DIR, name, width)
+        except (FileNotFoundError, OSError):
+            return _http_response(404, b"not found\n")
+    if entry.digest != digest:
+        return _http_response(404, b"stale asset url\n")
+    etag = f'"{entry.digest}"'
+    headers = [("ETag", etag), ("Access-Control-Allow-Origin", "*")]
+    if _etag_matches(request_headers.get("If-None-Match"), etag):
+        return (304, [("ETag", etag), ("Cache-Control", IMMUTABLE)], b"")
+    return _http_response(200, entry.data, entry.mime, IMMUTABLE, headers)
+
 async def process_request(path: str, request_headers) -> Optional[Tuple[int, List[Tuple[str, str]], bytes]]:
-    # Alleen /healthz via HTTP; laat "/" vrij voor WS upgrade.
+    # /healthz, /metrics (Prometheus) en /assets/<hash>/<name> via HTTP; laat "/" vrij voor WS upgrade.
+    url = urlsplit(path)
+    path = url.path
     if path == "/healthz":
         return _http_response(200, b"ok\n")
+    if path == "/metrics":
+        if not metrics.scrape_allowed(request_headers.get("Authorization")):
+            return _http_response(404, b"not found\n")   # niet verraden dat er iets staat
+        return _http_response(200, metrics.render().encode(), metrics.CONTENT_TYPE)
+    if path.startswith("/assets/"):
+        return await _serve_asset(path, url.query, request_headers)
     return None
 
 # ---------- main ----------
-async def main():
+async def main(reuse_port: bool = False, prewarm_assets: bool = True):
+    """Eén server op de event loop. Met reuse_port (multi-worker mode, workers.py) delen meerdere
+    processen dezelfde poort; de supervisor heeft de assets dan al voorgebakken (prewarm_assets=False)."""
     host = os.getenv("HOST", "0.0.0.0")
     port = int(os.getenv("PORT", "8765"))
     server = await websockets.serve(
@@ -167,9 +479,25 @@ async def main():
         port,
         max_size=20_000_000,           # ~20 MB
         process_request=process_request,
+        reuse_port=reuse_port or None,
     )
     log.info("WS-server listening on ws://%s:%s", host, port)
-    await server.wait_closed()
+    if prewarm_assets and os.getenv("ASSET_PREWARM", "1") != "0":
+        # verkleinde asset-varianten op de achtergrond bouwen; tot dan lazy bij de eerste request
+        asyncio.get_running_loop().run_in_executor(workpool.POOL, prewarm, ASSETS_DIR)
+    simpool.warm()
+    monitor = asyncio.create_task(metrics.monitor_loop())
+    try:
+        await server.wait_closed()
+    finally:
+        monitor.cancel()
+        simpool.shutdown()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    # WORKERS=N (of "auto"): N processen op dezelfde poort onder een supervisor (workers.py)
+    from workers import worker_count, run_workers
+    n_workers = worker_count(os.getenv("WORKERS"))
+    if n_workers > 1:
+        run_workers(n_workers, ASSETS_DIR)
+    else:
+        asyncio.run(main())
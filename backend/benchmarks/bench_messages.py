@@ -0,0 +1,265 @@
+# backend/benchmarks/bench_messages.py
+"""Benchmark-suite: latency, payload-grootte en serialisatiekosten per message type.
+
+Gebruik (vanuit backend/):
+    python benchmarks/bench_messages.py [--n 200] [--transport inline] [--format full]
+                                        [--out bench_messages.json] [--baseline vorige.json]
+
+Start backend.main in dit proces op een vrije poort en stuurt er met een echte websockets-client
+per case `--n` requests na elkaar heen (SHOWSTART t/m RUNSIMULATION en de nieuwere types). Per case:
+p50/p95/p99 van de round-trip, de responsbytes (JSON + eventuele binary frames; de PNG's gaan elke
+keer mee, tenzij --cached-assets) en de server-tijd
+verdeeld over handler, serialiseren (alles tussen handler en versturen: PNG-varianten, json.dumps)
+en versturen. Daarna micro-benchmarks van load_pngs_as_b64, Message.to_jsonable en de
+scène-compilatie (scenes.compile_scene, de opvolger van de _rect/_arrow-conversie in de handlers).
+
+Alles gaat als JSON naar `--out`. Met `--baseline` wordt vergeleken met een eerder resultaat:
+exit 1 als een p50 of micro-benchmark meer dan `--tolerance` (en `--min-delta-ms`) trager is of
+een antwoord meer dan `--tolerance` groter.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import socket
+import sys
+import time
+import timeit
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import websockets  # noqa: E402
+from websockets.server import WebSocketServerProtocol  # noqa: E402
+
+import backend  # noqa: E402
+import handlers  # noqa: E402
+import simpool  # noqa: E402
+from assetcache import ASSET_CACHE  # noqa: E402
+from handlers import handle_SHOWPROCESS as hp, handle_SHOWORGANIZATION as ho  # noqa: E402
+from protocol import MessageType, load_pngs_as_b64  # noqa: E402
+from scenes import compile_scene  # noqa: E402
+from bench_serialization import scene_message  # noqa: E402
+
+# (label, request); de label is de sleutel in de resultaten (bv. twee RUNSIMULATION-varianten)
+CASES: List[Tuple[str, Dict[str, Any]]] = [
+    ("ping", {"type": "ping"}),
+    ("SHOWSTART", {"messagetype": "SHOWSTART", "numbers": [], "texts": []}),
+    ("SHOWSTRATEGY", {"messagetype": "SHOWSTRATEGY", "numbers": [], "texts": []}),
+    ("SHOWPROCESS", {"messagetype": "SHOWPROCESS", "numbers": [], "texts": []}),
+    ("SHOWCONTROL", {"messagetype": "SHOWCONTROL", "numbers": [], "texts": []}),
+    ("SHOWORGANIZATION", {"messagetype": "SHOWORGANIZATION", "numbers": [], "texts": []}),
+    ("SHOWINFORMATION", {"messagetype": "SHOWINFORMATION", "numbers": [], "texts": []}),
+    ("RUNSIMULATION", {"messagetype": "RUNSIMULATION", "numbers": [1], "texts": ["bench"]}),
+    ("RUNSIMULATION/365", {"messagetype": "RUNSIMULATION", "numbers": [365], "texts": ["bench"]}),
+    ("QUERYSERIES", {"messagetype": "QUERYSERIES", "numbers": [0, -1, 300], "texts": ["Cash"]}),
+    ("HITTEST", {"messagetype": "HITTEST", "numbers": [98, 96], "texts": ["SHOWPROCESS"]}),
+    ("RUNSWEEP", {"messagetype": "RUNSWEEP", "numbers": [100, 365, 1], "texts": []}),
+]
+PERCENTILES = (50, 95, 99)
+
+
+class Phases:
+    """Server-tijd van de lopende request (de client stuurt er steeds één tegelijk)."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.handler = self.build = self.send = 0.0
+
+    def install(self) -> None:
+        """Timers om de handlers, backend.handle_message en de server-kant van ws.send."""
+        for mt, fn in list(handlers.registry.items()):
+            handlers.registry[mt] = self._timed(fn, "handler")
+        backend.handle_message = self._timed(backend.handle_message, "build")
+        WebSocketServerProtocol.send = self._timed(WebSocketServerProtocol.send, "send")
+
+    def _timed(self, fn, phase: str):
+        async def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                setattr(self, phase, getattr(self, phase) + time.perf_counter() - t0)
+        return wrapper
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _stats(ms: List[float]) -> Dict[str, float]:
+    a = np.array(ms)
+    out = {f"p{p}": round(float(np.percentile(a, p)), 3) for p in PERCENTILES}
+    out["mean"] = round(float(a.mean()), 3)
+    return out
+
+
+async def bench_messages(port: int, n: int, warmup: int, transport: str, fmt: str, cached_assets: bool,
+                         phases: Phases) -> Dict[str, Dict[str, Any]]:
+    results: Dict[str, Dict[str, Any]] = {}
+    async with websockets.connect(f"ws://127.0.0.1:{port}/", max_size=None) as ws:
+        await ws.send(json.dumps({"type": "hello", "transport": transport, "format": fmt}))
+        await ws.recv()
+        for label, req in CASES:
+            if "messagetype" in req and not cached_assets:
+                req = {**req, "assets": {}}  # als een nieuwe client: PNG's gaan elke keer mee
+            text = json.dumps(req)
+            rtt, handler, serialize, send, size = [], [], [], [], []
+            for i in range(warmup + n):
+                phases.reset()
+                t0 = time.perf_counter()
+                await ws.send(text)
+                nbytes = 0
+                while True:  # binary transport: eerst de PNG-frames, dan de JSON
+                    frame = await ws.recv()
+                    nbytes += len(frame)
+                    if isinstance(frame, str):
+                        break
+                dt = time.perf_counter() - t0
+                if i < warmup:
+                    continue  # koude caches (views, varianten, pool) tellen niet mee
+                rtt.append(dt * 1e3)
+                handler.append(phases.handler * 1e3)
+                serialize.append(max(0.0, phases.build - phases.handler) * 1e3)
+                send.append(phases.send * 1e3)
+                size.append(nbytes)
+            if '"type": "error"' in frame[:40]:
+                print(f"  {label}: {frame[:120]}")
+            results[label] = {
+                "n": n, "latency_ms": _stats(rtt), "bytes": int(np.median(size)),
+                "server_ms": {"handler": round(float(np.median(handler)), 3),
+                              "serialize": round(float(np.median(serialize)), 3),
+                              "send": round(float(np.median(send)), 3)},
+            }
+            r = results[label]
+            print(f"  {label:<20} p50 {r['latency_ms']['p50']:8.3f}  p95 {r['latency_ms']['p95']:8.3f}  "
+                  f"p99 {r['latency_ms']['p99']:8.3f} ms  {r['bytes']:>9} B  "
+                  f"handler {r['server_ms']['handler']:.3f} / dumps {r['server_ms']['serialize']:.3f} / "
+                  f"send {r['server_ms']['send']:.3f} ms")
+    return results
+
+
+def micro(label: str, fn, repeat: int) -> float:
+    best = min(timeit.repeat(fn, number=repeat, repeat=5)) / repeat * 1e3
+    print(f"  {label:<38} {best:9.3f} ms")
+    return round(best, 4)
+
+
+def bench_micro(repeat: int) -> Dict[str, float]:
+    assets_dir = backend.ASSETS_DIR
+    pngs = ["Start.png", "Strategy.png"]
+
+    def cold_pngs():
+        ASSET_CACHE.clear()
+        load_pngs_as_b64(assets_dir, pngs)
+
+    msg = scene_message(MessageType.SHOWPROCESS, hp)
+    org = scene_message(MessageType.SHOWORGANIZATION, ho)
+    return {
+        "load_pngs_as_b64 (warm)": micro("load_pngs_as_b64 (warm)", lambda: load_pngs_as_b64(assets_dir, pngs), repeat),
+        "load_pngs_as_b64 (cold)": micro("load_pngs_as_b64 (cold)", cold_pngs, max(1, repeat // 100)),
+        "to_jsonable SHOWPROCESS": micro("to_jsonable SHOWPROCESS", msg.to_jsonable, repeat),
+        "to_jsonable SHOWORGANIZATION": micro("to_jsonable SHOWORGANIZATION", org.to_jsonable, repeat),
+        "compile_scene SHOWPROCESS": micro("compile_scene SHOWPROCESS", lambda: compile_scene(hp.OVERLAY), repeat),
+        "compile_scene SHOWORGANIZATION": micro("compile_scene SHOWORGANIZATION",
+                                                lambda: compile_scene(ho.OVERLAY), repeat),
+    }
+
+
+def compare(new: Dict[str, Any], old: Dict[str, Any], tolerance: float, min_delta_ms: float) -> List[str]:
+    """Regressies t.o.v. een eerder resultaat (alleen wat in beide staat)."""
+    out = []
+
+    def slower(label: str, a: float, b: float) -> None:
+        if a > b * (1 + tolerance) and a - b > min_delta_ms:
+            out.append(f"{label}: {b:.3f} -> {a:.3f} ms")
+
+    for label, r in new["messages"].items():
+        prev = old.get("messages", {}).get(label)
+        if prev is None:
+            continue
+        slower(f"{label} p50", r["latency_ms"]["p50"], prev["latency_ms"]["p50"])
+        if r["bytes"] > prev["bytes"] * (1 + tolerance):
+            out.append(f"{label} bytes: {prev['bytes']} -> {r['bytes']}")
+    for label, ms in new["micro"].items():
+        if label in old.get("micro", {}):
+            slower(label, ms, old["micro"][label])
+    return out
+
+
+async def run(args) -> Dict[str, Any]:
+    port = _free_port()
+    os.environ["PORT"], os.environ["HOST"] = str(port), "127.0.0.1"
+    phases = Phases()
+    phases.install()
+    server = asyncio.create_task(backend.main(prewarm_assets=False))
+    try:
+        for _ in range(100):  # wachten tot de server luistert
+            try:
+                with socket.create_connection(("127.0.0.1", port), timeout=0.1):
+                    break
+            except OSError:
+                await asyncio.sleep(0.05)
+        if simpool.SIM_PROCS > 0:
+            await asyncio.wrap_future(simpool.pool().submit(int))  # pool-processen draaien (spawn duurt even)
+        return await bench_messages(port, args.n, args.warmup, args.transport, args.format, args.cached_assets,
+                                    phases)
+    finally:
+        server.cancel()
+        try:
+            await server
+        except asyncio.CancelledError:
+            pass
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=200, help="requests per case")
+    ap.add_argument("--warmup", type=int, default=5)
+    ap.add_argument("--transport", choices=("inline", "binary", "url"), default="inline")
+    ap.add_argument("--format", choices=("full", "compact"), default="full")
+    ap.add_argument("--cached-assets", action="store_true",
+                    help="client houdt PNG's bij (herhaalpad); default krijgt elke request ze opnieuw")
+    ap.add_argument("--repeat", type=int, default=500, help="herhalingen per micro-benchmark")
+    ap.add_argument("--out", default="bench_messages.json")
+    ap.add_argument("--baseline", help="eerder resultaat om tegen te vergelijken")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="toegestane verslechtering (fractie)")
+    ap.add_argument("--min-delta-ms", type=float, default=0.1, help="kleinere verschillen zijn ruis")
+    ap.add_argument("--log", action="store_true", help="backend-logging aan laten (kost zelf tijd)")
+    args = ap.parse_args()
+    if not args.log:
+        logging.disable(logging.INFO)
+
+    print(f"messages ({args.n} per case, transport {args.transport}, format {args.format})")
+    messages = asyncio.run(run(args))
+    print("micro-benchmarks")
+    result = {
+        "meta": {"python": platform.python_version(), "platform": platform.platform(),
+                 "cpus": os.cpu_count(), "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                 "n": args.n, "transport": args.transport, "format": args.format,
+                 "cached_assets": args.cached_assets},
+        "messages": messages,
+        "micro": bench_micro(args.repeat),
+    }
+    Path(args.out).write_text(json.dumps(result, indent=2))
+    print(f"-> {args.out}")
+    if not args.baseline:
+        return 0
+    regressions = compare(result, json.loads(Path(args.baseline).read_text()), args.tolerance, args.min_delta_ms)
+    for r in regressions:
+        print(f"  REGRESSION {r}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
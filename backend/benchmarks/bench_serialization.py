@@ -0,0 +1,89 @@
+# backend/benchmarks/bench_serialization.py
+"""Micro-benchmark: Message.to_jsonable (veld-tuple encoder) vs. de oude asdict-variant.
+
+Gebruik (vanuit backend/):
+    python benchmarks/bench_serialization.py [--repeat 2000]
+
+Controleert eerst dat de uitvoer identiek is aan de oude implementatie en meet daarna
+de scène-zware messages (SHOWPROCESS/SHOWORGANIZATION-geometrie, zoals scenes.py ze
+compileert) en de JSON-backend.
+"""
+from __future__ import annotations
+import argparse
+import json
+import sys
+import timeit
+from dataclasses import asdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import protocol  # noqa: E402
+from protocol import Message, MessageType, LineType, Rectangle, Triangle, Arrow, Image  # noqa: E402
+from handlers import handle_SHOWPROCESS as hp, handle_SHOWORGANIZATION as ho  # noqa: E402
+from scenes import compile_scene  # noqa: E402
+
+
+def legacy_to_jsonable(msg: Message):
+    """De oorspronkelijke implementatie (dataclasses.asdict per shape)."""
+    def conv_list(xs):
+        return [asdict(x) if not isinstance(x, dict) else x for x in (xs or [])]
+    return {
+        "messagetype": msg.messagetype.value,
+        "numbers": msg.numbers,
+        "texts": msg.texts,
+        "rectangles": conv_list(msg.rectangles),
+        "triangles": conv_list(msg.triangles),
+        "arrows": conv_list(msg.arrows),
+        "images": conv_list(msg.images),
+        "png_payloads": msg.png_payloads or {},
+    }
+
+
+def _shapes(cls, items):
+    return [cls(**{k: (LineType(v) if k == "linetype" else v) for k, v in d.items()}) for d in items]
+
+
+def scene_message(mt: MessageType, mod) -> Message:
+    """Pixel-scène van de handler-overlay als protocol-dataclasses (zoals een Message-handler die bouwt)."""
+    scene = compile_scene(mod.OVERLAY)
+    return Message(
+        messagetype=mt, numbers=[1.0], texts=["bench"],
+        rectangles=_shapes(Rectangle, scene["rectangles"]),
+        triangles=_shapes(Triangle, scene["triangles"]),
+        arrows=_shapes(Arrow, scene["arrows"]),
+        images=_shapes(Image, scene["images"]),
+    )
+
+
+def bench(label: str, fn, repeat: int) -> float:
+    best = min(timeit.repeat(fn, number=repeat, repeat=5)) / repeat
+    print(f"  {label:<38} {best * 1e6:9.1f} µs")
+    return best
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=2000)
+    args = ap.parse_args()
+
+    failed = False
+    for mt, mod in ((MessageType.SHOWPROCESS, hp), (MessageType.SHOWORGANIZATION, ho)):
+        msg = scene_message(mt, mod)
+        old, new = legacy_to_jsonable(msg), msg.to_jsonable()
+        if json.dumps(old) != json.dumps(new) or old != new:
+            print(f"{mt.value}: uitvoer wijkt af van de asdict-implementatie!")
+            return 1
+        print(f"{mt.value} ({len(msg.rectangles)} rects, {len(msg.arrows)} arrows) — uitvoer identiek")
+        t_old = bench("asdict to_jsonable", lambda: legacy_to_jsonable(msg), args.repeat)
+        t_new = bench("veld-tuple to_jsonable", msg.to_jsonable, args.repeat)
+        t_old_full = bench("asdict + json.dumps", lambda: json.dumps(legacy_to_jsonable(msg)), args.repeat)
+        t_new_full = bench(f"to_jsonable + dumps ({'orjson' if protocol._orjson else 'json'})",
+                           lambda: protocol.dumps(msg.to_jsonable()), args.repeat)
+        print(f"  speed-up: encode x{t_old / t_new:.1f}, encode+serialize x{t_old_full / t_new_full:.1f}")
+        failed |= t_new >= t_old
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
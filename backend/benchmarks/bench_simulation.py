@@ -0,0 +1,64 @@
+# backend/benchmarks/bench_simulation.py
+"""Micro-benchmark: simulatie-engine (simulate.py).
+
+Gebruik (vanuit backend/):
+    python benchmarks/bench_simulation.py [--repeat 20] [--runs 1000] [--budget-ms 50]
+
+Controleert eerst dat SimulateDays(s, 365) gelijk is aan 365 losse dagen en dat SimulateRuns
+per rij hetzelfde geeft als SimulateDays, en meet daarna een jaar voor één sessie en voor
+een matrix runs. Faalt (exit 1) als één jaar langer duurt dan het budget.
+"""
+from __future__ import annotations
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import simulate  # noqa: E402
+
+
+def bench(label: str, fn, repeat: int) -> float:
+    best = min(timeit.repeat(fn, number=repeat, repeat=5)) / repeat
+    print(f"  {label:<38} {best * 1e3:9.2f} ms")
+    return best
+
+
+def step_days(state, days: int):
+    for _ in range(days):
+        state = simulate.SimulateDays(state, 1)
+    return state
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--runs", type=int, default=1000)
+    ap.add_argument("--budget-ms", type=float, default=50.0)
+    args = ap.parse_args()
+
+    s0 = simulate.NewState(seed=7)
+    if not np.array_equal(step_days(s0, 365), simulate.SimulateDays(s0, 365)):
+        print("SimulateDays(365) wijkt af van 365 x SimulateDays(1)!")
+        return 1
+    starts = np.stack([simulate.NewState(seed=i) for i in range(16)])
+    rows = simulate.SimulateRuns(starts, 365)
+    if not all(np.array_equal(rows[i], simulate.SimulateDays(starts[i], 365)) for i in range(len(starts))):
+        print("SimulateRuns wijkt af van SimulateDays per run!")
+        return 1
+    print(f"365 dagen ({simulate.STATE_SIZE} state-velden) — batch identiek aan dag-voor-dag")
+
+    t_year = bench("SimulateDays(365)", lambda: simulate.SimulateDays(s0, 365), args.repeat)
+    bench("365 x SimulateDays(1)", lambda: step_days(s0, 365), max(1, args.repeat // 4))
+    many = np.stack([simulate.NewState(seed=i) for i in range(args.runs)])
+    t_runs = bench(f"SimulateRuns({args.runs} x 365)", lambda: simulate.SimulateRuns(many, 365),
+                   max(1, args.repeat // 10))
+    print(f"  per run in batch: {t_runs / args.runs * 1e6:.1f} µs")
+    return 1 if t_year * 1e3 > args.budget_ms else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,272 @@
+# backend/benchmarks/loadgen.py
+"""Loadgenerator: hoeveel spelers houdt één backend vol voordat de latency wegloopt?
+
+Gebruik (vanuit backend/, met een draaiende backend op localhost):
+    python benchmarks/loadgen.py [--clients 500] [--ramp 50] [--duration 60]
+                                 [--mix start=1,views=4,sim1=2,sim7=1,sim30=1] [--think-ms 500]
+                                 [--url ws://127.0.0.1:8765/] [--out loadgen.json]
+
+Opent `--clients` WebSocket-verbindingen, `--ramp` nieuwe per seconde. Elke verbinding doet eerst
+de hello van app.js en speelt dan tot het eind van `--duration` de mix: per stap een actie, gekozen
+naar gewicht, met `--think-ms` (± 50%) bedenktijd ertussen. Acties:
+    start   logo-klik (SHOWSTART)
+    views   volgende puzzelview (SHOWSTRATEGY, SHOWPROCESS, SHOWORGANIZATION, SHOWCONTROL, SHOWINFORMATION)
+    sim1, sim7, sim30   RUNSIMULATION met 1, 7 of 30 dagen
+Elke verbinding wacht op het antwoord voordat hij de volgende actie doet (zoals een speler).
+
+Rapporteert per seconde (verbindingen, antwoorden/s, p50/p95, fouten) en aan het eind per actie de
+throughput en latency-percentielen, de fouten (error-antwoorden, mislukte connects, timeouts,
+weggevallen verbindingen) en de bytes die de server verstuurde (alle ontvangen frames). Alleen
+tegen localhost: de generator deelt de machine met de backend, dus draai de backend bij voorkeur
+met WORKERS=N op de overige cores.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import ipaddress
+import json
+import random
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+from urllib.parse import urlsplit
+
+import numpy as np
+import websockets
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None
+
+PUZZLE_VIEWS = ("SHOWSTRATEGY", "SHOWPROCESS", "SHOWORGANIZATION", "SHOWCONTROL", "SHOWINFORMATION")
+ACTIONS = ("start", "views", "sim1", "sim7", "sim30")
+DEFAULT_MIX = "start=1,views=4,sim1=2,sim7=1,sim30=1"
+# zoals app.js (zonder assets-rapport: een nieuwe speler heeft nog niets)
+DEFAULT_HELLO = {"type": "hello", "transport": "url", "format": "compact", "diff": True, "dpr": 1}
+PERCENTILES = (50, 95, 99)
+
+
+def parse_mix(spec: str) -> Tuple[List[str], List[float]]:
+    names, weights = [], []
+    for part in spec.split(","):
+        name, _, w = part.partition("=")
+        name = name.strip()
+        if name not in ACTIONS:
+            raise SystemExit(f"unknown action in --mix: {name} (known: {', '.join(ACTIONS)})")
+        try:
+            weight = float(w or 1)
+        except ValueError:
+            raise SystemExit(f"invalid weight in --mix: {part}") from None
+        if weight > 0:
+            names.append(name)
+            weights.append(weight)
+    if not names:
+        raise SystemExit("--mix has no actions")
+    return names, weights
+
+
+def check_local(url: str) -> None:
+    host = urlsplit(url).hostname or ""
+    if host == "localhost":
+        return
+    try:
+        if ipaddress.ip_address(host).is_loopback:
+            return
+    except ValueError:
+        pass
+    raise SystemExit(f"loadgen only runs against localhost, not {host!r}")
+
+
+def raise_fd_limit() -> None:
+    """Duizenden sockets: soft limit voor open bestanden naar de hard limit."""
+    if resource is None:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or hard > soft:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard if hard != resource.RLIM_INFINITY else 65536, hard))
+
+
+class Stats:
+    def __init__(self, t0: float):
+        self.t0 = t0
+        self.latency: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.bytes = 0
+        self.frames = 0
+        self.active = 0
+        self.connected = 0
+        # per seconde: [antwoorden, fouten, latencies]
+        self.timeline: Dict[int, List[Any]] = defaultdict(lambda: [0, 0, []])
+
+    def ok(self, action: str, ms: float) -> None:
+        self.latency[action].append(ms)
+        slot = self.timeline[int(time.perf_counter() - self.t0)]
+        slot[0] += 1
+        slot[2].append(ms)
+
+    def error(self, kind: str) -> None:
+        self.errors[kind] += 1
+        self.timeline[int(time.perf_counter() - self.t0)][1] += 1
+
+
+def request(action: str, view_i: int) -> Dict[str, Any]:
+    # zoals app.js / addpuzzle.js ze versturen
+    if action == "start":
+        return {"messagetype": "SHOWSTART", "numbers": {}, "texts": {}}
+    if action == "views":
+        return {"messagetype": PUZZLE_VIEWS[view_i % len(PUZZLE_VIEWS)], "numbers": {}, "texts": {}}
+    days = int(action[3:])
+    return {"messagetype": "RUNSIMULATION", "numbers": [days], "texts": [f"Run {days} days"]}
+
+
+async def recv_reply(ws, stats: Stats) -> str:
+    """Frames lezen tot het JSON-antwoord (binary PNG-frames en streaming-progress tellen als bytes)."""
+    while True:
+        frame = await ws.recv()
+        stats.bytes += len(frame)
+        stats.frames += 1
+        if isinstance(frame, str) and '"texts": ["progress"]' not in frame[:160]:
+            return frame
+
+
+async def player(i: int, args, names: List[str], weights: List[float], hello: str, stats: Stats,
+                 deadline: float) -> None:
+    rng = random.Random(args.seed * 100003 + i)
+    try:
+        ws = await asyncio.wait_for(websockets.connect(args.url, max_size=None, open_timeout=args.timeout,
+                                                       ping_interval=None), args.timeout)
+    except Exception:
+        stats.error("connect")
+        return
+    stats.active += 1
+    stats.connected += 1
+    view_i = rng.randrange(len(PUZZLE_VIEWS))
+    try:
+        await ws.send(hello)
+        await asyncio.wait_for(recv_reply(ws, stats), args.timeout)
+        while time.perf_counter() < deadline:
+            action = rng.choices(names, weights)[0]
+            if action == "views":
+                view_i += 1
+            text = json.dumps(request(action, view_i))
+            t0 = time.perf_counter()
+            await ws.send(text)
+            try:
+                reply = await asyncio.wait_for(recv_reply(ws, stats), args.timeout)
+            except asyncio.TimeoutError:
+                stats.error("timeout")
+                break  # het antwoord kan nog komen; deze verbinding is niet meer betrouwbaar te meten
+            if reply.startswith('{"type": "error"'):
+                stats.error("error reply")
+            else:
+                stats.ok(action, (time.perf_counter() - t0) * 1e3)
+            think = args.think_ms * rng.uniform(0.5, 1.5) / 1e3
+            await asyncio.sleep(min(think, max(0.0, deadline - time.perf_counter())))
+    except websockets.ConnectionClosed:
+        stats.error("closed")
+    except Exception:
+        stats.error("client")
+    finally:
+        stats.active -= 1
+        await ws.close()
+
+
+def _pct(ms: List[float]) -> Dict[str, float]:
+    if not ms:
+        return {f"p{p}": None for p in PERCENTILES}
+    return {f"p{p}": round(float(np.percentile(ms, p)), 2) for p in PERCENTILES}
+
+
+async def report(stats: Stats, stop: asyncio.Event) -> None:
+    print(f"{'t':>4} {'conns':>6} {'rps':>7} {'p50 ms':>8} {'p95 ms':>8} {'errors':>6}")
+    last = 0
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), 1.0)
+        except asyncio.TimeoutError:
+            pass
+        now = int(time.perf_counter() - stats.t0)
+        for sec in range(last, now):
+            n, errs, ms = stats.timeline.get(sec, (0, 0, []))
+            p = _pct(ms)
+            print(f"{sec:>4} {stats.active:>6} {n:>7} {p['p50'] or 0:>8.1f} {p['p95'] or 0:>8.1f} {errs:>6}")
+        last = now
+
+
+async def run(args) -> Dict[str, Any]:
+    names, weights = parse_mix(args.mix)
+    hello = json.dumps({**DEFAULT_HELLO, **json.loads(args.hello)} if args.hello else DEFAULT_HELLO)
+    t0 = time.perf_counter()
+    stats = Stats(t0)
+    deadline = t0 + args.duration
+    stop = asyncio.Event()
+    reporter = asyncio.create_task(report(stats, stop))
+    tasks = []
+    for i in range(args.clients):
+        if time.perf_counter() >= deadline:
+            break
+        tasks.append(asyncio.create_task(player(i, args, names, weights, hello, stats, deadline)))
+        await asyncio.sleep(1.0 / args.ramp)
+    await asyncio.gather(*tasks)
+    stop.set()
+    await reporter
+    elapsed = time.perf_counter() - t0
+    total = sum(len(v) for v in stats.latency.values())
+    everything = [ms for v in stats.latency.values() for ms in v]
+    return {
+        "config": {"url": args.url, "clients": args.clients, "ramp": args.ramp, "duration": args.duration,
+                   "mix": dict(zip(names, weights)), "think_ms": args.think_ms, "hello": json.loads(hello)},
+        "connected": stats.connected,
+        "elapsed_s": round(elapsed, 2),
+        "responses": total,
+        "throughput_rps": round(total / elapsed, 1),
+        "latency_ms": _pct(everything),
+        "actions": {a: {"n": len(v), "rps": round(len(v) / elapsed, 1), **_pct(v)}
+                    for a, v in sorted(stats.latency.items())},
+        "errors": dict(stats.errors),
+        "server_bytes": stats.bytes,
+        "server_mb_per_s": round(stats.bytes / elapsed / 1e6, 2),
+        "frames": stats.frames,
+        "timeline": [{"t": sec, "responses": n, "errors": e, **_pct(ms)}
+                     for sec, (n, e, ms) in sorted(stats.timeline.items())],
+    }
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", default="ws://127.0.0.1:8765/")
+    ap.add_argument("--clients", type=int, default=500)
+    ap.add_argument("--ramp", type=float, default=50.0, help="nieuwe verbindingen per seconde")
+    ap.add_argument("--duration", type=float, default=60.0, help="seconden, inclusief ramp-up")
+    ap.add_argument("--mix", default=DEFAULT_MIX, help=f"actie=gewicht,... ({', '.join(ACTIONS)})")
+    ap.add_argument("--think-ms", type=float, default=500.0, help="bedenktijd tussen acties (± 50%%)")
+    ap.add_argument("--timeout", type=float, default=30.0, help="seconden per connect/antwoord")
+    ap.add_argument("--hello", help='extra hello-velden als JSON, bv. \'{"transport": "binary"}\'')
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--out", help="resultaat als JSON")
+    args = ap.parse_args()
+    check_local(args.url)
+    if args.ramp <= 0 or args.clients < 1:
+        raise SystemExit("--ramp and --clients must be positive")
+    raise_fd_limit()
+
+    result = asyncio.run(run(args))
+    print(f"\n{result['connected']} connections, {result['responses']} responses in {result['elapsed_s']} s "
+          f"({result['throughput_rps']} /s), server sent {result['server_bytes'] / 1e6:.1f} MB "
+          f"({result['server_mb_per_s']} MB/s)")
+    lat = result["latency_ms"]
+    print(f"latency p50 {lat['p50']} / p95 {lat['p95']} / p99 {lat['p99']} ms")
+    for action, r in result["actions"].items():
+        print(f"  {action:<6} {r['n']:>7} ({r['rps']:>7} /s)  p50 {r['p50']:>8} p95 {r['p95']:>8} p99 {r['p99']:>8} ms")
+    print(f"errors: {result['errors'] or 'none'}")
+    if args.out:
+        Path(args.out).write_text(json.dumps(result, indent=2))
+        print(f"-> {args.out}")
+    return 1 if result["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+# backend/compact.py
+from __future__ import annotations
+from typing import Any, Dict, List, Tuple
+
+# Compacte (kolom-)encoding van de scène, per verbinding aan te zetten met
+# {"type": "hello", "format": "compact"}. In plaats van een lijst objecten per shape-soort:
+#   "styles":     [ {font, fontsize, textcolor, linewidth, fill, stroke, linetype}, ... ]  (gededupliceerd)
+#   "rectangles": {"count": n, "style": [idx, ...], "columns": {"name": [...], "x": [...], ...}}
+# De stijlvelden staan alleen in de styles-tabel; de shapes verwijzen ernaar via index.
+# Coördinaten worden afgerond op 1/100 px (onzichtbaar, scheelt veel cijfers); lege lijsten
+# blijven []. DrawCanvas.decodeCompact() maakt er weer gewone objecten van.
+
+SCENE_KEYS = ("rectangles", "triangles", "arrows", "images")
+STYLE_FIELDS = ("font", "fontsize", "textcolor", "linewidth", "fill", "stroke", "linetype")
+_STYLE_SET = frozenset(STYLE_FIELDS)
+COORD_FIELDS = frozenset(("x", "y", "w", "h", "x1", "y1", "x2", "y2"))
+
+
+def encode_scene(scene: Dict[str, Any]) -> Dict[str, Any]:
+    """{rectangles: [..], ...} -> {"styles": [...], "rectangles": {...}, ...} (zelfde sleutelvolgorde)."""
+    styles: List[Dict[str, Any]] = []
+    style_index: Dict[Tuple, int] = {}
+    out: Dict[str, Any] = {"styles": styles}
+    for key in SCENE_KEYS:
+        items = scene.get(key) or []
+        if not items:
+            out[key] = []
+            continue
+        columns: Dict[str, List[Any]] = {}
+        style_refs: List[int] = []
+        for i, item in enumerate(items):
+            skey = tuple((f, item[f]) for f in STYLE_FIELDS if f in item)
+            idx = style_index.get(skey)
+            if idx is None:
+                idx = style_index[skey] = len(styles)
+                styles.append(dict(skey))
+            style_refs.append(idx)
+            for f, v in item.items():
+                if f in _STYLE_SET:
+                    continue
+                col = columns.get(f)
+                if col is None:
+                    col = columns[f] = [None] * i  # veld ontbrak bij eerdere items
+                if f in COORD_FIELDS and isinstance(v, float):
+                    v = round(v, 2)
+                col.append(v)
+            for f, col in columns.items():
+                if len(col) < i + 1:
+                    col.append(None)
+        out[key] = {"count": len(items), "style": style_refs, "columns": columns}
+    return out
+
+
+def encode_message(resp: Dict[str, Any]) -> Dict[str, Any]:
+    """Volledig jsonable antwoord omzetten; niet-scène velden blijven ongewijzigd.
+    Zonder geometrie (bv. RUNSIMULATION) levert compact niets op: dan blijft het antwoord zoals het is."""
+    if not any(resp.get(k) for k in SCENE_KEYS):
+        return resp
+    out: Dict[str, Any] = {}
+    enc = encode_scene(resp)
+    for k, v in resp.items():
+        if k == "rectangles":
+            out["format"] = "compact"
+            out["styles"] = enc["styles"]
+        out[k] = enc[k] if k in SCENE_KEYS else v
+    return out
+
+
+__all__ = ["STYLE_FIELDS", "encode_scene", "encode_message"]
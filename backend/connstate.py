@@ -0,0 +1,82 @@
+# backend/connstate.py
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional, Tuple
+from weakref import WeakKeyDictionary
+
+import sessions
+
+# Per-verbinding state (wat weet de client al?). Leeft zolang de websocket leeft;
+# handlers krijgen `ws` mee en kunnen hier hun gegevens ophalen.
+
+
+# Hoe PNG-payloads naar de client gaan: base64 in de JSON (default), als binary frames,
+# of als content-hashed HTTP-URL (/assets/<hash>/<name>, zie backend.process_request)
+TRANSPORTS = ("inline", "binary", "url")
+# Wire-format van de scène: lijsten objecten (default) of kolommen + style-tabel (compact.py)
+FORMATS = ("full", "compact")
+
+
+@dataclass
+class ConnectionState:
+    # filename -> content-hash van de PNG's die de client al in zijn imageCache heeft
+    known_assets: Dict[str, str] = field(default_factory=dict)
+    transport: str = "inline"
+    format: str = "full"
+    # sessie-id (hello "session", anders door de backend gekozen): sleutel voor de simulatie-state
+    # in sessions.py, dus dezelfde speler behoudt zijn simulatie over reconnects en workers heen
+    session: Optional[str] = None
+    # devicePixelRatio van de client: Image-boxen x dpr = benodigde pixels voor asset-varianten
+    dpr: float = 1.0
+    # RUNSIMULATION-streaming (simstream.py): (elke K dagen, elke T ms) of None = één antwoord aan het eind
+    stream: Optional[Tuple[int, float]] = None
+    # scène-diff (scenediff.py): laatst verstuurde scène en, als die gecachet was, de PreparedView
+    diff: bool = False
+    last_scene: Optional[Dict[str, Any]] = None
+    last_view: Optional[Any] = None
+
+
+_states: "WeakKeyDictionary[Any, ConnectionState]" = WeakKeyDictionary()
+
+
+def state_for(ws) -> ConnectionState:
+    """State van deze verbinding; zonder ws (tests/CLI) een verse, niet-bewaarde state."""
+    if ws is None:
+        return ConnectionState()
+    st = _states.get(ws)
+    if st is None:
+        st = _states[ws] = ConnectionState()
+    return st
+
+
+def session_of(ws) -> str:
+    """Sessie-id van deze verbinding; zonder hello krijgt de verbinding een eigen (nieuwe) sessie."""
+    st = state_for(ws)
+    if st.session is None:
+        st.session = sessions.new_session_id()
+        sessions.registry().create(st.session)
+    return st.session
+
+
+def known_assets(ws) -> Dict[str, str]:
+    return state_for(ws).known_assets
+
+
+def parse_dpr(raw, default: float = 1.0) -> float:
+    """Client-dpr opschonen (begrensd 0.5..4), anders de default."""
+    try:
+        v = float(raw)
+    except (TypeError, ValueError):
+        return default
+    return min(4.0, max(0.5, v)) if v == v else default
+
+
+def parse_asset_report(raw) -> Dict[str, str]:
+    """Client-rapportage {filename: hash} opschonen (alleen str -> str)."""
+    if not isinstance(raw, dict):
+        return {}
+    return {str(k): str(v) for k, v in raw.items() if isinstance(k, str) and v}
+
+
+__all__ = ["TRANSPORTS", "FORMATS", "ConnectionState", "state_for", "known_assets", "session_of", "parse_dpr",
+           "parse_asset_report"]
@@ -20,4 +20,4 @@ def register(mtype: MessageType):
 # import side-effect: registreert alle handlers
 from . import handle_SHOWSTART, handle_SHOWSTRATEGY, handle_SHOWPROCESS, \
 handle_SHOWCONTROL, handle_SHOWORGANIZATION, handle_SHOWINFORMATION, \
-handle_RUNSIMULATION # noqa: F401
\ No newline at end of file
+handle_RUNSIMULATION, handle_RUNSWEEP, handle_QUERYSERIES, handle_HITTEST # noqa: F401
\ No newline at end of file
@@ -1,5 +1,5 @@
 from pathlib import Path
-from protocol import Message, MessageType, Image, Rectangle, Triangle, Arrow, LineType, load_pngs_as_b64
+from protocol import Message, MessageType, Image, Rectangle, Triangle, Arrow, LineType, aload_pngs_as_b64
 
 
 async def handle(ws, *, numbers, texts, assets_dir: Path) -> Message:
@@ -10,5 +10,5 @@ async def handle(ws, *, numbers, texts, assets_dir: Path) -> Message:
         texts=["ok"],
         images=[Image(name="start", text="", font="Arial", fontsize=14, textcolor="#000", x=20, y=20, w=600, h=400, filename="Start.png")],
         rectangles=[], triangles=[], arrows=[],
-        png_payloads=load_pngs_as_b64(assets_dir, pngs)
+        png_payloads=await aload_pngs_as_b64(assets_dir, pngs)
     )
\ No newline at end of file
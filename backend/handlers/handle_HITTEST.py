@@ -0,0 +1,45 @@
+from __future__ import annotations
+from pathlib import Path
+from handlers import register
+from protocol import Message, MessageType
+from scenes import ahit_index
+from handlers import handle_SHOWCONTROL, handle_SHOWINFORMATION, handle_SHOWORGANIZATION, handle_SHOWPROCESS
+
+# views met een gecompileerde scène (scenes.py) en hun overlay
+VIEWS = {
+    MessageType.SHOWPROCESS: handle_SHOWPROCESS.OVERLAY,
+    MessageType.SHOWCONTROL: handle_SHOWCONTROL.OVERLAY,
+    MessageType.SHOWINFORMATION: handle_SHOWINFORMATION.OVERLAY,
+    MessageType.SHOWORGANIZATION: handle_SHOWORGANIZATION.OVERLAY,
+}
+
+
+@register(MessageType.HITTEST)
+async def handle_HITTEST(ws, *, numbers, texts, assets_dir: Path) -> dict:
+    # Welk element ligt onder een klik op het canvas? (hittest.py)
+    #   numbers: [x, y] in canvas-pixels, optioneel gevolgd door de canvasmaat [w, h] van de view
+    #   texts:   [view], bv. "SHOWPROCESS" (default)
+    # Antwoord: texts = namen van alle elementen onder het punt, bovenste eerst; "hit" = het bovenste
+    try:
+        x, y = float(numbers[0]), float(numbers[1])
+    except (IndexError, TypeError, ValueError):
+        raise ValueError("numbers must be [x, y] or [x, y, width, height]") from None
+    name = texts[0] if texts else MessageType.SHOWPROCESS.value
+    try:
+        mt = MessageType(name)
+    except ValueError:
+        mt = None
+    if mt not in VIEWS:
+        raise ValueError(f"no hit-testing for view: {name} (known: {', '.join(m.value for m in VIEWS)})")
+    index = await ahit_index(mt, VIEWS[mt], list(numbers[2:4]))
+    found = index.hits(x, y)
+
+    resp = Message(
+        messagetype=MessageType.HITTEST,
+        numbers=[x, y],
+        texts=[index.names[i] for i in found],
+        rectangles=[], triangles=[], arrows=[], images=[],
+        png_payloads={},
+    ).to_jsonable()
+    resp["hit"] = {"name": index.names[found[0]], "kind": index.kinds[found[0]]} if found else None
+    return resp
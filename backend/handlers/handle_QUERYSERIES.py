@@ -0,0 +1,29 @@
+from __future__ import annotations
+from pathlib import Path
+from handlers import register
+from connstate import session_of
+from protocol import Message, MessageType
+import tsstore
+
+
+@register(MessageType.QUERYSERIES)
+async def handle_QUERYSERIES(ws, *, numbers, texts, assets_dir: Path) -> dict:
+    # Tijdreeks van deze sessie (tsstore.py) voor grafieken, teruggebracht tot hooguit `points` buckets
+    #   numbers: [vanaf dag (0), t/m dag (-1 = laatste), points (300)]
+    #   texts:   veldnamen (tsstore.FIELDS: voorraden en KPI's); leeg = alle velden
+    try:
+        start, end, points = (int(v) for v in (list(numbers or [])[:3] + [0, -1, tsstore.DEFAULT_POINTS][len(numbers or []):]))
+    except (TypeError, ValueError):
+        raise ValueError("numbers must be [from_day, to_day, points]") from None
+    fields = [t for t in texts or [] if isinstance(t, str) and t]
+    result = await tsstore.aquery(session_of(ws), fields, start, None if end < 0 else end, points)
+
+    resp = Message(
+        messagetype=MessageType.QUERYSERIES,
+        numbers=[start, end, points],
+        texts=list(result["fields"]),
+        rectangles=[], triangles=[], arrows=[], images=[],
+        png_payloads={},
+    ).to_jsonable()
+    resp["series"] = result
+    return resp
@@ -1,44 +1,91 @@
 from __future__ import annotations
 from pathlib import Path
 from handlers import register
+from connstate import session_of, state_for
 from protocol import Message, MessageType
 from datetime import date, timedelta
 import calendar
+import sessions
+import simpool
 import simulate
+import tsstore
+from simstream import run_days
 
 
 @register(MessageType.RUNSIMULATION)
-async def handle_RUNSIMULATION(ws, *, numbers, texts, assets_dir: Path) -> Message:
+async def handle_RUNSIMULATION(ws, *, numbers, texts, assets_dir: Path) -> dict:
     # 1) Lees gewenste aantal dagen uit de payload
     #    (numbers kan leeg of None zijn → default 1 dag)
     try:
         days_to_simulate = int(numbers[0]) if numbers and len(numbers) > 0 else 1
     except Exception:
         days_to_simulate = 1
+    if days_to_simulate > simpool.SIM_MAX_DAYS:
+        # vóór run_days: een run houdt een pool-slot bezet en schrijft elke dag naar de tijdreeks
+        raise ValueError(f"too many days: {days_to_simulate} (max {simpool.SIM_MAX_DAYS})")
+    if days_to_simulate < 1 and days_to_simulate not in (-1, -2, -3):
+        # 0 of een onbekend negatief commando: geen stil "gelukt"-antwoord
+        raise ValueError(f"invalid number of days: {days_to_simulate}")
 
-    # 2) Speciaal geval: "30" betekent "simuleer één kalendermaand"
-    #    We bepalen dan het aantal dagen van de huidige kalendermaand gemeten
-    #    vanaf de simulatiedatum (vandaag + SimDayNumber).
-    if days_to_simulate == 30:
-        start_date = date.today() + timedelta(days=simulate.SimDayNumber)
-        _, month_len = calendar.monthrange(start_date.year, start_date.month)  # 28/29/30/31
-        days_to_simulate = month_len
+    def month_days(state) -> int:
+        # "30" betekent "simuleer één kalendermaand": aantal dagen van de huidige kalendermaand,
+        # gemeten vanaf de simulatiedatum (vandaag + dagnummer van deze sessie)
+        start_date = date.today() + timedelta(days=simulate.DayOf(state))
+        _, days = calendar.monthrange(start_date.year, start_date.month)  # 28/29/30/31
+        return days
 
-    # 3) Voer de simulatie uit
-    for _ in range(max(0, days_to_simulate)):
-        simulate.SimulategameOneDay()
+    # simulatie-state van de sessie van deze speler (sessions.py), niet van alle spelers samen
+    session = session_of(ws)
+    table = sessions.registry()
 
-    if days_to_simulate == -1:        
-        simulate.ResetSimulation()
-        
+    # -1 = reset naar dag 0, -2 = terugspoelen naar dag numbers[1], -3 = aftakken vanaf dag numbers[1]
+    # (nieuwe sessie met dezelfde geschiedenis, de oude blijft staan). Lopende runs van deze sessie
+    # breken af (backend.py doet dat al zodra het bericht binnenkomt, ook als het nog in de wachtrij staat)
+    if days_to_simulate == -1:
+        simpool.cancel_session(session)
+        table.create(session)   # reset mag ook een verlopen sessie opnieuw beginnen
+        state = table.update(session, lambda _state: simulate.NewState())
+        await tsstore.areset(session, state)
+        summary = {"days": 0, "kpis": simulate.Kpis(state)}
+    elif days_to_simulate in (-2, -3):
+        try:
+            day = int(numbers[1])
+        except (IndexError, TypeError, ValueError):
+            raise ValueError("rewind/branch needs the day as numbers[1]") from None
+        simpool.cancel_session(session)
+        if days_to_simulate == -2:
+            state = table.rewind(session, day)
+            await tsstore.atruncate(session, day)
+            summary = {"days": 0, "rewound_to": day, "kpis": simulate.Kpis(state)}
+        else:
+            st = state_for(ws)
+            st.session = sessions.new_session_id()
+            state = table.branch(session, day, st.session)
+            await tsstore.abranch(session, day, st.session)
+            summary = {"days": 0, "branched_from": {"session": session, "day": day}, "kpis": simulate.Kpis(state)}
+            session = st.session
+    else:
+        # 2) Speciaal geval: "30" = één kalendermaand
+        current = table.get(session)
+        days = month_days(current) if days_to_simulate == 30 else days_to_simulate
+        tsstore.check_room(simulate.DayOf(current), days)
+        # 3) Voer de simulatie uit: in batches in de process-pool (simpool.py); lange runs met
+        #    streaming (hello "stream") sturen tussentijdse updates, dit antwoord is de samenvatting
+        stream = state_for(ws).stream if ws is not None else None
+        if stream is not None and days <= stream[0]:
+            stream = None
+        state, summary = await run_days(ws, session, days, stream)
 
     # 4) Antwoord terug naar de frontend
-    return Message(
+    resp = Message(
         messagetype=MessageType.RUNSIMULATION,
-        numbers=[simulate.SimDayNumber],     # actuele totale SimDayNumber
+        numbers=[simulate.DayOf(state)],     # actuele totale dagnummer van deze sessie
         texts=["Runned one day"],            # laat zo als je frontend daarop rekent
         rectangles=[], triangles=[], arrows=[], images=[],
         png_payloads={},
-    )
+    ).to_jsonable()
+    summary["history"] = table.history(session)   # (oudste dag waarnaar terug kan, huidige dag)
+    resp["summary"] = summary
+    resp["session"] = session
+    return resp
     # Opmerking: de frontend berekent zelf de datum op basis van SimDayNumber
-
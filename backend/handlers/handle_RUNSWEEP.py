@@ -0,0 +1,31 @@
+from __future__ import annotations
+from pathlib import Path
+from handlers import register
+from connstate import session_of
+from protocol import Message, MessageType
+import sessions
+from sweep import parse_grid, run_sweep
+
+
+@register(MessageType.RUNSWEEP)
+async def handle_RUNSWEEP(ws, *, numbers, texts, assets_dir: Path) -> dict:
+    # Monte Carlo-sweep (sweep.py) vanaf de huidige state van deze sessie; de sessie zelf verandert niet.
+    #   numbers: [runs per instelling (100), dagen (365), seed (1)]
+    #   texts:   per parameter "Naam=waarde,waarde,..." (simulate.PARAMS), alle combinaties worden gedraaid
+    try:
+        runs, days, seed = (int(v) for v in (list(numbers or [])[:3] + [100, 365, 1][len(numbers or []):]))
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError("numbers must be [runs, days, seed]") from None
+    settings = parse_grid(texts)
+    start = sessions.registry().get(session_of(ws))
+    result = await run_sweep(start, runs, days, seed, settings)
+
+    resp = Message(
+        messagetype=MessageType.RUNSWEEP,
+        numbers=[runs, days, seed],
+        texts=[", ".join(f"{k}={v:g}" for k, v in s.items()) or "defaults" for s in settings],
+        rectangles=[], triangles=[], arrows=[], images=[],
+        png_payloads={},
+    ).to_jsonable()
+    resp["sweep"] = result
+    return resp
@@ -1,6 +1,6 @@
 from pathlib import Path
 from handlers import register
-from protocol import Message, MessageType, Image, load_pngs_as_b64
+from protocol import Message, MessageType, Image, aload_pngs_as_b64
 
 @register(MessageType.SHOWSTART)
 async def handle_SHOWSTART(ws, *, numbers, texts, assets_dir: Path) -> Message:
@@ -16,5 +16,5 @@ async def handle_SHOWSTART(ws, *, numbers, texts, assets_dir: Path) -> Message:
             ),
         ],
         rectangles=[], triangles=[], arrows=[],
-        png_payloads=load_pngs_as_b64(assets_dir, pngs),
+        png_payloads=await aload_pngs_as_b64(assets_dir, pngs),
     )
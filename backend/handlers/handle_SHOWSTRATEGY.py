@@ -1,6 +1,6 @@
 from pathlib import Path
 from handlers import register
-from protocol import Message, MessageType, Image, Rectangle, LineType, load_pngs_as_b64
+from protocol import Message, MessageType, Image, Rectangle, LineType, aload_pngs_as_b64
 
 @register(MessageType.SHOWSTRATEGY)
 async def handle_SHOWSTRATEGY(ws, *, numbers, texts, assets_dir: Path) -> Message:
@@ -16,5 +16,5 @@ async def handle_SHOWSTRATEGY(ws, *, numbers, texts, assets_dir: Path) -> Messag
             ),
         ],
         triangles=[], arrows=[],
-        png_payloads=load_pngs_as_b64(assets_dir, pngs),
+        png_payloads=await aload_pngs_as_b64(assets_dir, pngs),
     )
@@ -0,0 +1,166 @@
+# backend/hittest.py
+from __future__ import annotations
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Hit-testing op een gecompileerde pixel-scène (scenes.py / viewcache.PreparedView): welk element
+# ligt onder een klik? Een uniform grid, één keer per view gebouwd: per cel de indices van de
+# elementen die hem raken (CSR: cel -> start/eind in één index-array); boxen staan in alle cellen
+# van hun box, pijlen alleen in de cellen waar het lijnstuk (plus marge) doorheen loopt. Een klik
+# kijkt alleen naar de kandidaten in zijn eigen cel en test die exact (rechthoek/image: box,
+# driehoek: de drie hoekpunten zoals DrawCanvas ze tekent, pijl: afstand tot het lijnstuk).
+# Volgorde = tekenvolgorde van DrawCanvas (rectangles, triangles, arrows, images); het bovenste
+# element (laatst getekend) komt eerst.
+
+# klikmarge rond pijlen in px, bovenop de halve lijndikte (dunne lijnen zijn anders niet te raken)
+ARROW_TOLERANCE_PX = 3.0
+# gemiddeld zoveel elementen per cel nastreven; cellen niet kleiner dan MIN_CELL_PX
+TARGET_PER_CELL = 2
+MIN_CELL_PX = 8.0
+
+_ORDER = ("rectangles", "triangles", "arrows", "images")
+_KIND = {"rectangles": "rectangle", "triangles": "triangle", "arrows": "arrow", "images": "image"}
+
+
+def _num(d: Dict[str, Any], k: str) -> float:
+    v = d.get(k)
+    return float(v) if isinstance(v, (int, float)) else 0.0
+
+
+class SceneIndex:
+    """Grid-index over één scène; hits(x, y) -> elementen onder het punt, bovenste eerst."""
+    __slots__ = ("names", "kinds", "_geom", "_x0", "_y0", "_cell", "_nx", "_ny", "_start", "_items")
+
+    def __init__(self, scene: Dict[str, List[Dict[str, Any]]]):
+        self.names: List[str] = []
+        self.kinds: List[str] = []
+        # per element (kind-code, geometrie-tuple); code 0 = box, 1 = driehoek, 2 = lijnstuk
+        self._geom: List[Tuple[int, Tuple[float, ...]]] = []
+        boxes: List[Tuple[float, float, float, float]] = []
+        for key in _ORDER:
+            for d in scene.get(key) or []:
+                if key == "images" and not d.get("filename"):
+                    continue  # wordt niet getekend
+                if key == "arrows":
+                    x1, y1, x2, y2 = (_num(d, k) for k in ("x1", "y1", "x2", "y2"))
+                    tol = (_num(d, "linewidth") or 1.0) / 2 + ARROW_TOLERANCE_PX  # DrawCanvas: linewidth || 1
+                    geom = (2, (x1, y1, x2, y2, tol * tol))
+                    box = (min(x1, x2) - tol, min(y1, y2) - tol, max(x1, x2) + tol, max(y1, y2) + tol)
+                else:
+                    x, y, w, h = (_num(d, k) for k in ("x", "y", "w", "h"))
+                    x0, x1, y0, y1 = min(x, x + w), max(x, x + w), min(y, y + h), max(y, y + h)
+                    geom = (1, (x, y, w, h)) if key == "triangles" else (0, (x0, y0, x1, y1))
+                    box = (x0, y0, x1, y1)
+                self.names.append(str(d.get("name") or ""))
+                self.kinds.append(_KIND[key])
+                self._geom.append(geom)
+                boxes.append(box)
+        self._build(np.array(boxes, dtype=np.float64).reshape(-1, 4))
+
+    def _build(self, b: np.ndarray) -> None:
+        n = len(b)
+        if n == 0:
+            self._x0 = self._y0 = 0.0
+            self._cell, self._nx, self._ny = 1.0, 1, 1
+            self._start = np.zeros(2, dtype=np.int64)
+            self._items = np.zeros(0, dtype=np.int64)
+            return
+        self._x0, self._y0 = float(b[:, 0].min()), float(b[:, 1].min())
+        span_w = max(1.0, float(b[:, 2].max()) - self._x0)
+        span_h = max(1.0, float(b[:, 3].max()) - self._y0)
+        self._cell = max(MIN_CELL_PX, math.sqrt(span_w * span_h * TARGET_PER_CELL / n))
+        self._nx = int(span_w // self._cell) + 1
+        self._ny = int(span_h // self._cell) + 1
+        c = ((b - (self._x0, self._y0, self._x0, self._y0)) // self._cell).astype(np.int64)
+        c[:, [0, 2]] = c[:, [0, 2]].clip(0, self._nx - 1)
+        c[:, [1, 3]] = c[:, [1, 3]].clip(0, self._ny - 1)
+        # (cel, element)-paren; grote elementen (achtergrond) raken veel cellen, dat is één keer werk
+        # eerst per gridrij (eerste cel, aantal cellen, element), dan in één keer uitgevouwen
+        firsts, counts, owners = [], [], []
+        for i, (cx0, cy0, cx1, cy1) in enumerate(c.tolist()):
+            code, g = self._geom[i]
+            for cy in range(cy0, cy1 + 1):
+                if code == 2:
+                    cx0, cx1 = self._segment_cols(g, cy)
+                firsts.append(cy * self._nx + cx0)
+                counts.append(cx1 - cx0 + 1)
+                owners.append(i)
+        counts_a = np.array(counts, dtype=np.int64)
+        offsets = np.repeat(np.cumsum(counts_a) - counts_a, counts_a)
+        cells_a = np.repeat(np.array(firsts, dtype=np.int64), counts_a) + np.arange(int(counts_a.sum())) - offsets
+        elems_a = np.repeat(np.array(owners, dtype=np.int64), counts_a)
+        # per cel oplopend op element-index (stabiel), dan van achter naar voren = bovenste eerst
+        order = np.lexsort((elems_a, cells_a))
+        self._items = elems_a[order]
+        self._start = np.zeros(self._nx * self._ny + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cells_a, minlength=self._nx * self._ny), out=self._start[1:])
+
+    def _segment_cols(self, g: Tuple[float, ...], cy: int) -> Tuple[int, int]:
+        """Eerste en laatste gridkolom die lijnstuk g (met marge) raakt in gridrij cy."""
+        x1, y1, x2, y2, tol2 = g
+        tol = math.sqrt(tol2)
+        lo, hi = self._y0 + cy * self._cell - tol, self._y0 + (cy + 1) * self._cell + tol
+        if y1 == y2:
+            xa, xb = x1, x2
+        else:
+            ta, tb = sorted(((lo - y1) / (y2 - y1), (hi - y1) / (y2 - y1)))
+            ta, tb = max(0.0, ta), min(1.0, tb)
+            xa, xb = x1 + ta * (x2 - x1), x1 + tb * (x2 - x1)
+        a = int((min(xa, xb) - tol - self._x0) // self._cell)
+        b = int((max(xa, xb) + tol - self._x0) // self._cell)
+        return max(0, a), min(self._nx - 1, b)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def candidates(self, x: float, y: float) -> np.ndarray:
+        cx, cy = int((x - self._x0) // self._cell), int((y - self._y0) // self._cell)
+        if not (0 <= cx < self._nx and 0 <= cy < self._ny):
+            return self._items[:0]
+        cell = cy * self._nx + cx
+        return self._items[self._start[cell]:self._start[cell + 1]]
+
+    def hits(self, x: float, y: float, limit: Optional[int] = None) -> List[int]:
+        """Indices van de elementen onder (x, y), bovenste eerst (hooguit `limit`)."""
+        out: List[int] = []
+        for i in reversed(self.candidates(x, y).tolist()):
+            if _contains(self._geom[i], x, y):
+                out.append(i)
+                if limit is not None and len(out) >= limit:
+                    break
+        return out
+
+    def hit(self, x: float, y: float) -> Optional[str]:
+        """Naam van het bovenste element onder (x, y), of None."""
+        found = self.hits(x, y, 1)
+        return self.names[found[0]] if found else None
+
+
+def _contains(geom: Tuple[int, Tuple[float, ...]], x: float, y: float) -> bool:
+    code, g = geom
+    if code == 0:
+        return g[0] <= x <= g[2] and g[1] <= y <= g[3]
+    if code == 1:
+        # DrawCanvas: (x, y) -> (x + w, y) -> (x + w/2, y + h)
+        tx, ty, w, h = g
+        return _in_triangle(x, y, tx, ty, tx + w, ty, tx + w / 2, ty + h)
+    x1, y1, x2, y2, tol2 = g
+    dx, dy = x2 - x1, y2 - y1
+    len2 = dx * dx + dy * dy
+    t = 0.0 if len2 == 0 else max(0.0, min(1.0, ((x - x1) * dx + (y - y1) * dy) / len2))
+    px, py = x1 + t * dx - x, y1 + t * dy - y
+    return px * px + py * py <= tol2
+
+
+def _in_triangle(x, y, ax, ay, bx, by, cx, cy) -> bool:
+    d1 = (x - bx) * (ay - by) - (ax - bx) * (y - by)
+    d2 = (x - cx) * (by - cy) - (bx - cx) * (y - cy)
+    d3 = (x - ax) * (cy - ay) - (cx - ax) * (y - ay)
+    neg = d1 < 0 or d2 < 0 or d3 < 0
+    pos = d1 > 0 or d2 > 0 or d3 > 0
+    return not (neg and pos)
+
+
+__all__ = ["ARROW_TOLERANCE_PX", "SceneIndex"]
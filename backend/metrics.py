@@ -0,0 +1,270 @@
+# backend/metrics.py
+from __future__ import annotations
+import asyncio
+import hmac
+import json
+import os
+from bisect import bisect_left
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Metrics in het Prometheus-tekstformaat (GET /metrics, zie backend.process_request), zonder
+# extra dependency. Counters en histogrammen per message type worden in de dispatch bijgewerkt
+# (backend.handle_message): één dict-lookup en een bisect per waarde, geen locks (alles op de
+# event loop). Gauges die uit andere modules komen (asset-cache, sessies, pools) worden pas bij
+# het uitlezen opgehaald (collectors), dus die kosten in de hot path niets.
+# Multi-worker mode (workers.py): elke worker schrijft elke seconde een snapshot naar
+# METRICS_DIR/<pid>.json; /metrics (welke worker de scrape ook krijgt) telt alle snapshots op.
+# Snapshots van gestopte workers blijven meetellen voor counters en histogrammen (totalen dalen
+# dan niet na een herstart), gauges tellen alleen voor levende processen.
+# /metrics zit op de publieke poort: alleen met METRICS_TOKEN gezet, en dan alleen voor een scrape
+# met "Authorization: Bearer <METRICS_TOKEN>" (Prometheus: authorization.credentials); anders 404.
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+PREFIX = "alignment_"
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+LOOP_INTERVAL_S = 0.5
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+Labels = Tuple[str, ...]
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name, self.help, self.labelnames = PREFIX + name, help, tuple(labelnames)
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels = (), v: float = 1.0) -> None:
+        self.values[labels] = self.values.get(labels, 0.0) + v
+
+    def set(self, labels: Labels, v: float) -> None:
+        self.values[labels] = v  # collectors: teller die elders bijgehouden wordt
+
+    def _snapshot(self):
+        return [[list(k), v] for k, v in self.values.items()]
+
+    def _merge(self, into: Dict[Labels, float], data) -> None:
+        for k, v in data:
+            into[tuple(k)] = into.get(tuple(k), 0.0) + v
+
+    def _lines(self, values: Dict[Labels, float]) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, k)} {_num(v)}" for k, v in sorted(values.items())]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), merge: str = "sum"):
+        super().__init__(name, help, labelnames)
+        self.merge = merge  # over workers: "sum" (verbindingen) of "max" (loop-lag, gedeelde tabel)
+
+    def dec(self, labels: Labels = (), v: float = 1.0) -> None:
+        self.values[labels] = self.values.get(labels, 0.0) - v
+
+    def _merge(self, into: Dict[Labels, float], data) -> None:
+        for k, v in data:
+            k = tuple(k)
+            into[k] = max(into[k], v) if self.merge == "max" and k in into else into.get(k, 0.0) + v
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = PREFIX + name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # per labelset: [count per bucket (niet cumulatief) ..., +Inf, som]
+        self.values: Dict[Labels, List[float]] = {}
+
+    def observe(self, labels: Labels, v: float) -> None:
+        row = self.values.get(labels)
+        if row is None:
+            row = self.values[labels] = [0.0] * (len(self.buckets) + 2)
+        row[bisect_left(self.buckets, v)] += 1
+        row[-1] += v
+
+    def _snapshot(self):
+        return [[list(k), row] for k, row in self.values.items()]
+
+    def _merge(self, into: Dict[Labels, List[float]], data) -> None:
+        for k, row in data:
+            k = tuple(k)
+            if len(row) != len(self.buckets) + 2:
+                continue  # andere bucket-indeling (oude snapshot)
+            cur = into.get(k)
+            into[k] = list(row) if cur is None else [a + b for a, b in zip(cur, row)]
+
+    def _lines(self, values: Dict[Labels, List[float]]) -> List[str]:
+        out = []
+        for k, row in sorted(values.items()):
+            cum = 0.0
+            for le, n in zip(self.buckets + (float("inf"),), row):
+                cum += n
+                out.append(f"{self.name}_bucket{_labels(self.labelnames + ('le',), k + (_num(le),))} {_num(cum)}")
+            out.append(f"{self.name}_sum{_labels(self.labelnames, k)} {_num(row[-1])}")
+            out.append(f"{self.name}_count{_labels(self.labelnames, k)} {_num(cum)}")
+        return out
+
+
+def _num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+def _labels(names: Tuple[str, ...], values: Labels) -> str:
+    if not names:
+        return ""
+    esc = (str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for v in values)
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, esc)) + "}"
+
+
+REQUESTS = Counter("requests_total", "Requests per message type.", ("type",))
+ERRORS = Counter("errors_total", "Error replies per message type.", ("type",))
+HANDLER_SECONDS = Histogram("handler_seconds", "Handler latency per message type.", ("type",))
+SERIALIZE_SECONDS = Histogram("serialize_seconds", "Serialization latency (PNG payloads + JSON) per message type.",
+                              ("type",))
+RESPONSE_BYTES = Histogram("response_bytes", "Response size (JSON + binary frames) per message type.", ("type",),
+                           BYTES_BUCKETS)
+CONNECTIONS = Gauge("connections", "Open WebSocket connections.")
+CONNECTIONS_TOTAL = Counter("connections_total", "WebSocket connections accepted.")
+LOOP_LAG = Gauge("event_loop_lag_seconds", "Event-loop lag at the last check.", merge="max")
+LOOP_LAG_SECONDS = Histogram("event_loop_lag_check_seconds", "Event-loop lag per check.",
+                             buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0))
+ASSET_HITS = Counter("asset_cache_hits_total", "Asset-cache hits.")
+ASSET_MISSES = Counter("asset_cache_misses_total", "Asset-cache misses (read from disk).")
+ASSET_HIT_RATIO = Gauge("asset_cache_hit_ratio", "Asset-cache hits / lookups since start.", merge="max")
+SESSIONS = Gauge("sessions", "Sessions in the session table.", merge="max")
+SIM_RUNS = Gauge("simulation_runs", "Running RUNSIMULATION runs.")
+IO_INFLIGHT = Gauge("io_inflight", "Single-flight jobs in the thread pool.")
+LOG_DROPPED = Counter("log_records_dropped_total", "Log records dropped because the log queue was full.")
+
+METRICS = [REQUESTS, ERRORS, HANDLER_SECONDS, SERIALIZE_SECONDS, RESPONSE_BYTES, CONNECTIONS, CONNECTIONS_TOTAL,
+           LOOP_LAG, LOOP_LAG_SECONDS, ASSET_HITS, ASSET_MISSES, ASSET_HIT_RATIO, SESSIONS, SIM_RUNS, IO_INFLIGHT, LOG_DROPPED]
+_BY_NAME = {m.name: m for m in METRICS}
+
+# bij het uitlezen: waarden uit andere modules ophalen (backend.py registreert ze)
+_collectors: List[Callable[[], None]] = []
+
+
+def add_collector(fn: Callable[[], None]) -> None:
+    _collectors.append(fn)
+
+
+def record(mtype: str, handler_s: float, serialize_s: float, nbytes: int, error: bool = False) -> None:
+    """Eén afgehandelde game-message (handle_message)."""
+    labels = (mtype,)
+    REQUESTS.inc(labels)
+    if error:
+        ERRORS.inc(labels)
+    HANDLER_SECONDS.observe(labels, handler_s)
+    SERIALIZE_SECONDS.observe(labels, serialize_s)
+    RESPONSE_BYTES.observe(labels, nbytes)
+
+
+def count(mtype: str, error: bool = False) -> None:
+    """Protocol-berichten (ping/hello/asset) en ongeldige requests: alleen tellen."""
+    REQUESTS.inc((mtype,))
+    if error:
+        ERRORS.inc((mtype,))
+
+
+def scrape_allowed(authorization: Optional[str]) -> bool:
+    """GET /metrics: alleen met METRICS_TOKEN (zonder token staat /metrics uit)."""
+    if not METRICS_TOKEN or not authorization:
+        return False
+    scheme, _, token = authorization.partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(token.strip().encode(), METRICS_TOKEN.encode())
+
+
+def _collect() -> None:
+    for fn in _collectors:
+        try:
+            fn()
+        except Exception:
+            pass  # een kapotte collector mag /metrics niet breken
+
+
+def _metrics_dir() -> Optional[Path]:
+    d = os.getenv("METRICS_DIR")
+    return Path(d) if d else None
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def flush() -> None:
+    """Snapshot van dit proces naar METRICS_DIR (multi-worker mode); anders niets."""
+    d = _metrics_dir()
+    if d is None:
+        return
+    _collect()
+    d.mkdir(parents=True, exist_ok=True)
+    tmp = d / f".{os.getpid()}.tmp"
+    tmp.write_text(json.dumps({m.name: m._snapshot() for m in METRICS}))
+    os.replace(tmp, d / f"{os.getpid()}.json")  # atomair: een lezer ziet nooit een half bestand
+
+
+def render() -> str:
+    """Alle metrics in het Prometheus-tekstformaat (in multi-worker mode opgeteld over de workers)."""
+    _collect()
+    merged = {m.name: dict(m.values) for m in METRICS}
+    d = _metrics_dir()
+    if d is not None and d.is_dir():
+        for f in d.glob("*.json"):
+            try:
+                pid = int(f.stem)
+            except ValueError:
+                continue
+            if pid == os.getpid():
+                continue  # eigen waarden zijn live
+            try:
+                snap = json.loads(f.read_text())
+            except (OSError, ValueError):
+                continue
+            alive = _alive(pid)
+            for name, data in snap.items():
+                m = _BY_NAME.get(name)
+                if m is not None and (alive or m.kind != "gauge"):
+                    m._merge(merged[name], data)
+    lines: List[str] = []
+    for m in METRICS:
+        lines.append(f"# HELP {m.name} {m.help}")
+        lines.append(f"# TYPE {m.name} {m.kind}")
+        lines.extend(m._lines(merged[m.name]))
+    return "\n".join(lines) + "\n"
+
+
+async def monitor_loop(interval: float = LOOP_INTERVAL_S) -> None:
+    """Event-loop-lag meten (hoe veel later dan gepland een sleep terugkomt) en, in multi-worker
+    mode, elke seconde een snapshot schrijven."""
+    loop = asyncio.get_running_loop()
+    last_flush = 0.0
+    while True:
+        t0 = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - t0 - interval)
+        LOOP_LAG.set((), lag)
+        LOOP_LAG_SECONDS.observe((), lag)
+        if t0 - last_flush >= 1.0:
+            last_flush = t0
+            try:
+                flush()
+            except OSError:
+                pass
+
+
+__all__ = ["CONTENT_TYPE", "Counter", "Gauge", "Histogram", "REQUESTS", "ERRORS", "HANDLER_SECONDS",
+           "SERIALIZE_SECONDS", "RESPONSE_BYTES", "CONNECTIONS", "CONNECTIONS_TOTAL", "LOOP_LAG", "ASSET_HITS",
+           "ASSET_MISSES", "ASSET_HIT_RATIO", "SESSIONS", "SIM_RUNS", "IO_INFLIGHT", "LOG_DROPPED", "add_collector", "record",
+           "count", "flush", "render", "monitor_loop", "METRICS_TOKEN", "scrape_allowed"]
@@ -0,0 +1,160 @@
+# backend/msglog.py
+from __future__ import annotations
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import time
+from typing import Any, List, Optional, Set
+
+# Logging zonder I/O op de event loop: alle records gaan via een begrensde queue naar één
+# achtergrondthread (QueueListener) die naar stderr schrijft; is de queue vol, dan valt het record
+# weg (geteld) in plaats van dat de loop wacht.
+# Per-message logregels (backend.handler, één per afgehandelde request) zijn gesampled
+# (LOG_SAMPLE, fractie) en begrensd (LOG_RATE regels/s, token bucket) en gestructureerd: type,
+# sessie, groottes en tijden, geen stukken payload. Foutantwoorden worden altijd gelogd (binnen
+# LOG_RATE). Voor debuggen kan één sessie volledig gelogd worden (elke request + het begin van elk
+# antwoord, tot LOG_TRACE_CHARS): via LOG_SESSIONS=id,id of met {"type": "hello", "debug": "<token>"}
+# als LOG_DEBUG_TOKEN gezet is.
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s | %(message)s"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_QUEUE = int(os.getenv("LOG_QUEUE", "10000"))
+LOG_SAMPLE = float(os.getenv("LOG_SAMPLE", "0.01"))
+LOG_RATE = float(os.getenv("LOG_RATE", "20"))
+LOG_TRACE_CHARS = int(os.getenv("LOG_TRACE_CHARS", "4096"))
+LOG_DEBUG_TOKEN = os.getenv("LOG_DEBUG_TOKEN", "")
+
+log = logging.getLogger("alignment-backend")
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler die bij een volle queue het record weggooit (en telt) i.p.v. te blokkeren."""
+
+    def __init__(self, q: "queue.Queue[Any]"):
+        super().__init__(q)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_handler: Optional[_DroppingQueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup() -> None:
+    """Root-logging via de queue (i.p.v. logging.basicConfig); idempotent."""
+    global _handler, _listener
+    if _listener is not None:
+        return
+    out = logging.StreamHandler()
+    out.setFormatter(logging.Formatter(LOG_FORMAT))
+    _handler = _DroppingQueueHandler(queue.Queue(LOG_QUEUE))
+    root = logging.getLogger()
+    root.addHandler(_handler)
+    root.setLevel(LOG_LEVEL)
+    _listener = logging.handlers.QueueListener(_handler.queue, out, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown)
+
+
+def shutdown() -> None:
+    """Wachtrij leegschrijven en de thread stoppen."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def dropped() -> int:
+    return _handler.dropped if _handler is not None else 0
+
+
+class RateLimiter:
+    """Token bucket: gemiddeld `rate` per seconde, pieken tot `rate` tegelijk."""
+    __slots__ = ("rate", "tokens", "last", "suppressed")
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.last = time.monotonic()
+        self.suppressed = 0
+
+    def allow(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        self.suppressed += 1
+        return False
+
+
+_limiter = RateLimiter(LOG_RATE)
+_traced: Set[str] = {s for s in os.getenv("LOG_SESSIONS", "").split(",") if s}
+
+
+def trace(session: str, on: bool = True) -> None:
+    """Deze sessie (in dit proces) volledig loggen, of weer niet."""
+    if on:
+        _traced.add(session)
+    else:
+        _traced.discard(session)
+
+
+def traced(session: Optional[str]) -> bool:
+    return session in _traced
+
+
+def debug_allowed(token: Any) -> bool:
+    """hello "debug": alleen met het juiste LOG_DEBUG_TOKEN (zonder token staat het uit)."""
+    return bool(LOG_DEBUG_TOKEN) and token == LOG_DEBUG_TOKEN
+
+
+def wanted(session: Optional[str], error: bool = False) -> bool:
+    """Moet deze request gelogd worden? Goedkoop genoeg om voor elke request te vragen."""
+    if session in _traced:
+        return True
+    if not error and random.random() >= LOG_SAMPLE:
+        return False
+    return _limiter.allow()
+
+
+def _fmt(v: Any) -> str:
+    s = str(v)
+    return f'"{s}"' if not s or " " in s or "=" in s else s
+
+
+def message_line(mtype: str, session: Optional[str], in_bytes: int, out_bytes: int, frames: int,
+                 queued_s: float, build_s: float, send_s: float, error: bool = False) -> str:
+    """Eén request als key=value-regel (logfmt)."""
+    fields: List[str] = [
+        f"type={_fmt(mtype)}", f"session={_fmt(session or '-')}",
+        f"in={in_bytes}", f"out={out_bytes}", f"frames={frames}",
+        f"queue_ms={queued_s * 1e3:.2f}", f"build_ms={build_s * 1e3:.2f}", f"send_ms={send_s * 1e3:.2f}",
+    ]
+    if error:
+        fields.append("error=1")
+    elif session not in _traced and LOG_SAMPLE < 1:
+        fields.append(f"sample={LOG_SAMPLE:g}")  # deze regel staat voor ~1/LOG_SAMPLE requests
+    if _limiter.suppressed:
+        fields.append(f"suppressed={_limiter.suppressed}")
+        _limiter.suppressed = 0
+    return "msg " + " ".join(fields)
+
+
+def excerpt(text: str) -> str:
+    if LOG_TRACE_CHARS <= 0 or len(text) <= LOG_TRACE_CHARS:
+        return text
+    return f"{text[:LOG_TRACE_CHARS]}… ({len(text)} chars)"
+
+
+__all__ = ["LOG_FORMAT", "LOG_SAMPLE", "LOG_RATE", "RateLimiter", "setup", "shutdown", "dropped", "trace", "traced",
+           "debug_allowed", "wanted", "message_line", "excerpt"]
@@ -1,9 +1,17 @@
 from __future__ import annotations
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, fields
 from enum import Enum
+from operator import attrgetter
 from pathlib import Path
-from typing import List, Dict, Any
-import base64
+from typing import List, Dict, Any, Tuple
+import asyncio
+import json
+import os
+import struct
+
+import workpool
+from assetcache import get_asset, aget_asset
+from workpool import BIG_DUMPS_BYTES
 
 
 class LineType(str, Enum):
@@ -19,8 +27,11 @@ class MessageType(str, Enum):
     SHOWORGANIZATION = "SHOWORGANIZATION"
     SHOWINFORMATION = "SHOWINFORMATION"
     RUNSIMULATION = "RUNSIMULATION"
+    RUNSWEEP = "RUNSWEEP"
+    QUERYSERIES = "QUERYSERIES"
+    HITTEST = "HITTEST"
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Rectangle:
     name: str
     text: str
@@ -37,7 +48,7 @@ class Rectangle:
     linetype: LineType = LineType.SOLID
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Triangle:
     name: str
     text: str
@@ -53,7 +64,7 @@ class Triangle:
     stroke: str
     linetype: LineType = LineType.SOLID
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Arrow:
     name: str
     text: str
@@ -69,7 +80,7 @@ class Arrow:
     linetype: LineType = LineType.SOLID
     arrow: float = 0.0 # pijlpuntlengte in px
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Image:
     name: str
     text: str
@@ -95,32 +106,124 @@ class Message:
     png_payloads: Dict[str, str] | None = None
 
     def to_jsonable(self) -> Dict[str, Any]:
-        def conv_list(xs):
-            return [asdict(x) if hasattr(x, "__dict__") else x for x in (xs or [])] 
         return {
              "messagetype": self.messagetype.value,
              "numbers": self.numbers,
              "texts": self.texts,
-             "rectangles": conv_list(self.rectangles),
-             "triangles": conv_list(self.triangles),
-             "arrows": conv_list(self.arrows),
-             "images": conv_list(self.images),
+             "rectangles": shapes_to_jsonable(self.rectangles),
+             "triangles": shapes_to_jsonable(self.triangles),
+             "arrows": shapes_to_jsonable(self.arrows),
+             "images": shapes_to_jsonable(self.images),
              "png_payloads": self.png_payloads or {},
             }
 
+
+# ---------- snelle encoder voor de shape-dataclasses ----------
+# Vervangt dataclasses.asdict (recursieve deep-copy): per klasse een vooraf berekende
+# veld-tuple + attrgetter, LineType direct als string. Uitvoer is gelijk aan asdict + json.dumps.
+_SHAPE_FIELDS: Dict[type, Tuple[Tuple[str, ...], Any]] = {}
+for _cls in (Rectangle, Triangle, Arrow, Image):
+    _names = tuple(f.name for f in fields(_cls))
+    _SHAPE_FIELDS[_cls] = (_names, attrgetter(*_names))
+
+
+def shape_to_jsonable(x) -> Dict[str, Any]:
+    spec = _SHAPE_FIELDS.get(type(x))
+    if spec is None:
+        return x  # al een dict (handlers die zelf items toevoegen)
+    names, getter = spec
+    d = dict(zip(names, getter(x)))
+    lt = d.get("linetype")
+    if lt is not None:
+        d["linetype"] = lt.value
+    return d
+
+
+def shapes_to_jsonable(xs) -> List[Dict[str, Any]]:
+    return [shape_to_jsonable(x) for x in (xs or [])]
+
+
+# JSON-backend: standaard de json-module (de wire-output is dan precies die van json.dumps).
+# JSON_BACKEND=orjson (opt-in, orjson staat niet in requirements.txt) is sneller, maar de output
+# verschilt: geen spaties, NaN/Infinity worden null, floats soms anders geformatteerd.
+_orjson = None
+if os.getenv("JSON_BACKEND", "").lower() == "orjson":
+    try:
+        import orjson as _orjson
+    except ImportError:
+        _orjson = None
+
+
+def dumps(obj: Any) -> str:
+    """json.dumps; met JSON_BACKEND=orjson via orjson (compacter, zie hierboven)."""
+    if _orjson is not None:
+        try:
+            return _orjson.dumps(obj).decode("utf-8")
+        except (TypeError, _orjson.JSONEncodeError):
+            pass  # bv. int > 64 bit uit de client-payload: standaard json kan het wel
+    return json.dumps(obj)
+
+
+class ErrorReply(str):
+    """Foutantwoord ({"type": "error", "error": ...}); metrics en logging herkennen het aan het
+    type, niet aan de tekst (die hangt van de JSON-backend af)."""
+    __slots__ = ()
+
+
+def error_reply(error: str) -> ErrorReply:
+    return ErrorReply(json.dumps({"type": "error", "error": error}))
+
+
 # Helper om PNG-bestanden als base64 mee te sturen (websocket heeft geen HTTP caching-headers,
 # we laten de frontend zelf een cache bijhouden op basis van filename).
+# De base64-strings komen uit de gedeelde asset-cache (assetcache.py): geen disk I/O bij herhaling.
+# Welke PNG's de client al heeft wordt niet hier bepaald maar in backend._deliver_png_payloads, op de
+# hash van wat echt meegaat (origineel of verkleinde variant, zie assetcache.py).
 def load_pngs_as_b64(assets_dir: Path, filenames: List[str]) -> Dict[str, str]:
     out: Dict[str, str] = {}
     for fn in filenames:
-        p = (assets_dir / fn)
-        data = p.read_bytes()
-        out[fn] = base64.b64encode(data).decode("ascii")
+        if fn not in out:
+            out[fn] = get_asset(assets_dir, fn).b64
     return out
 
+
+async def aload_pngs_as_b64(assets_dir: Path, filenames: List[str]) -> Dict[str, str]:
+    """Async load_pngs_as_b64: inlezen/encoden in de thread-pool, de event loop blijft vrij."""
+    names = list(dict.fromkeys(filenames))
+    entries = await asyncio.gather(*(aget_asset(assets_dir, fn) for fn in names))
+    return {fn: e.b64 for fn, e in zip(names, entries)}
+
+
+async def adumps(obj: Any, size_hint: int = 0) -> str:
+    """dumps(); vanaf BIG_DUMPS_BYTES (size_hint, bv. totale base64-lengte) in de thread-pool."""
+    if size_hint >= BIG_DUMPS_BYTES:
+        return await workpool.run(dumps, obj)
+    return dumps(obj)
+
+
+def png_hashes(assets_dir: Path, filenames) -> Dict[str, str]:
+    """{filename: content-hash}; de frontend bewaart die naast zijn imageCache."""
+    return {fn: get_asset(assets_dir, fn).digest for fn in filenames}
+
+
+# Binary asset-frame (opt-in via {"type": "hello", "transport": "binary"}):
+#   b"ASET" | u16 len(name) | name (utf-8) | u8 len(hash) | hash (ascii) | u32 len(data) | data
+# Big-endian. De PNG-bytes volgen direct op de header (als tweede fragment van hetzelfde bericht).
+ASSET_FRAME_MAGIC = b"ASET"
+
+
+def pack_asset_frame_header(name: str, digest: str, length: int) -> bytes:
+    n = name.encode("utf-8")
+    h = digest.encode("ascii")
+    return b"".join((ASSET_FRAME_MAGIC, struct.pack("!H", len(n)), n,
+                     struct.pack("!B", len(h)), h, struct.pack("!I", length)))
+
 __all__ = [
     "LineType", "MessageType",
     "Rectangle", "Triangle", "Arrow", "Image",
-    "Message", "load_pngs_as_b64",
+    "Message", "shape_to_jsonable", "shapes_to_jsonable", "dumps", "adumps",
+    "ErrorReply", "error_reply",
+    "load_pngs_as_b64", "aload_pngs_as_b64", "png_hashes",
+    "ASSET_FRAME_MAGIC", "pack_asset_frame_header",
 ]
 # Einde backend/protocol.py
\ No newline at end of file
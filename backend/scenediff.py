@@ -0,0 +1,82 @@
+# backend/scenediff.py
+from __future__ import annotations
+from typing import Any, Dict, List
+
+# Scène-diff per verbinding (aan te zetten met {"type": "hello", "diff": true}).
+# De backend onthoudt de laatst verstuurde scène; de volgende view gaat als patch:
+#   "patch": {"rectangles": {"remove": [key, ...],
+#                            "change": [{"key": key, "fields": {veld: waarde, ...}}, ...],
+#                            "add":    [{"key": key, "item": {...}}, ...],
+#                            "order":  [key, ...]},   # alleen als de volgorde afwijkt van
+#             ...}                                    # (oude keys zonder removes) + (nieuwe keys)
+# Elementen worden herkend aan `name`; dubbele namen binnen één lijst krijgen "#2", "#3", ...
+# (zelfde regel als DrawCanvas.sceneKeys). Een veld dat verdwijnt staat als null in "fields".
+
+SCENE_KEYS = ("rectangles", "triangles", "arrows", "images")
+
+_MISSING = object()
+
+
+def is_scene_type(messagetype: str) -> bool:
+    """SHOW*-berichten dragen een scène; RUNSIMULATION e.d. niet (die raken de diff-state niet)."""
+    return messagetype.startswith("SHOW")
+
+
+def element_keys(items: List[Dict[str, Any]]) -> List[str]:
+    seen: Dict[str, int] = {}
+    keys = []
+    for it in items:
+        name = str(it.get("name", ""))
+        n = seen.get(name, 0) + 1
+        seen[name] = n
+        keys.append(name if n == 1 else f"{name}#{n}")
+    return keys
+
+
+def diff_list(old: List[Dict[str, Any]], new: List[Dict[str, Any]]) -> Dict[str, Any]:
+    old_map = dict(zip(element_keys(old), old))
+    new_keys = element_keys(new)
+    new_map = dict(zip(new_keys, new))
+
+    remove = [k for k in old_map if k not in new_map]
+    change = []
+    add = []
+    for k, item in zip(new_keys, new):
+        prev = old_map.get(k)
+        if prev is None:
+            add.append({"key": k, "item": item})
+            continue
+        if prev == item:
+            continue
+        fields = {f: v for f, v in item.items() if prev.get(f, _MISSING) != v}
+        fields.update({f: None for f in prev if f not in item})
+        change.append({"key": k, "fields": fields})
+
+    out: Dict[str, Any] = {}
+    if remove:
+        out["remove"] = remove
+    if change:
+        out["change"] = change
+    if add:
+        out["add"] = add
+    # volgorde bij de client na remove + append van de adds; afwijkend → expliciet meesturen
+    implied = [k for k in old_map if k in new_map] + [k for k in new_keys if k not in old_map]
+    if implied != new_keys:
+        out["order"] = new_keys
+    return out
+
+
+def diff_scene(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Minimale patch van `old` naar `new` (beide jsonable scènes); {} = geen verschil."""
+    patch = {}
+    for k in SCENE_KEYS:
+        d = diff_list(old.get(k) or [], new.get(k) or [])
+        if d:
+            patch[k] = d
+    return patch
+
+
+def scene_of(resp: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+    return {k: resp.get(k) or [] for k in SCENE_KEYS}
+
+__all__ = ["SCENE_KEYS", "is_scene_type", "element_keys", "diff_list", "diff_scene", "scene_of"]
@@ -0,0 +1,118 @@
+# backend/scenes.py
+from __future__ import annotations
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, List, Mapping, Tuple
+
+import numpy as np
+
+from protocol import MessageType, LineType, Rectangle, Triangle, Arrow, Image, shape_to_jsonable
+from hittest import SceneIndex
+from viewcache import VIEW_CACHE, PreparedView, model
+from workpool import single_flight
+
+# Scene-compiler voor de proces-achtige views (SHOWPROCESS/CONTROL/INFORMATION/ORGANIZATION).
+# Het model (ModelData_RectangelsLinesAndTriangles) is genormaliseerd 0..1; hier wordt het in één
+# keer (NumPy) naar pixels geschaald. Elke view = basismodel + declaratieve Overlay (veld-overrides
+# per elementnaam, extra images). Gecompileerde scènes staan in VIEW_CACHE onder
+# (messagetype, canvasbreedte, canvashoogte), dus een client die zijn echte canvasmaat in
+# `numbers` meestuurt betaalt alleen de eerste keer voor de build.
+
+# Default canvasmaat (zoals de handlers altijd gebruikten); clients mogen numbers=[w, h] sturen
+CANVAS_W = 1400
+CANVAS_H = 725
+MIN_CANVAS, MAX_CANVAS = 100, 8000
+
+SCENE_LISTS = (
+    ("rectangles", "RECTANGLES", Rectangle),
+    ("triangles", "TRIANGLES", Triangle),
+    ("arrows", "LINES", Arrow),
+    ("images", "IMAGES", Image),
+)
+# welke velden met de breedte resp. hoogte schalen
+_X_FIELDS = ("x", "w", "x1", "x2")
+_Y_FIELDS = ("y", "h", "y1", "y2")
+_COORDS: Dict[type, Tuple[str, ...]] = {
+    cls: tuple(f.name for f in fields(cls) if f.name in _X_FIELDS + _Y_FIELDS)
+    for _, _, cls in SCENE_LISTS
+}
+
+
+@dataclass(frozen=True)
+class Overlay:
+    """Declaratieve aanpassing van het basismodel voor één view.
+    set:        {elementnaam: {veld: waarde}}; coördinaten genormaliseerd (0..1), ze schalen mee.
+    add_images: extra (genormaliseerde) Images, achter de model-images aan."""
+    set: Mapping[str, Mapping[str, Any]] = field(default_factory=dict)
+    add_images: Tuple[Image, ...] = ()
+
+
+def canvas_size(numbers) -> Tuple[int, int]:
+    """Canvasmaat uit numbers=[w, h] (afgerond, begrensd), anders de default."""
+    try:
+        w, h = int(round(float(numbers[0]))), int(round(float(numbers[1])))
+    except (TypeError, ValueError, IndexError, KeyError):
+        return CANVAS_W, CANVAS_H
+    if not (MIN_CANVAS <= w <= MAX_CANVAS and MIN_CANVAS <= h <= MAX_CANVAS):
+        return CANVAS_W, CANVAS_H
+    return w, h
+
+
+def _linetype(lt) -> str:
+    if isinstance(lt, LineType):
+        return lt.value
+    name = str(lt or "solid").lower()
+    if name == "solid":
+        return LineType.SOLID.value
+    if name == "dashed":
+        return LineType.DASHED.value
+    # "double" or unknown -> best-fit dotted
+    return LineType.DOTTED.value
+
+
+def _compile_list(items: List[Any], cls: type, overlay: Overlay, w: int, h: int) -> List[Dict[str, Any]]:
+    dicts = [shape_to_jsonable(it) if not isinstance(it, dict) else dict(it) for it in items]
+    for d in dicts:
+        over = overlay.set.get(d.get("name"))
+        if over:
+            d.update(over)
+        if "linetype" in d:
+            d["linetype"] = _linetype(d["linetype"])
+    coords = _COORDS[cls]
+    if not dicts or not coords:
+        return dicts
+    # alle coördinaten in één matrix, één vermenigvuldiging met de schaalvector
+    scale = np.array([w if c in _X_FIELDS else h for c in coords], dtype=np.float64)
+    m = np.array([[d[c] for c in coords] for d in dicts], dtype=np.float64) * scale
+    for d, row in zip(dicts, m.tolist()):
+        d.update(zip(coords, row))
+    return dicts
+
+
+def compile_scene(overlay: Overlay, w: int = CANVAS_W, h: int = CANVAS_H, base=model) -> Dict[str, List[Dict[str, Any]]]:
+    """Genormaliseerd model + overlay -> jsonable pixel-scène voor een canvas van w x h."""
+    scene = {}
+    for key, attr, cls in SCENE_LISTS:
+        items = list(getattr(base, attr, []))
+        if key == "images":
+            items += list(overlay.add_images)
+        scene[key] = _compile_list(items, cls, overlay, w, h)
+    return scene
+
+
+async def acompile_view(mt: MessageType, overlay: Overlay, numbers=None) -> PreparedView:
+    """Gecachte PreparedView voor deze view op de canvasmaat uit `numbers`; de eerste build in de thread-pool."""
+    w, h = canvas_size(numbers or [])
+    return await VIEW_CACHE.aget((mt, w, h), lambda: PreparedView(mt.value, compile_scene(overlay, w, h)))
+
+
+async def ahit_index(mt: MessageType, overlay: Overlay, numbers=None) -> SceneIndex:
+    """Hit-test-index (hittest.py) van deze view op de canvasmaat uit `numbers`; de eerste build
+    in de thread-pool, daarna hangt hij aan de gecachte PreparedView."""
+    view = await acompile_view(mt, overlay, numbers)
+    if view.indexed:
+        return view.index()
+    return await single_flight(("hitindex", mt, canvas_size(numbers or [])), view.index)
+
+
+__all__ = ["CANVAS_W", "CANVAS_H", "Overlay", "canvas_size", "compile_scene", "acompile_view",
+           "ahit_index"]
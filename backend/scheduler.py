@@ -0,0 +1,165 @@
+# backend/scheduler.py
+from __future__ import annotations
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, List, Optional, Tuple
+
+from scenediff import is_scene_type
+
+# Per-verbinding scheduler: de WS-handler blijft frames lezen terwijl een worker-task de requests
+# één voor één bouwt en verstuurt. Twee regels:
+#   1) een nieuwere view-request (SHOW*) vervangt oudere view-requests die nog niet gebouwd of
+#      verstuurd zijn: wachtende worden weggegooid, een lopende build wordt gecanceld;
+#   2) al het andere (RUNSIMULATION, ping, hello, asset, foutmeldingen) wordt nooit gedropt en
+#      houdt zijn volgorde.
+# Een build die klaar is wordt altijd verstuurd (nooit cancelen tijdens send); per-verbinding
+# state (known_assets, diff-scène) wordt pas bij het serialiseren bijgewerkt, dus een gecancelde
+# build laat geen sporen na.
+
+log = logging.getLogger("alignment-backend")
+
+# zoveel niet-dropbare requests mogen wachten voordat de lezer pauzeert (backpressure)
+MAX_PENDING = 64
+
+_NON_VIEW_TYPES = ("ping", "hello", "asset")
+
+Build = Callable[[Any, List[Any]], Awaitable[str]]
+Deliver = Callable[[List[Any], str], Awaitable[None]]
+Interrupt = Callable[[Any], None]
+# report(msg, in_bytes, frames, resp, (wachttijd, build, send) in s), na elke verstuurde request
+Report = Callable[[Any, int, List[Any], str, Tuple[float, float, float]], None]
+
+
+def is_view_request(msg: Any) -> bool:
+    """SHOW*-request (mag vervangen worden door een nieuwere); al het andere niet."""
+    if not isinstance(msg, dict):
+        return False
+    if str(msg.get("type") or "").lower() in _NON_VIEW_TYPES:
+        return False
+    return is_scene_type(str(msg.get("messagetype") or ""))
+
+
+class Job:
+    __slots__ = ("msg", "view", "reply", "size", "received")
+
+    def __init__(self, msg: Any = None, view: bool = False, reply: Optional[str] = None, size: int = 0):
+        self.msg = msg        # geparste request (of None bij ongeldige JSON)
+        self.view = view
+        self.reply = reply    # kant-en-klaar antwoord (bv. foutmelding), geen build nodig
+        self.size = size      # lengte van het tekstframe
+        self.received = time.perf_counter()
+
+
+class ConnectionScheduler:
+    """Wachtrij + worker voor één verbinding. `build(msg, frames)` maakt de JSON-string
+    (en vult eventueel binary frames), `deliver(frames, resp)` verstuurt ze. `interrupt(msg)` (optioneel)
+    ziet elke request al bij binnenkomst, vóór de wachtrij (bv. een reset die een lopende run afbreekt);
+    `report(...)` (optioneel) krijgt na het versturen de groottes en tijden (logging, zie msglog.py)."""
+
+    def __init__(self, build: Build, deliver: Deliver, max_pending: int = MAX_PENDING,
+                 interrupt: Optional[Interrupt] = None, report: Optional[Report] = None):
+        self._build = build
+        self._deliver = deliver
+        self._interrupt = interrupt
+        self._report = report
+        self.max_pending = max_pending
+        self._queue: Deque[Job] = deque()
+        self._wake = asyncio.Event()
+        self._space = asyncio.Event()
+        self._space.set()
+        self._task: Optional[asyncio.Task] = None   # lopende build
+        self._task_view = False
+        self._closed = False
+        self.dropped = 0
+
+    async def submit(self, text: str) -> None:
+        """Tekstframe van de client inplannen."""
+        try:
+            msg = json.loads(text)
+        except json.JSONDecodeError:
+            msg = None
+        if self._interrupt is not None:
+            self._interrupt(msg)
+        view = is_view_request(msg)
+        if view:
+            self._supersede()
+        else:
+            await self._wait_for_space()
+        self._push(Job(msg, view, size=len(text)))
+
+    async def submit_reply(self, reply: str) -> None:
+        """Vast antwoord (bv. foutmelding) in volgorde met de rest versturen."""
+        await self._wait_for_space()
+        self._push(Job(reply=reply))
+
+    async def run(self) -> None:
+        """Worker-loop; draait tot close() (of tot de verbinding dicht is)."""
+        while not self._closed:
+            job = await self._next()
+            frames: List[Any] = []
+            resp = job.reply
+            t_start = time.perf_counter()
+            if resp is None:
+                self._task = asyncio.ensure_future(self._build(job.msg, frames))
+                self._task_view = job.view
+                try:
+                    resp = await self._task
+                except asyncio.CancelledError:
+                    if self._closed or not self._task.cancelled():
+                        raise  # de worker zelf wordt gestopt
+                    self.dropped += 1
+                    log.info("view request superseded (build cancelled)")
+                    continue
+                finally:
+                    self._task = None
+            t_built = time.perf_counter()
+            await self._deliver(frames, resp)
+            if self._report is not None:
+                t_sent = time.perf_counter()
+                self._report(job.msg, job.size, frames, resp,
+                             (t_start - job.received, t_built - t_start, t_sent - t_built))
+
+    def close(self) -> None:
+        self._closed = True
+        if self._task is not None:
+            self._task.cancel()
+        self._queue.clear()
+        self._wake.set()
+
+    # ---- intern ----
+    def _supersede(self) -> None:
+        before = len(self._queue)
+        self._queue = deque(j for j in self._queue if not j.view)
+        dropped = before - len(self._queue)
+        if dropped:
+            self.dropped += dropped
+            log.info("dropped %d pending view request(s)", dropped)
+        if self._task is not None and self._task_view and not self._task.done():
+            self._task.cancel()
+
+    def _push(self, job: Job) -> None:
+        self._queue.append(job)
+        self._wake.set()
+        if len(self._queue) >= self.max_pending:
+            self._space.clear()
+
+    async def _wait_for_space(self) -> None:
+        while len(self._queue) >= self.max_pending and not self._closed:
+            await self._space.wait()
+
+    async def _next(self) -> Job:
+        while not self._queue:
+            self._wake.clear()
+            await self._wake.wait()
+            if self._closed:
+                raise asyncio.CancelledError
+        job = self._queue.popleft()
+        if len(self._queue) < self.max_pending:
+            self._space.set()
+        return job
+
+
+__all__ = ["MAX_PENDING", "ConnectionScheduler", "is_view_request"]
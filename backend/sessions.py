@@ -0,0 +1,383 @@
+# backend/sessions.py
+from __future__ import annotations
+import hashlib
+import mmap
+import os
+import re
+import secrets
+import struct
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - geen gedeelde tabel zonder fcntl (Windows)
+    fcntl = None
+
+import simulate
+
+# Sessie-registry: simulatie-state per sessie-id (uit {"type": "hello", "session": ...}).
+# Eén vaste NumPy slot-tabel (open addressing op een 64-bit hash van het id):
+#   keys[cap] int64      0 = leeg, -1 = verwijderd
+#   seen[cap] float64    laatste gebruik (epoch s) -> TTL en LRU-eviction
+#   version[cap] int64   optimistische concurrency: commit slaagt alleen op de gelezen versie
+#   state[cap, W]        simulate.STATE_SIZE floats per sessie
+#   snap_day[cap, R]     snapshots (tijdreizen): dag + 1 van keyframe r, 0 = leeg
+#   snap_state[cap, R, W]  keyframe-states: om de SNAPSHOT_EVERY dagen één, in een ring van
+#                        SNAPSHOT_RING per sessie (keyframe van dag d op plek (d / EVERY) % RING)
+# Het geheugen is dus vast begrensd (SESSION_MAX sessies; is de tabel vol, dan gaat de langst
+# ongebruikte eruit). Geen globale lock: een update leest de rij, rekent zonder lock en schrijft
+# terug als de versie nog klopt (anders opnieuw). In multi-worker mode (workers.py) staat de tabel
+# in een gedeeld bestand (mmap) en beschermt een fcntl byte-range lock per slot de korte
+# lees/schrijf-stukjes, zodat een client op elke worker dezelfde state ziet.
+# Terugspoelen naar dag t (rewind/branch) = keyframe van dag floor(t / EVERY) x EVERY + minder dan
+# EVERY dagen opnieuw simuleren (deterministisch, dus exact dezelfde state); de dagen tussen twee
+# keyframes hoeven dus niet opgeslagen te worden. Wat ouder is dan de ring kan niet meer terug.
+
+SESSION_TTL_S = float(os.getenv("SESSION_TTL_S", str(2 * 3600)))
+SESSION_MAX = int(os.getenv("SESSION_MAX", "4096"))
+SWEEP_INTERVAL_S = 30.0
+SNAPSHOT_EVERY = int(os.getenv("SNAPSHOT_EVERY", "14"))
+SNAPSHOT_RING = int(os.getenv("SNAPSHOT_RING", "32"))
+
+_EMPTY, _DELETED = 0, -1
+_HEADER = struct.Struct("<4sIIII")   # magic, capacity, state-breedte, ring, snapshot-interval
+_MAGIC = b"SESS"
+_SESSION_ID = re.compile(r"^[A-Za-z0-9_-]{8,128}$")
+
+
+def new_session_id() -> str:
+    return secrets.token_urlsafe(16)
+
+
+def parse_session_id(raw) -> Optional[str]:
+    """Client-sessie-id opschonen: 8..128 tekens [A-Za-z0-9_-], anders None."""
+    return raw if isinstance(raw, str) and _SESSION_ID.match(raw) else None
+
+
+class UnknownSession(LookupError):
+    """Sessie-id dat niet (meer) in de tabel staat: nooit aangemaakt, of verlopen (TTL/LRU-eviction)."""
+
+    def __init__(self, session_id: str):
+        super().__init__(f"unknown or expired session: {session_id}")
+        self.session_id = session_id
+
+
+def _key(session_id: str) -> int:
+    k = int.from_bytes(hashlib.blake2b(session_id.encode(), digest_size=8).digest(), "little", signed=True)
+    return k if k not in (_EMPTY, _DELETED) else 1
+
+
+def _capacity(max_sessions: int) -> int:
+    # load factor <= 0.5 houdt de probe-reeksen kort
+    cap = 16
+    while cap < 2 * max_sessions:
+        cap *= 2
+    return cap
+
+
+def table_bytes(capacity: int, width: int, ring: int = SNAPSHOT_RING) -> int:
+    return _HEADER.size + capacity * (8 * 3 + 8 * width) + capacity * ring * (8 + 8 * width)
+
+
+class SessionTable:
+    def __init__(self, max_sessions: int = SESSION_MAX, ttl_s: float = SESSION_TTL_S,
+                 path: Optional[Path] = None, create: bool = False,
+                 ring: int = SNAPSHOT_RING, every: int = SNAPSHOT_EVERY):
+        self.max_sessions = max_sessions
+        self.ttl_s = ttl_s
+        self.capacity = cap = _capacity(max_sessions)
+        self.width = w = simulate.STATE_SIZE
+        self.ring = ring = max(1, ring)
+        self.every = every = max(1, every)
+        size = table_bytes(cap, w, ring)
+        self._fd: Optional[int] = None
+        if path is None:
+            buf = mmap.mmap(-1, size)  # anoniem: pagina's worden pas bij gebruik echt geheugen
+            _HEADER.pack_into(buf, 0, _MAGIC, cap, w, ring, every)
+        else:
+            if create:
+                with open(path, "wb") as f:
+                    f.write(_HEADER.pack(_MAGIC, cap, w, ring, every))
+                    f.truncate(size)
+            self._fd = os.open(path, os.O_RDWR)
+            buf = mmap.mmap(self._fd, size)
+            magic, *layout = _HEADER.unpack_from(buf, 0)
+            if magic != _MAGIC or tuple(layout) != (cap, w, ring, every):
+                raise ValueError(f"session table {path}: layout mismatch ({layout}, expected {[cap, w, ring, every]})")
+        self._buf = buf
+        off = _HEADER.size
+        self.keys = np.frombuffer(buf, dtype=np.int64, count=cap, offset=off)
+        self.seen = np.frombuffer(buf, dtype=np.float64, count=cap, offset=off + 8 * cap)
+        self.version = np.frombuffer(buf, dtype=np.int64, count=cap, offset=off + 16 * cap)
+        self.state = np.frombuffer(buf, dtype=np.float64, count=cap * w, offset=off + 24 * cap).reshape(cap, w)
+        off += cap * (24 + 8 * w)
+        self.snap_day = np.frombuffer(buf, dtype=np.int64, count=cap * ring, offset=off).reshape(cap, ring)
+        self.snap_state = np.frombuffer(buf, dtype=np.float64, count=cap * ring * w,
+                                        offset=off + 8 * cap * ring).reshape(cap, ring, w)
+        self._last_sweep = 0.0
+        self.evictions = 0
+
+    # ---- publiek ----
+    def create(self, session_id: str) -> bool:
+        """Sessie aanmaken (dag 0) als ze niet bestaat: nieuwe verbinding, hello, reset.
+        True als ze al bestond. Alle andere methoden geven UnknownSession voor een onbekende sessie."""
+        key = _key(session_id)
+        existed = self._probe(key)[0] >= 0
+        self._slot_for(key)
+        return existed
+
+    def get(self, session_id: str) -> np.ndarray:
+        """Kopie van de state van deze sessie."""
+        while True:
+            slot, key = self._find(session_id)
+            with self._locked(slot):
+                if self.keys[slot] == key:
+                    self.seen[slot] = time.time()
+                    return self.state[slot].copy()
+
+    def update(self, session_id: str, fn: Callable[[np.ndarray], np.ndarray]) -> np.ndarray:
+        """state = fn(state) voor deze sessie; fn draait zonder lock (mag dus duren) en wordt
+        opnieuw aangeroepen als een andere update voor dezelfde sessie er tussendoor kwam.
+        fn mag ook een matrix teruggeven (simulate.SimulateKeyframes): keyframes + als laatste rij de state."""
+        while True:
+            slot, key, state, ver = self._read(session_id)
+            new = np.asarray(fn(state), dtype=np.float64)
+            if self._commit(slot, key, ver, new):
+                return new[-1] if new.ndim == 2 else new
+
+    async def aupdate(self, session_id: str, fn: Callable[[np.ndarray], Awaitable[Optional[np.ndarray]]]
+                      ) -> Optional[np.ndarray]:
+        """update() met een async fn (simpool.py rekent in een ander proces); fn mag None geven
+        (afgebroken run): dan wordt er niets gecommit."""
+        while True:
+            slot, key, state, ver = self._read(session_id)
+            new = await fn(state)
+            if new is None:
+                return None
+            new = np.asarray(new, dtype=np.float64)
+            if self._commit(slot, key, ver, new):
+                return new[-1] if new.ndim == 2 else new
+
+    def history(self, session_id: str) -> Tuple[int, int]:
+        """(oudste dag waarnaar nog terug kan, huidige dag) van deze sessie."""
+        while True:
+            slot, key = self._find(session_id)
+            with self._locked(slot):
+                if self.keys[slot] != key:
+                    continue
+                days = self.snap_day[slot]
+                valid = days[days > 0]
+                current = simulate.DayOf(self.state[slot])
+                return (int(valid.min()) - 1 if valid.size else current), current
+
+    def rewind(self, session_id: str, day: int) -> np.ndarray:
+        """Deze sessie terugzetten naar `day`: keyframe + < SNAPSHOT_EVERY dagen opnieuw simuleren.
+        Latere keyframes vervallen (die horen niet meer bij deze tijdlijn)."""
+        while True:
+            slot, key, rows, ver = self._timeline(session_id, day)
+            if self._commit(slot, key, ver, rows[-1]):
+                return rows[-1]
+
+    def branch(self, session_id: str, day: int, new_id: str) -> np.ndarray:
+        """Nieuwe sessie `new_id` die op `day` van deze sessie begint, met dezelfde geschiedenis
+        (keyframes tot en met `day`); de oorspronkelijke sessie blijft ongewijzigd."""
+        rows = self._timeline(session_id, day)[2]
+        key = _key(new_id)
+        while True:
+            slot = self._slot_for(key)
+            with self._locked(slot):
+                ver = int(self.version[slot])
+            if self._commit(slot, key, ver, rows, replace_history=True):
+                return rows[-1]
+
+    def __contains__(self, session_id: str) -> bool:
+        return self._probe(_key(session_id))[0] >= 0
+
+    def sessions(self) -> int:
+        return int(np.count_nonzero(self._live()))
+
+    def stats(self):
+        return {"sessions": self.sessions(), "capacity": self.capacity, "max_sessions": self.max_sessions,
+                "bytes": table_bytes(self.capacity, self.width, self.ring), "evictions": self.evictions,
+                "snapshot_every": self.every, "snapshot_ring": self.ring}
+
+    # ---- intern ----
+    def _find(self, session_id: str) -> Tuple[int, int]:
+        """(slot, key) van een bestaande sessie, anders UnknownSession. De caller checkt onder de
+        slot-lock opnieuw of keys[slot] nog deze key is (een andere worker kan het slot net hebben
+        verdrongen en hergebruikt) en zoekt anders opnieuw."""
+        key = _key(session_id)
+        slot = self._probe(key)[0]
+        if slot < 0:
+            raise UnknownSession(session_id)
+        return slot, key
+
+    def _read(self, session_id: str) -> Tuple[int, int, np.ndarray, int]:
+        while True:
+            slot, key = self._find(session_id)
+            with self._locked(slot):
+                if self.keys[slot] == key:
+                    self.seen[slot] = time.time()
+                    return slot, key, self.state[slot].copy(), int(self.version[slot])
+
+    def _commit(self, slot: int, key: int, ver: int, new: np.ndarray, replace_history: bool = False) -> bool:
+        """new = state, of matrix keyframes + state (laatste rij); replace_history: alleen déze keyframes."""
+        rows = new if new.ndim == 2 else new[None, :]
+        with self._locked(slot):
+            if self.keys[slot] != key or self.version[slot] != ver:
+                return False
+            if replace_history:
+                self.snap_day[slot] = 0
+            self.state[slot] = rows[-1]
+            self._record(slot, rows)
+            self.version[slot] = ver + 1
+            self.seen[slot] = time.time()
+            return True
+
+    def _record(self, slot: int, rows: np.ndarray) -> None:
+        """Keyframes uit `rows` (dag veelvoud van every) in de ring zetten (onder de slot-lock).
+        Keyframes ná de nieuwe dag horen bij een oude tijdlijn (reset/rewind) en vervallen."""
+        days = self.snap_day[slot]
+        days[days > int(rows[-1][simulate.DAY]) + 1] = 0
+        for row in rows:
+            d = int(row[simulate.DAY])
+            if d % self.every == 0:
+                i = (d // self.every) % self.ring
+                days[i] = d + 1
+                self.snap_state[slot, i] = row
+
+    def _timeline(self, session_id: str, day: int) -> Tuple[int, int, np.ndarray, int]:
+        """(slot, key, keyframes t/m `day` + als laatste rij de state op `day`, versie) van deze sessie."""
+        while True:
+            slot, key = self._find(session_id)
+            with self._locked(slot):
+                if self.keys[slot] != key:
+                    continue
+                ver = int(self.version[slot])
+                current = simulate.DayOf(self.state[slot])
+                days = self.snap_day[slot].copy()
+                frames = self.snap_state[slot].copy()
+            break
+        if not 0 <= day <= current:
+            raise ValueError(f"day {day} is outside the simulated range 0..{current}")
+        base = day // self.every * self.every
+        i = (base // self.every) % self.ring
+        if days[i] != base + 1:
+            raise ValueError(f"day {day} is no longer in the snapshot history")
+        order = [j for j in np.argsort(days) if 0 < days[j] <= base + 1]
+        state = simulate.SimulateDays(frames[i], day - base)
+        rows = [frames[j] for j in order] + [state]
+        return slot, key, np.stack(rows), ver
+
+    def _live(self) -> np.ndarray:
+        return (self.keys != _EMPTY) & (self.keys != _DELETED)
+
+    def _slot_for(self, key: int) -> int:
+        """Slot van deze key; nieuwe sessie -> vrij slot claimen (eventueel na eviction). Alleen voor
+        create() en branch(): verder leidt een onbekende key tot UnknownSession (_find)."""
+        now = time.time()
+        slot, free = self._probe(key)
+        if slot < 0:
+            # eerst ruimte maken (kan tombstones opruimen), dan pas het vrije slot kiezen
+            self._make_room(now)
+            slot, free = self._probe(key)
+        if slot >= 0:
+            self.seen[slot] = now
+            return slot
+        with self._locked(free):
+            if self.keys[free] not in (_EMPTY, _DELETED):
+                return self._slot_for(key)  # net door een andere worker geclaimd
+            self.keys[free] = key
+            self.state[free] = simulate.NewState()
+            self.snap_day[free] = 0
+            self._record(free, self.state[free][None, :])
+            self.version[free] += 1
+            self.seen[free] = now
+        return free
+
+    def _probe(self, key: int) -> Tuple[int, int]:
+        """(slot van key of -1, eerste vrije slot in de probe-reeks)."""
+        mask = self.capacity - 1
+        i = key & mask
+        free = -1
+        for _ in range(self.capacity):
+            k = self.keys[i]
+            if k == key:
+                return i, free
+            if k == _EMPTY:
+                return -1, i if free < 0 else free
+            if k == _DELETED and free < 0:
+                free = i
+            i = (i + 1) & mask
+        return -1, free
+
+    def _make_room(self, now: float) -> None:
+        if now - self._last_sweep >= SWEEP_INTERVAL_S:
+            self._last_sweep = now
+            for slot in np.flatnonzero(self._live() & (self.seen < now - self.ttl_s)):
+                self._evict(int(slot), now - self.ttl_s)
+        live = self._live()
+        if np.count_nonzero(live) >= self.max_sessions:
+            seen = np.where(live, self.seen, np.inf)
+            self._evict(int(np.argmin(seen)), np.inf)
+
+    def _evict(self, slot: int, older_than: float) -> None:
+        with self._locked(slot):
+            if self.keys[slot] in (_EMPTY, _DELETED) or self.seen[slot] >= older_than:
+                return
+            self.keys[slot] = _DELETED
+            self.version[slot] += 1
+            self.evictions += 1
+        # staat er direct achter een leeg slot, dan hoeft deze (en de tombstones ervoor) geen
+        # tombstone te blijven: zo lopen probe-reeksen niet vol met verwijderde sessies
+        mask = self.capacity - 1
+        if self.keys[(slot + 1) & mask] != _EMPTY:
+            return
+        while self.keys[slot] == _DELETED:
+            with self._locked(slot):
+                if self.keys[slot] != _DELETED:
+                    break
+                self.keys[slot] = _EMPTY
+            slot = (slot - 1) & mask
+
+    def _locked(self, slot: int):
+        return _SlotLock(self._fd, _HEADER.size + 8 * slot)
+
+
+class _SlotLock:
+    """fcntl byte-range lock op keys[slot] (alleen bij een gedeelde tabel); anders no-op."""
+    __slots__ = ("fd", "start")
+
+    def __init__(self, fd: Optional[int], start: int):
+        self.fd = fd
+        self.start = start
+
+    def __enter__(self):
+        if self.fd is not None and fcntl is not None:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX, 8, self.start)
+
+    def __exit__(self, *exc):
+        if self.fd is not None and fcntl is not None:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN, 8, self.start)
+
+
+SESSIONS = SessionTable()
+
+
+def attach_shared(path: Path) -> None:
+    """Multi-worker mode: de proces-tabel vervangen door de gedeelde tabel van de supervisor."""
+    global SESSIONS
+    SESSIONS = SessionTable(path=path)
+
+
+def registry() -> SessionTable:
+    return SESSIONS
+
+
+__all__ = ["SESSION_TTL_S", "SESSION_MAX", "SNAPSHOT_EVERY", "SNAPSHOT_RING", "SessionTable", "UnknownSession",
+           "SESSIONS", "new_session_id",
+           "parse_session_id", "attach_shared", "registry", "table_bytes"]
@@ -0,0 +1,198 @@
+# backend/simpool.py
+from __future__ import annotations
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+import simulate
+
+# Process-pool voor simulatie-batches: SimulateDays is CPU-werk en hoort niet op de event loop
+# (blokkeert alle verbindingen) en ook niet in de thread-pool (GIL). De state gaat als ruwe
+# float64-bytes (STATE_SIZE x 8 bytes) heen en terug, dus pickling kost vrijwel niets.
+# Korte runs (<= SIM_INLINE_DAYS) draaien direct: dat is goedkoper dan de IPC.
+# run_matrix() verdeelt een matrix runs (Monte Carlo-sweeps, sweep.py) over alle processen.
+# Elke lopende run is geregistreerd per sessie: een reset/rewind (RUNSIMULATION numbers=[-1]/[-2]) of het
+# sluiten van de verbinding breekt hem af tussen twee batches; wat al gecommit was blijft staan.
+
+log = logging.getLogger("alignment-backend")
+
+SIM_PROCS = int(os.getenv("SIM_PROCS", str(os.cpu_count() or 1)))
+SIM_INLINE_DAYS = int(os.getenv("SIM_INLINE_DAYS", "7"))
+# grootste batch per pool-aanroep (en dus de granulariteit van commit en cancel)
+SIM_CHUNK_DAYS = int(os.getenv("SIM_CHUNK_DAYS", "365"))
+# langste run per RUNSIMULATION-request (elke dag kost pool-tijd en een rij in tsstore.py)
+SIM_MAX_DAYS = int(os.getenv("SIM_MAX_DAYS", "3650"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _keyframes(state: np.ndarray, days: int, every: int) -> Tuple[np.ndarray, np.ndarray]:
+    """simulate.SimulateKeyframes plus de dagrijen (SERIES_FIELDS) voor tsstore.py."""
+    series: List[List[float]] = []
+    rows = simulate.SimulateKeyframes(state, days, every, series)
+    return rows, np.array(series, dtype=np.float64).reshape(-1, len(simulate.SERIES_FIELDS))
+
+
+def _advance(blob: bytes, days: int, every: int) -> Tuple[bytes, bytes]:
+    """In het pool-proces: state-bytes -> bytes van keyframes + state na `days` dagen
+    (keyframes voor de snapshots in sessions.py) en de bytes van de dagrijen."""
+    rows, series = _keyframes(np.frombuffer(blob, dtype=np.float64), days, every)
+    return rows.tobytes(), series.tobytes()
+
+
+def _runs(blob: bytes, days: int, params: Dict[str, bytes]) -> bytes:
+    """In het pool-proces: een stuk van een run-matrix (simulate.SimulateRuns), parameters per rij."""
+    states = np.frombuffer(blob, dtype=np.float64).reshape(-1, simulate.STATE_SIZE)
+    p = {k: np.frombuffer(v, dtype=np.float64) for k, v in params.items()}
+    return simulate.SimulateRuns(states, days, p).tobytes()
+
+
+def pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: de backend heeft al threads (workpool), fork is dan niet veilig
+        _pool = ProcessPoolExecutor(max_workers=max(1, SIM_PROCS), mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def _noop() -> None:
+    return None
+
+
+def warm() -> None:
+    """Pool-processen alvast starten (spawn + numpy importeren duurt even), niet pas bij de eerste run."""
+    if SIM_PROCS > 0:
+        ex = pool()
+        for _ in range(SIM_PROCS):
+            ex.submit(_noop)
+
+
+def shutdown() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+class SimRun:
+    """Lopende simulatie van één sessie; cancel() breekt hem af bij de volgende batchgrens."""
+    __slots__ = ("session", "cancelled", "_fut")
+
+    def __init__(self, session: str):
+        self.session = session
+        self.cancelled = False
+        self._fut: Optional[asyncio.Future] = None
+
+    def cancel(self) -> None:
+        self.cancelled = True
+        if self._fut is not None:
+            self._fut.cancel()  # niet meer wachten; het pool-proces maakt de batch af, het resultaat vervalt
+
+    async def advance(self, state: np.ndarray, days: int, every: int) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """(keyframes (om de `every` dagen) + als laatste rij de state na `days` dagen, dagrijen), of
+        None als de run intussen gecanceld is."""
+        if self.cancelled:
+            return None
+        if days <= SIM_INLINE_DAYS or SIM_PROCS <= 0:
+            return _keyframes(state, days, every)
+        try:
+            self._fut = asyncio.get_running_loop().run_in_executor(pool(), _advance, state.tobytes(), days, every)
+        except (BrokenProcessPool, RuntimeError):
+            shutdown()
+            log.exception("simulation pool unavailable; running inline")
+            return _keyframes(state, days, every)
+        try:
+            blob, series = await self._fut
+        except asyncio.CancelledError:
+            task = asyncio.current_task()
+            if self.cancelled and (task is None or not task.cancelling()):
+                return None  # cancel() van deze run, niet van de task zelf (verbinding dicht)
+            raise
+        except BrokenProcessPool:
+            shutdown()
+            log.exception("simulation pool crashed; running inline")
+            return _keyframes(state, days, every)
+        finally:
+            self._fut = None
+        return (np.frombuffer(blob, dtype=np.float64).reshape(-1, simulate.STATE_SIZE).copy(),
+                np.frombuffer(series, dtype=np.float64).reshape(-1, len(simulate.SERIES_FIELDS)))
+
+
+# kleinere stukken dan dit zijn de IPC niet waard
+MIN_ROWS_PER_PROC = 64
+
+
+async def run_matrix(states: np.ndarray, days: int, params: Dict[str, np.ndarray]) -> np.ndarray:
+    """simulate.SimulateRuns verdeeld over de pool-processen: de rijen (runs) in SIM_PROCS stukken.
+    `params` per naam één waarde per rij. Zelfde uitkomst als SimulateRuns in één keer."""
+    n = len(states)
+    parts = max(1, min(SIM_PROCS, n // MIN_ROWS_PER_PROC))
+    if SIM_PROCS <= 0 or parts == 1 and n * days <= SIM_INLINE_DAYS * MIN_ROWS_PER_PROC:
+        return simulate.SimulateRuns(states, days, params)
+    bounds = np.linspace(0, n, parts + 1).astype(int)
+    loop = asyncio.get_running_loop()
+    try:
+        futs = [loop.run_in_executor(pool(), _runs, states[a:b].tobytes(), days,
+                                     {k: np.ascontiguousarray(v[a:b], dtype=np.float64).tobytes()
+                                      for k, v in params.items()})
+                for a, b in zip(bounds[:-1], bounds[1:])]
+        blobs = await asyncio.gather(*futs)
+    except BrokenProcessPool:
+        shutdown()
+        log.exception("simulation pool crashed; running inline")
+        return simulate.SimulateRuns(states, days, params)
+    return np.concatenate([np.frombuffer(b, dtype=np.float64).reshape(-1, simulate.STATE_SIZE) for b in blobs])
+
+
+_active: Dict[str, Set[SimRun]] = {}
+
+
+def start(session: str) -> SimRun:
+    run = SimRun(session)
+    _active.setdefault(session, set()).add(run)
+    return run
+
+
+def finish(run: SimRun) -> None:
+    runs = _active.get(run.session)
+    if runs is not None:
+        runs.discard(run)
+        if not runs:
+            del _active[run.session]
+
+
+def cancel_session(session: str) -> int:
+    """Alle lopende runs van deze sessie (in dit proces) afbreken; geeft het aantal."""
+    runs = _active.get(session, ())
+    for run in runs:
+        run.cancel()
+    return len(runs)
+
+
+# RUNSIMULATION numbers[0]: -1 = reset, -2 = terugspoelen, -3 = aftakken (zie handle_RUNSIMULATION)
+TIMELINE_COMMANDS = (-1, -2, -3)
+
+
+def is_reset(msg: Any) -> bool:
+    """RUNSIMULATION die de tijdlijn verandert (reset/rewind/branch): lopende runs moeten stoppen."""
+    if not isinstance(msg, dict) or msg.get("messagetype") != "RUNSIMULATION":
+        return False
+    numbers = msg.get("numbers")
+    try:
+        return bool(numbers) and int(numbers[0]) in TIMELINE_COMMANDS
+    except (TypeError, ValueError, KeyError, OverflowError):
+        return False   # OverflowError: int(1e400) (inf); draait in de interrupt-hook, mag nooit gooien
+
+
+def running() -> int:
+    return sum(len(r) for r in _active.values())
+
+
+__all__ = ["SIM_PROCS", "SIM_INLINE_DAYS", "SIM_CHUNK_DAYS", "SIM_MAX_DAYS", "TIMELINE_COMMANDS", "SimRun", "pool", "warm", "shutdown", "run_matrix", "start", "finish",
+           "cancel_session", "is_reset", "running"]
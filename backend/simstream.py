@@ -0,0 +1,126 @@
+# backend/simstream.py
+from __future__ import annotations
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import websockets
+
+import sessions
+import simpool
+import simulate
+import tsstore
+from simpool import SIM_CHUNK_DAYS
+
+# RUNSIMULATION-runs in batches: het rekenwerk gebeurt in simpool.py, elke batch wordt via
+# sessions.aupdate() gecommit. Tussen de batches bedient de event loop andere clients, een reset
+# kan de run afbreken en de gesimuleerde dagen blijven bewaard als de verbinding wegvalt.
+# Streaming (hello "stream"): in plaats van één antwoord na de hele run krijgt de client
+# tussentijds {"messagetype": "RUNSIMULATION", "numbers": [dag], "texts": ["progress"],
+# "progress": {...}} met alleen de KPI's die sinds de vorige update veranderd zijn, elke K dagen of
+# elke T ms (wat eerst komt). Het gewone antwoord van de handler is daarna de samenvatting.
+# Backpressure: staat er nog te veel in de send-buffer (trage client), dan wordt de update
+# overgeslagen; de volgende neemt de gemiste KPI-wijzigingen mee.
+# Na elke gecommitte batch gaan de dagrijen naar de tijdreeks van de sessie (tsstore.py).
+
+STREAM_EVERY_DAYS = int(os.getenv("SIM_STREAM_DAYS", "7"))
+STREAM_EVERY_MS = float(os.getenv("SIM_STREAM_MS", "100"))
+# boven zoveel bytes in de send-buffer slaan we progress-updates over
+STREAM_HIGH_WATER = 64 * 1024
+
+StreamConfig = Tuple[int, float]   # (elke K dagen, elke T ms)
+
+
+def parse_stream(raw, default: Optional[StreamConfig] = None) -> Optional[StreamConfig]:
+    """hello "stream": true/false of {"days": K, "ms": T}; ongeldig -> default."""
+    if raw is True:
+        return (STREAM_EVERY_DAYS, STREAM_EVERY_MS)
+    if raw is False or raw is None:
+        return None
+    if not isinstance(raw, dict):
+        return default
+    try:
+        days = int(raw.get("days", STREAM_EVERY_DAYS))
+        ms = float(raw.get("ms", STREAM_EVERY_MS))
+    except (TypeError, ValueError):
+        return default
+    return (max(1, days), max(10.0, ms)) if ms == ms else default
+
+
+def changed_kpis(old: Dict[str, float], new: Dict[str, float]) -> Dict[str, float]:
+    return {k: v for k, v in new.items() if old.get(k) != v}
+
+
+def _backlogged(ws) -> bool:
+    transport = getattr(ws, "transport", None)
+    return transport is not None and transport.get_write_buffer_size() > STREAM_HIGH_WATER
+
+
+async def run_days(ws, session_id: str, days: int, cfg: Optional[StreamConfig]) -> Tuple[Any, Dict[str, Any]]:
+    """`days` dagen simuleren voor deze sessie in batches via simpool.py, met progress-updates naar
+    `ws` als `cfg` gezet is. Geeft (eind-state, samenvatting) terug; "cancelled" in de samenvatting
+    als een reset de run afbrak."""
+    every_days, every_ms = cfg if cfg is not None else (SIM_CHUNK_DAYS, float("inf"))
+    max_chunk = min(every_days, SIM_CHUNK_DAYS)
+    table = sessions.registry()
+    state = table.get(session_id)
+    start_kpis = sent = simulate.Kpis(state)
+    t0 = last = time.perf_counter()
+    done = since = updates = skipped = 0
+    chunk = 1 if cfg is not None else max_chunk
+    run = simpool.start(session_id)
+    try:
+        while done < days:
+            n = min(chunk, days - done, every_days - since)
+            c0 = time.perf_counter()
+            batch: Dict[str, Any] = {}
+
+            async def advance(s, n=n, batch=batch):
+                out = await run.advance(s, n, table.every)
+                if out is None:
+                    return None
+                # aupdate kan opnieuw rekenen (sessie intussen gewijzigd): alleen de laatste poging telt
+                batch["start"], batch["series"] = s, out[1]
+                return out[0]
+
+            new = await table.aupdate(session_id, advance)
+            if new is None:
+                break  # gecanceld (reset): de vorige batches blijven gecommit
+            state = new
+            await tsstore.awrite(session_id, np.vstack([simulate.SeriesRow(batch["start"]), batch["series"]]))
+            now = time.perf_counter()
+            done += n
+            since += n
+            # batches groeien zolang ze ruim binnen het T-budget blijven (goedkope dagen: weinig commits)
+            if (now - c0) * 1e3 < every_ms / 4:
+                chunk = min(chunk * 2, max_chunk)
+            if done < days and (since >= every_days or (now - last) * 1e3 >= every_ms):
+                since, last = 0, now
+                if cfg is not None and _backlogged(ws):
+                    skipped += 1
+                elif cfg is not None:
+                    kpis = simulate.Kpis(state)
+                    msg = {"messagetype": "RUNSIMULATION", "numbers": [simulate.DayOf(state)], "texts": ["progress"],
+                           "progress": {"done": done, "total": days, "kpis": changed_kpis(sent, kpis)}}
+                    try:
+                        await ws.send(json.dumps(msg))
+                    except websockets.ConnectionClosed:
+                        break  # client weg: wat al gesimuleerd is blijft in de sessie staan
+                    sent = kpis
+                    updates += 1
+            await asyncio.sleep(0)
+    finally:
+        simpool.finish(run)
+    end_kpis = simulate.Kpis(state)
+    summary = {"days": done, "updates": updates, "skipped": skipped,
+               "ms": round((time.perf_counter() - t0) * 1e3, 2),
+               "kpis": end_kpis, "changed": changed_kpis(start_kpis, end_kpis)}
+    if run.cancelled:
+        summary["cancelled"] = True
+    return state, summary
+
+
+__all__ = ["STREAM_EVERY_DAYS", "STREAM_EVERY_MS", "StreamConfig", "parse_stream", "changed_kpis", "run_days"]
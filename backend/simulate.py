@@ -1,22 +1,263 @@
 # backend/simulate.py
 from __future__ import annotations
+import math
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
+import numpy as np
 
-# Global simulation day counter
+# Simulatie van de fietsfabriek uit ModelData_RectangelsLinesAndTriangles:
+#   voorraadpunten (triangles)   GRWheels, GRFrames, Components (ingekocht, via Purchase/Vendor*),
+#                                Wheels, Frames (ProduceWheels/ProduceFrames), FinProd (AssembleBike)
+#   activiteiten (rectangles)    Purchase, ProduceWheels, ProduceFrames, AssembleBike, Distribute,
+#                                SellProducts/Promise (orders), MakeForecast/MakePlanning, ManageMoney
+#   stromen (arrows)             materiaal Vendor* -> GR*/Components -> Produce* -> Wheels/Frames ->
+#                                AssembleBike -> FinProd -> Distribute -> Customer;
+#                                geld Customer -> Cash (CustomerToCash), Cash -> Vendor/Other.
+# De state van één simulatie is één float64-vector (STATE_FIELDS); sessions.py bewaart die per sessie.
+# Eén dag = _day(); N dagen = dezelfde kernel N keer over vooraf (vectorieel) berekende vraag, dus
+# SimulateDays(s, n) is bit-voor-bit gelijk aan n x SimulateDays(s, 1). De vraag per dag hangt alleen
+# af van (seed, dagnummer), niet van een RNG-volgorde. SimulateRuns() draait dezelfde kernel over
+# een hele matrix runs tegelijk (NumPy, voor sweeps).
+
+# ---- parameters ----
+LEAD_TIME = 5                # dagen tussen inkooporder en levering (Vendor -> GR*)
+COVER_DAYS = 3               # voorraaddoel in dagen vraag (MakePlanning)
+FORECAST_ALPHA = 0.2         # exponential smoothing (MakeForecast)
+BASE_DEMAND = 25.0           # fietsen per dag
+SEASON_AMPLITUDE = 0.2
+NOISE_AMPLITUDE = 0.2
+PRICE = 250.0                # per fiets (CustomerToCash)
+COST_GR_WHEEL = 15.0         # inkoopprijzen (CashToVendor)
+COST_GR_FRAME = 40.0
+COST_COMPONENT = 10.0
+FIXED_COST_PER_DAY = 1500.0  # CashToOther
+CAP_WHEELS = 60.0            # capaciteit per dag
+CAP_FRAMES = 30.0
+CAP_ASSEMBLE = 30.0
+CAP_DISTRIBUTE = 40.0
+# stuklijst: wiel = GRWheel + component, frame = GRFrame + component, fiets = 2 wielen + frame + 3 comp.
+WHEELS_PER_BIKE = 2.0
+COMPS_PER_BIKE = 3.0
+
+# instelbare parameters per run (Monte Carlo-sweeps, handle_RUNSWEEP); de defaults zijn het model hierboven
+PARAMS: Dict[str, float] = {
+    "ForecastAlpha": FORECAST_ALPHA,
+    "ForecastError": 0.0,        # relatieve fout (bias) van de forecast die planning en inkoop gebruiken
+    "CoverDays": float(COVER_DAYS),
+    "LotSize": 1.0,              # inkooporders naar boven afgerond op hele lots
+    "DemandNoise": NOISE_AMPLITUDE,
+}
+
+# ---- state-layout ----
+STOCKS = ("GRWheels", "GRFrames", "Wheels", "Frames", "FinProd", "Components")
+_PIPES = ("PipeGRWheels", "PipeGRFrames", "PipeComponents")
+KPI_FIELDS = ("Cash", "Backlog", "Ordered", "Shipped", "Revenue", "Purchases", "FixedCosts")
+STATE_FIELDS: Tuple[str, ...] = (
+    ("Day", "Seed", "Forecast") + STOCKS + KPI_FIELDS
+    + tuple(f"{p}{i}" for p in _PIPES for i in range(LEAD_TIME))
+)
+STATE_SIZE = len(STATE_FIELDS)
+FIELD = {name: i for i, name in enumerate(STATE_FIELDS)}
+DAY = FIELD["Day"]
+SEED = FIELD["Seed"]
+# wat per dag bewaard wordt voor grafieken (tsstore.py): dag + voorraden + KPI's
+SERIES_FIELDS: Tuple[str, ...] = ("Day",) + STOCKS + KPI_FIELDS
+SERIES_INDEX = [FIELD[name] for name in SERIES_FIELDS]
+_PIPE_START = {p: FIELD[f"{p}0"] for p in _PIPES}
+
+INITIAL: Dict[str, float] = {
+    "Forecast": BASE_DEMAND,
+    "GRWheels": 100.0, "GRFrames": 50.0, "Wheels": 60.0, "Frames": 30.0, "FinProd": 40.0,
+    "Components": 300.0, "Cash": 50_000.0,
+}
+
+# Global simulation day counter (oude, proces-brede API; de handlers gebruiken sessions.py)
 SimDayNumber: int = 0
 
-def SimulategameOneDay() -> int:
 
-    # do all the compex simulation stuff here
-    global SimDayNumber
-    SimDayNumber += 1
+def NewState(seed: int = 0) -> np.ndarray:
+    s = np.zeros(STATE_SIZE, dtype=np.float64)
+    for name, v in INITIAL.items():
+        s[FIELD[name]] = v
+    s[SEED] = seed
+    # pijplijn gevuld met het verbruik bij de basisvraag: de eerste LEAD_TIME dagen komt er gewoon spul binnen
+    for pipe, per_day in (("PipeGRWheels", WHEELS_PER_BIKE * BASE_DEMAND), ("PipeGRFrames", BASE_DEMAND),
+                          ("PipeComponents", (WHEELS_PER_BIKE + 1 + COMPS_PER_BIKE) * BASE_DEMAND)):
+        start = _PIPE_START[pipe]
+        s[start:start + LEAD_TIME] = per_day
+    return s
+
+
+def DayOf(state: np.ndarray) -> int:
+    return int(state[DAY])
+
+
+def Kpis(state: np.ndarray) -> Dict[str, float]:
+    """Dag, voorraden en KPI's van een state als {naam: waarde}."""
+    out = {"Day": float(state[DAY])}
+    out.update((name, float(state[FIELD[name]])) for name in STOCKS + KPI_FIELDS)
+    return out
+
+
+# seizoensfactor per dag van het jaar, één keer berekend (dezelfde tabel voor elke batchgrootte)
+_SEASON = 1.0 + SEASON_AMPLITUDE * np.sin(2.0 * np.pi * np.arange(365) / 365.0)
+_M1, _M2, _GOLDEN = np.uint64(0xBF58476D1CE4E5B9), np.uint64(0x94D049BB133111EB), np.uint64(0x9E3779B97F4A7C15)
+
+
+def _uniform(seeds, days) -> np.ndarray:
+    """splitmix64(seed, dag) -> [0, 1): exacte integer-rekenkunde, dus onafhankelijk van batchgrootte."""
+    with np.errstate(over="ignore"):
+        z = np.asarray(seeds, dtype=np.uint64) * _GOLDEN + np.asarray(days, dtype=np.uint64) + _GOLDEN
+        z = (z ^ (z >> np.uint64(30))) * _M1
+        z = (z ^ (z >> np.uint64(27))) * _M2
+        z = z ^ (z >> np.uint64(31))
+    return (z >> np.uint64(11)).astype(np.float64) * (1.0 / 9007199254740992.0)
+
+
+def Demand(seeds, days, noise_amplitude=NOISE_AMPLITUDE) -> np.ndarray:
+    """Vraag (hele fietsen) voor dagnummers `days`, per seed; broadcast (seeds[:, None], days[None, :]).
+    Seizoen + deterministische ruis uit (seed, dag): dezelfde dag geeft altijd dezelfde vraag."""
+    days = np.atleast_1d(np.asarray(days, dtype=np.int64))
+    seeds = np.atleast_1d(np.asarray(seeds, dtype=np.int64))
+    noise = 1.0 + noise_amplitude * (2.0 * _uniform(seeds, days) - 1.0)
+    return np.floor(BASE_DEMAND * _SEASON[days % 365] * noise)
+
+
+def _day(s: List, demand, p: Dict, mn: Callable, mx: Callable, fl: Callable) -> None:
+    """Eén dag voor state-kolommen `s` (floats of NumPy-arrays over runs), in place.
+    p = PARAMS (waarden float, of per run een array); mn/mx/fl = min/max/floor voor het betreffende
+    type; verder alleen + - * /."""
+    L = LEAD_TIME
+    cover, lot = p["CoverDays"], p["LotSize"]
+    gw, gf, pc = _PIPE_START["PipeGRWheels"], _PIPE_START["PipeGRFrames"], _PIPE_START["PipeComponents"]
+    # 1) leveringen van de vendors (Vendor* -> GR*/Components) en betaling (CashToVendor)
+    in_w, in_f, in_c = s[gw], s[gf], s[pc]
+    for start in (gw, gf, pc):
+        for i in range(L - 1):
+            s[start + i] = s[start + i + 1]
+        s[start + L - 1] = s[start] * 0.0
+    s[_GRW] = s[_GRW] + in_w
+    s[_GRF] = s[_GRF] + in_f
+    s[_CMP] = s[_CMP] + in_c
+    paid = in_w * COST_GR_WHEEL + in_f * COST_GR_FRAME + in_c * COST_COMPONENT
+    # 2) nieuwe orders (SellProducts/Promise) en forecast (MakeForecast)
+    s[_BACKLOG] = s[_BACKLOG] + demand
+    s[_ORDERED] = s[_ORDERED] + demand
+    s[_FC] = s[_FC] + p["ForecastAlpha"] * (demand - s[_FC])
+    fc = s[_FC] * (1.0 + p["ForecastError"])
+    # 3) productie volgens planning (MakePlanning): aanvullen tot COVER_DAYS voorraad
+    wheels = fl(mn(mn(CAP_WHEELS, s[_GRW]), mn(s[_CMP], mx(0.0, WHEELS_PER_BIKE * cover * fc - s[_WHL]))))
+    s[_GRW] = s[_GRW] - wheels
+    s[_CMP] = s[_CMP] - wheels
+    s[_WHL] = s[_WHL] + wheels
+    frames = fl(mn(mn(CAP_FRAMES, s[_GRF]), mn(s[_CMP], mx(0.0, cover * fc - s[_FRM]))))
+    s[_GRF] = s[_GRF] - frames
+    s[_CMP] = s[_CMP] - frames
+    s[_FRM] = s[_FRM] + frames
+    want = mx(0.0, s[_BACKLOG] + cover * fc - s[_FIN])
+    bikes = fl(mn(mn(mn(CAP_ASSEMBLE, want), s[_WHL] / WHEELS_PER_BIKE), mn(s[_FRM], s[_CMP] / COMPS_PER_BIKE)))
+    s[_WHL] = s[_WHL] - WHEELS_PER_BIKE * bikes
+    s[_FRM] = s[_FRM] - bikes
+    s[_CMP] = s[_CMP] - COMPS_PER_BIKE * bikes
+    s[_FIN] = s[_FIN] + bikes
+    # 4) uitleveren (Distribute -> Customer) en geld (CustomerToCash, CashToOther)
+    ship = mn(mn(CAP_DISTRIBUTE, s[_BACKLOG]), s[_FIN])
+    s[_FIN] = s[_FIN] - ship
+    s[_BACKLOG] = s[_BACKLOG] - ship
+    s[_SHIPPED] = s[_SHIPPED] + ship
+    s[_REVENUE] = s[_REVENUE] + ship * PRICE
+    s[_PURCH] = s[_PURCH] + paid
+    s[_FIXED] = s[_FIXED] + FIXED_COST_PER_DAY
+    s[_CASH] = s[_CASH] + ship * PRICE - paid - FIXED_COST_PER_DAY
+    # 5) inkoop (Purchase): voorraadpositie (voorraad + pijplijn) aanvullen tot (LEAD_TIME + COVER_DAYS) x verbruik,
+    #    afgerond naar boven op hele lots (LotSize 1 = geen afronding)
+    target = (L + cover) * fc
+    for start, onhand, per_unit in ((gw, s[_GRW], WHEELS_PER_BIKE), (gf, s[_GRF], 1.0),
+                                    (pc, s[_CMP], WHEELS_PER_BIKE + 1.0 + COMPS_PER_BIKE)):
+        position = onhand
+        for i in range(L):
+            position = position + s[start + i]
+        s[start + L - 1] = -fl(-fl(mx(0.0, target * per_unit - position)) / lot) * lot
+    s[DAY] = s[DAY] + 1.0
+
+
+_GRW, _GRF, _WHL, _FRM, _FIN, _CMP = (FIELD[n] for n in STOCKS)
+_FC = FIELD["Forecast"]
+_CASH, _BACKLOG, _ORDERED, _SHIPPED, _REVENUE, _PURCH, _FIXED = (FIELD[n] for n in KPI_FIELDS)
+
+
+def SimulateDays(state: np.ndarray, days: int, params: Optional[Dict[str, float]] = None,
+                 series: Optional[List] = None) -> np.ndarray:
+    """Nieuwe state na `days` gesimuleerde dagen (de input blijft ongewijzigd).
+    Met een lijst `series` komt daar per gesimuleerde dag de rij SERIES_FIELDS bij."""
+    if days <= 0:
+        return state.copy()
+    p = PARAMS if params is None else {**PARAMS, **params}
+    day0 = state[DAY]
+    demand = Demand(state[SEED], day0 + np.arange(days), p["DemandNoise"]).tolist()
+    s = state.tolist()  # één run: Python-floats zijn hier sneller dan NumPy-scalars
+    if series is None:
+        for d in demand:
+            _day(s, d, p, min, max, math.floor)
+    else:
+        for d in demand:
+            _day(s, d, p, min, max, math.floor)
+            series.append([s[i] for i in SERIES_INDEX])
+    return np.array(s, dtype=np.float64)
+
+
+def SeriesRow(state: np.ndarray) -> np.ndarray:
+    """De SERIES_FIELDS van één state (bv. dag 0 of na een reset)."""
+    return state[SERIES_INDEX].copy()
+
+
+def SimulateKeyframes(state: np.ndarray, days: int, every: int, series: Optional[List] = None) -> np.ndarray:
+    """Als SimulateDays, maar met de tussenliggende states op elke dag die een veelvoud van `every`
+    is (snapshots, zie sessions.py): rijen = die keyframes, de laatste rij is altijd de eind-state.
+    Zelfde uitkomst als SimulateDays (de batch wordt alleen op die dagen geknipt)."""
+    rows = []
+    day, end = DayOf(state), DayOf(state) + max(days, 0)
+    while day < end:
+        n = min(end, (day // every + 1) * every) - day
+        state = SimulateDays(state, n, series=series)
+        day += n
+        if day % every == 0 or day == end:
+            rows.append(state)
+    return np.stack(rows) if rows else state[None, :].copy()
+
+
+def SimulateRuns(states: np.ndarray, days: int, params: Optional[Dict[str, Any]] = None) -> np.ndarray:
+    """SimulateDays voor een matrix states (runs x STATE_SIZE) in één keer; zelfde uitkomst per rij.
+    `params` per naam een float (alle runs) of een array met één waarde per run."""
+    states = np.asarray(states, dtype=np.float64)
+    if days <= 0:
+        return states.copy()
+    p = {**PARAMS, **{k: np.asarray(v, dtype=np.float64) for k, v in (params or {}).items()}}
+    cols = [states[:, i].copy() for i in range(STATE_SIZE)]
+    noise = np.broadcast_to(p["DemandNoise"], (len(states),))[:, None]
+    demand = Demand(states[:, SEED][:, None], states[:, DAY][:, None] + np.arange(days)[None, :], noise)
+    for t in range(days):
+        _day(cols, demand[:, t], p, np.minimum, np.maximum, np.floor)
+    return np.stack(cols, axis=1)
+
+
+# ---- oude proces-brede API ----
+_global_state = NewState()
+
+
+def SimulategameOneDay() -> int:
+    global SimDayNumber, _global_state
+    _global_state = SimulateDays(_global_state, 1)
+    SimDayNumber = DayOf(_global_state)
     return SimDayNumber
 
 
 def ResetSimulation() -> int:
-   
-   # do all the cleanup work here
-   
-    global SimDayNumber
-    SimDayNumber =0;
-    return SimDayNumber
\ No newline at end of file
+    global SimDayNumber, _global_state
+    _global_state = NewState()
+    SimDayNumber = 0
+    return SimDayNumber
+
+
+__all__ = ["STATE_FIELDS", "STATE_SIZE", "STOCKS", "KPI_FIELDS", "SERIES_FIELDS", "FIELD", "PARAMS", "SeriesRow", "NewState", "DayOf", "Kpis",
+           "Demand", "SimulateDays", "SimulateKeyframes", "SimulateRuns", "SimulategameOneDay", "ResetSimulation"]
@@ -0,0 +1,87 @@
+# backend/sweep.py
+from __future__ import annotations
+import itertools
+import os
+import time
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+import simpool
+import simulate
+
+# Monte Carlo-sweeps (handle_RUNSWEEP): dezelfde simulatie vele keren, per instelling van de
+# parameters (simulate.PARAMS) `runs` runs met seeds seed, seed+1, ... Elke instelling gebruikt
+# dezelfde seeds (zelfde vraag), dus verschillen tussen instellingen komen van de parameters, niet
+# van toeval; met dezelfde seed en startdag is een sweep exact reproduceerbaar. Alle runs gaan als
+# één matrix naar simpool.run_matrix (verdeeld over de cores); terug gaan alleen percentielen per KPI.
+
+SWEEP_MAX_RUNS = int(os.getenv("SWEEP_MAX_RUNS", "20000"))          # runs x instellingen
+SWEEP_MAX_RUN_DAYS = int(os.getenv("SWEEP_MAX_RUN_DAYS", "2000000"))  # runs x instellingen x dagen (~16 MB vraag)
+SWEEP_MAX_SETTINGS = 64
+# de seed staat als float64 in de state (simulate.SEED) en wordt een int64 in Demand: exact tot 2**53
+SWEEP_MAX_SEED = 2 ** 53
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def parse_grid(texts: Sequence[Any]) -> List[Dict[str, float]]:
+    """texts = ["LotSize=1,50,100", "ForecastError=-0.2,0,0.2"] -> alle combinaties (kruisproduct);
+    geen parameters -> één instelling (de defaults). Onbekende naam of waarde -> ValueError."""
+    axes = []
+    for spec in texts or []:
+        if not isinstance(spec, str) or "=" not in spec:
+            continue  # bv. een label van de frontend
+        name, _, values = spec.partition("=")
+        name = name.strip()
+        if name not in simulate.PARAMS:
+            raise ValueError(f"unknown sweep parameter: {name} (known: {', '.join(simulate.PARAMS)})")
+        try:
+            vals = [float(v) for v in values.split(",") if v.strip()]
+        except ValueError:
+            raise ValueError(f"invalid values for {name}: {values}") from None
+        if not vals or not all(np.isfinite(vals)):
+            raise ValueError(f"invalid values for {name}: {values}")
+        if name == "LotSize" and min(vals) < 1:
+            raise ValueError("LotSize must be >= 1")
+        axes.append([(name, v) for v in vals])
+    settings = [dict(combo) for combo in itertools.product(*axes)]
+    if len(settings) > SWEEP_MAX_SETTINGS:
+        raise ValueError(f"too many settings: {len(settings)} (max {SWEEP_MAX_SETTINGS})")
+    return settings
+
+
+async def run_sweep(start: np.ndarray, runs: int, days: int, seed: int,
+                    settings: List[Dict[str, float]]) -> Dict[str, Any]:
+    """`runs` runs per instelling vanaf state `start`; percentielen per KPI per instelling."""
+    total = runs * len(settings)
+    if runs < 1 or days < 1:
+        raise ValueError("sweep needs runs >= 1 and days >= 1")
+    if not 0 <= seed <= SWEEP_MAX_SEED - runs:
+        raise ValueError(f"seed must be in 0..{SWEEP_MAX_SEED - runs} for {runs} runs")
+    if total > SWEEP_MAX_RUNS or total * days > SWEEP_MAX_RUN_DAYS:
+        raise ValueError(f"sweep too large: {total} runs x {days} days "
+                         f"(max {SWEEP_MAX_RUNS} runs, {SWEEP_MAX_RUN_DAYS} run-days)")
+    t0 = time.perf_counter()
+    states = np.repeat(start[None, :], total, axis=0)
+    states[:, simulate.SEED] = np.tile(seed + np.arange(runs), len(settings))
+    params = {name: np.repeat([s.get(name, default) for s in settings], runs)
+              for name, default in simulate.PARAMS.items()}
+    final = await simpool.run_matrix(states, days, params)
+    base = {name: start[simulate.FIELD[name]] for name in simulate.KPI_FIELDS}
+    out = []
+    for i, setting in enumerate(settings):
+        rows = final[i * runs:(i + 1) * runs]
+        kpis = {}
+        for name in simulate.KPI_FIELDS:
+            # KPI's zijn cumulatief (behalve Cash/Backlog); percentielen over de sweep-periode zelf
+            col = rows[:, simulate.FIELD[name]]
+            if name not in ("Cash", "Backlog"):
+                col = col - base[name]
+            kpis[name] = [round(float(v), 2) for v in np.percentile(col, PERCENTILES)]
+        out.append({"params": {**simulate.PARAMS, **setting}, "kpis": kpis})
+    return {"runs": runs, "days": days, "seed": seed, "start_day": simulate.DayOf(start),
+            "percentiles": list(PERCENTILES), "settings": out,
+            "ms": round((time.perf_counter() - t0) * 1e3, 2)}
+
+
+__all__ = ["SWEEP_MAX_RUNS", "SWEEP_MAX_RUN_DAYS", "SWEEP_MAX_SEED", "PERCENTILES", "parse_grid", "run_sweep"]
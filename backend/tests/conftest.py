@@ -0,0 +1,44 @@
+# backend/tests/conftest.py
+from __future__ import annotations
+import json
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+# De backend-modules zijn platte modules (import simulate, import tsstore, ...), net als bij
+# `python backend.py`: de backend-map moet dus op sys.path staan.
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+DRAWCANVAS_JS = BACKEND_DIR.parent / "frontend" / "DrawCanvas.js"
+
+
+@pytest.fixture
+def series_dir(tmp_path, monkeypatch):
+    """tsstore met een eigen TS_DIR per test; opruimen (_maybe_sweep) alleen als een test dat vraagt."""
+    import time
+    import tsstore
+    monkeypatch.setenv("TS_DIR", str(tmp_path))
+    monkeypatch.setattr(tsstore, "_dir", None)
+    monkeypatch.setattr(tsstore, "_last_sweep", time.time())
+    return tmp_path
+
+
+@pytest.fixture
+def drawcanvas():
+    """drawcanvas(fn, *args): DrawCanvas.<fn>(*args) in node (JSON erin en eruit); zonder node: skip."""
+    node = shutil.which("node")
+    if node is None:
+        pytest.skip("node not installed")
+    script = ("const D = require(process.argv[1]);"
+              "const a = JSON.parse(require('fs').readFileSync(0, 'utf8'));"
+              "process.stdout.write(JSON.stringify(D[a.fn](...a.args)));")
+
+    def call(fn, *args):
+        out = subprocess.run([node, "-e", script, str(DRAWCANVAS_JS)], input=json.dumps({"fn": fn, "args": args}),
+                             capture_output=True, text=True, check=True, timeout=30)
+        return json.loads(out.stdout)
+    return call
@@ -0,0 +1,104 @@
+# backend/tests/test_assetcache.py
+from __future__ import annotations
+import asyncio
+import base64
+import os
+
+import pytest
+
+from assetcache import AssetCache
+from protocol import load_pngs_as_b64
+
+
+def put(d, name, data):
+    p = d / name
+    p.write_bytes(data)
+    return p
+
+
+@pytest.fixture
+def assets(tmp_path):
+    for i in range(4):
+        put(tmp_path, f"a{i}.bin", bytes([i]) * 1000)
+    return tmp_path
+
+
+def test_hit_miss_and_content(assets):
+    cache = AssetCache()
+    e = cache.get(assets, "a1.bin")
+    assert e.data == b"\x01" * 1000
+    assert base64.b64decode(e.b64) == e.data
+    assert len(e.digest) == 16
+    assert cache.get(assets, "a1.bin") is e
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_changed_file_is_reread(assets):
+    cache = AssetCache()
+    old = cache.get(assets, "a0.bin")
+    p = put(assets, "a0.bin", b"changed")
+    os.utime(p, ns=(old.mtime_ns + 10**9, old.mtime_ns + 10**9))
+    new = cache.get(assets, "a0.bin")
+    assert new.data == b"changed" and new.digest != old.digest
+    # URL's met de oude hash verlopen
+    assert cache.lookup("a0.bin", old.digest) is None
+    assert cache.lookup("a0.bin", new.digest) is new
+
+
+def test_lru_bounded_in_bytes(assets):
+    one = AssetCache().get(assets, "a0.bin").nbytes
+    cache = AssetCache(max_bytes=3 * one)
+    for i in range(3):
+        cache.get(assets, f"a{i}.bin")
+    cache.get(assets, "a0.bin")           # a0 is nu het laatst gebruikt
+    cache.get(assets, "a3.bin")           # a1 valt eruit
+    assert cache.stats()["bytes"] <= cache.max_bytes
+    assert cache.stats()["entries"] == 3
+    assert cache.peek(assets, "a1.bin") is None
+    assert cache.peek(assets, "a0.bin") is not None
+    misses = cache.misses
+    cache.get(assets, "a1.bin")
+    assert cache.misses == misses + 1
+
+
+def test_too_big_is_returned_not_cached(assets):
+    cache = AssetCache(max_bytes=100)
+    e = cache.get(assets, "a2.bin")
+    assert e.data == b"\x02" * 1000
+    assert cache.stats()["entries"] == 0 and cache.stats()["bytes"] == 0
+
+
+def test_lookup_and_issued_survive_eviction(assets):
+    one = AssetCache().get(assets, "a0.bin").nbytes
+    cache = AssetCache(max_bytes=one)
+    e0 = cache.get(assets, "a0.bin")
+    assert cache.lookup("a0.bin", e0.digest) is e0
+    assert cache.lookup("a0.bin", "0" * 16) is None
+    cache.get(assets, "a1.bin")
+    assert cache.lookup("a0.bin", e0.digest) is None   # uit de LRU
+    assert cache.issued("a0.bin", e0.digest, 0)        # maar wel ooit uitgegeven
+    assert not cache.issued("a0.bin", e0.digest, 640)
+    assert not cache.issued("a0.bin", "0" * 16, 0)
+
+
+def test_missing_file(assets):
+    with pytest.raises(FileNotFoundError):
+        AssetCache().get(assets, "nope.bin")
+
+
+def test_load_pngs_as_b64_dedups(assets):
+    out = load_pngs_as_b64(assets, ["a0.bin", "a1.bin", "a0.bin"])
+    assert list(out) == ["a0.bin", "a1.bin"]
+    assert base64.b64decode(out["a1.bin"]) == b"\x01" * 1000
+
+
+def test_aget_asset_single_read(assets, monkeypatch):
+    import assetcache
+    cache = AssetCache()
+    monkeypatch.setattr(assetcache, "ASSET_CACHE", cache)
+
+    async def main():
+        return await asyncio.gather(*(assetcache.aget_asset(assets, "a3.bin") for _ in range(20)))
+    entries = asyncio.run(main())
+    assert all(e is entries[0] for e in entries)
+    assert cache.misses == 1
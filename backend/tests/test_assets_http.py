@@ -0,0 +1,119 @@
+# backend/tests/test_assets_http.py
+from __future__ import annotations
+import asyncio
+from urllib.parse import quote
+
+import pytest
+import websockets
+
+import backend
+from assetcache import get_asset
+
+
+def request(path, headers=None):
+    return asyncio.run(backend.process_request(path, headers or {}))
+
+
+def header(resp, name):
+    return dict(resp[1]).get(name)
+
+
+@pytest.fixture
+def logo():
+    return get_asset(backend.ASSETS_DIR, "logo.png")
+
+
+def test_healthz():
+    status, _headers, body = request("/healthz")
+    assert (status, body) == (200, b"ok\n")
+
+
+def test_websocket_path_is_left_alone():
+    assert request("/") is None
+
+
+def test_asset_by_hash(logo):
+    status, _headers, body = resp = request(backend.asset_url(logo))
+    assert status == 200
+    assert body == (backend.ASSETS_DIR / "logo.png").read_bytes()
+    assert header(resp, "ETag") == f'"{logo.digest}"'
+    assert header(resp, "Content-Type") == "image/png"
+    assert "immutable" in header(resp, "Cache-Control")
+    assert header(resp, "Content-Length") == str(len(body))
+
+
+def test_name_with_space_is_quoted():
+    e = get_asset(backend.ASSETS_DIR, "Finance Responsible.png")
+    url = backend.asset_url(e)
+    assert " " not in url
+    assert request(url)[0] == 200
+
+
+@pytest.mark.parametrize("inm", ['"{d}"', 'W/"{d}"', '"other", "{d}"', "*"])
+def test_if_none_match_gives_304(logo, inm):
+    status, _headers, body = resp = request(backend.asset_url(logo), {"If-None-Match": inm.format(d=logo.digest)})
+    assert (status, body) == (304, b"")
+    assert header(resp, "ETag") == f'"{logo.digest}"'
+    assert "immutable" in header(resp, "Cache-Control")
+
+
+def test_other_etag_gives_200(logo):
+    assert request(backend.asset_url(logo), {"If-None-Match": '"0000000000000000"'})[0] == 200
+
+
+def test_stale_or_unknown_hash(logo):
+    status, _headers, body = request("/assets/0000000000000000/logo.png")
+    assert (status, body) == (404, b"stale asset url\n")
+    assert request(f"/assets/{logo.digest}/nope.png")[0] == 404
+    assert request(f"/assets/{logo.digest}/Counter.png")[0] == 404   # hash van een ander bestand
+
+
+@pytest.mark.parametrize("name", [
+    "..%2Fbackend.py", "%2E%2E%2Fbackend.py", "..%5Cbackend.py", ".hidden", "..", "%2Fetc%2Fpasswd", "",
+])
+def test_path_traversal(name):
+    status, _headers, body = request(f"/assets/0000000000000000/{name}")
+    assert status == 404
+
+
+def test_extra_path_segments():
+    assert request("/assets/x/../../backend.py")[0] == 404
+    assert request("/assets/logo.png")[0] == 404
+
+
+def test_safe_asset_refuses_outside_assets_dir():
+    with pytest.raises(FileNotFoundError):
+        backend._safe_asset("../backend.py")
+    with pytest.raises(FileNotFoundError):
+        backend._safe_asset("nope.png")
+
+
+@pytest.mark.parametrize("w", ["abc", "-320", "123", "99999999999999999999", "٣٢٠"])
+def test_bad_width(logo, w):
+    assert request(backend.asset_url(logo) + f"?w={quote(w)}")[0] == 404
+
+
+def test_over_real_http(logo):
+    """Via de echte server: process_request zit voor de WS-upgrade."""
+    async def main():
+        server = await websockets.serve(backend.handler, "127.0.0.1", 0, process_request=backend.process_request)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            async def get(path, extra=""):
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                writer.write(f"GET {path} HTTP/1.1\r\nHost: x\r\n{extra}\r\n".encode())
+                await writer.drain()
+                data = await reader.read()
+                writer.close()
+                return data
+            ok = await get(backend.asset_url(logo))
+            cached = await get(backend.asset_url(logo), f'If-None-Match: "{logo.digest}"\r\n')
+            traversal = await get("/assets/0000000000000000/..%2F..%2Fbackend%2Fbackend.py")
+            return ok, cached, traversal
+        finally:
+            server.close()
+            await server.wait_closed()
+    ok, cached, traversal = asyncio.run(main())
+    assert ok.startswith(b"HTTP/1.1 200") and ok.endswith((backend.ASSETS_DIR / "logo.png").read_bytes())
+    assert cached.startswith(b"HTTP/1.1 304")
+    assert traversal.startswith(b"HTTP/1.1 404")
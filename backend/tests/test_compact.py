@@ -0,0 +1,77 @@
+# backend/tests/test_compact.py
+from __future__ import annotations
+
+import scenes
+from compact import STYLE_FIELDS, encode_message, encode_scene
+from handlers import handle_SHOWORGANIZATION, handle_SHOWPROCESS
+
+SCENE_KEYS = ("rectangles", "triangles", "arrows", "images")
+
+
+def decode(msg):
+    """Python-versie van DrawCanvas.decodeCompact."""
+    if msg.get("format") != "compact":
+        return msg
+    out = {k: v for k, v in msg.items() if k not in ("format", "styles")}
+    for key in SCENE_KEYS:
+        enc = msg.get(key)
+        if not enc or isinstance(enc, list):
+            continue
+        out[key] = [{**msg["styles"][enc["style"][i]], **{f: col[i] for f, col in enc["columns"].items()}}
+                    for i in range(enc["count"])]
+    return out
+
+
+def rounded(item):
+    return {f: round(v, 2) if isinstance(v, float) and f in ("x", "y", "w", "h", "x1", "y1", "x2", "y2") else v
+            for f, v in item.items()}
+
+
+def response(overlay):
+    return {"messagetype": "SHOWPROCESS", "numbers": [1, 2], "texts": ["a"], **scenes.compile_scene(overlay),
+            "png_payloads": {}}
+
+
+def test_round_trip_view():
+    resp = response(handle_SHOWORGANIZATION.OVERLAY)
+    enc = encode_message(resp)
+    assert enc["format"] == "compact"
+    assert list(enc) == ["messagetype", "numbers", "texts", "format", "styles", *SCENE_KEYS, "png_payloads"]
+    dec = decode(enc)
+    for key in SCENE_KEYS:
+        assert dec[key] == [rounded(it) for it in resp[key]]
+    assert {k: v for k, v in dec.items() if k not in SCENE_KEYS} == \
+        {k: v for k, v in resp.items() if k not in SCENE_KEYS}
+
+
+def test_styles_are_shared():
+    scene = {"rectangles": [{"name": str(i), "x": i, "y": 0, "w": 1, "h": 1, "fill": "red", "linewidth": 1}
+                            for i in range(50)],
+             "arrows": [{"name": "a", "x1": 0, "y1": 0, "x2": 1, "y2": 1, "linewidth": 1, "fill": "red"}]}
+    enc = encode_scene(scene)
+    assert enc["styles"] == [{"linewidth": 1, "fill": "red"}]
+    assert enc["rectangles"]["style"] == [0] * 50
+    assert all(f not in enc["rectangles"]["columns"] for f in STYLE_FIELDS)
+    assert enc["triangles"] == [] and enc["images"] == []
+
+
+def test_missing_fields_and_rounding():
+    scene = {"rectangles": [{"name": "a", "x": 1.23456},
+                            {"name": "b", "text": "t"},
+                            {"name": "c", "x": 2, "font": "Arial"}]}
+    enc = encode_scene(scene)
+    cols = enc["rectangles"]["columns"]
+    assert cols == {"name": ["a", "b", "c"], "x": [1.23, None, 2], "text": [None, "t", None]}
+    assert enc["styles"] == [{}, {"font": "Arial"}]
+    assert enc["rectangles"]["style"] == [0, 0, 1]
+
+
+def test_without_geometry_unchanged():
+    resp = {"messagetype": "RUNSIMULATION", "numbers": [3], "rectangles": [], "arrows": []}
+    assert encode_message(resp) is resp
+
+
+def test_decode_in_drawcanvas(drawcanvas):
+    resp = response(handle_SHOWPROCESS.OVERLAY)
+    enc = encode_message(resp)
+    assert drawcanvas("decodeCompact", enc) == decode(enc)
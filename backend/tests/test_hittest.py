@@ -0,0 +1,121 @@
+# backend/tests/test_hittest.py
+from __future__ import annotations
+import math
+import random
+
+import pytest
+
+import scenes
+from handlers import handle_SHOWCONTROL, handle_SHOWORGANIZATION, handle_SHOWPROCESS
+from hittest import ARROW_TOLERANCE_PX, SceneIndex
+
+
+# ---- referentie: elk element los getest, met de vormen zoals DrawCanvas.render ze tekent ----
+def _in_rect(d, x, y):
+    x0, x1 = sorted((d["x"], d["x"] + d["w"]))
+    y0, y1 = sorted((d["y"], d["y"] + d["h"]))
+    return x0 <= x <= x1 and y0 <= y <= y1
+
+
+def _in_triangle(d, x, y):
+    # moveTo(x, y) -> lineTo(x + w, y) -> lineTo(x + w/2, y + h), barycentrisch
+    ax, ay = d["x"], d["y"]
+    bx, by = d["x"] + d["w"], d["y"]
+    cx, cy = d["x"] + d["w"] / 2, d["y"] + d["h"]
+    det = (by - cy) * (ax - cx) + (cx - bx) * (ay - cy)
+    if det == 0:
+        return False
+    l1 = ((by - cy) * (x - cx) + (cx - bx) * (y - cy)) / det
+    l2 = ((cy - ay) * (x - cx) + (ax - cx) * (y - cy)) / det
+    return l1 >= 0 and l2 >= 0 and 1 - l1 - l2 >= 0
+
+
+def _near_arrow(d, x, y):
+    x1, y1, x2, y2 = d["x1"], d["y1"], d["x2"], d["y2"]
+    seg = math.hypot(x2 - x1, y2 - y1)
+    if seg == 0:
+        dist = math.hypot(x - x1, y - y1)
+    else:
+        t = max(0.0, min(1.0, ((x - x1) * (x2 - x1) + (y - y1) * (y2 - y1)) / seg ** 2))
+        dist = math.hypot(x1 + t * (x2 - x1) - x, y1 + t * (y2 - y1) - y)
+    return dist <= (d.get("linewidth") or 1) / 2 + ARROW_TOLERANCE_PX
+
+
+def reference_hits(scene, x, y):
+    drawn = []   # in tekenvolgorde
+    for key, test in (("rectangles", _in_rect), ("triangles", _in_triangle), ("arrows", _near_arrow),
+                      ("images", _in_rect)):
+        for d in scene.get(key) or []:
+            if key == "images" and not d.get("filename"):
+                continue
+            drawn.append(test(d, x, y))
+    return [i for i in reversed(range(len(drawn))) if drawn[i]]
+
+
+def random_scene(rng, n):
+    def box():
+        return {"x": rng.uniform(-50, 900), "y": rng.uniform(-50, 600), "w": rng.uniform(-80, 300),
+                "h": rng.uniform(-80, 300)}
+    return {
+        "rectangles": [{"name": f"r{i}", **box()} for i in range(n)],
+        "triangles": [{"name": f"t{i}", **box()} for i in range(n // 2)],
+        "arrows": [{"name": f"a{i}", "x1": rng.uniform(0, 900), "y1": rng.uniform(0, 600),
+                    "x2": rng.uniform(0, 900), "y2": rng.uniform(0, 600), "linewidth": rng.choice([None, 1, 2, 7])}
+                   for i in range(n)],
+        "images": [{"name": f"i{i}", "filename": "x.png" if i % 3 else "", **box()} for i in range(n // 3)],
+    }
+
+
+@pytest.mark.parametrize("overlay", [handle_SHOWPROCESS.OVERLAY, handle_SHOWCONTROL.OVERLAY,
+                                     handle_SHOWORGANIZATION.OVERLAY])
+def test_views_match_reference(overlay):
+    scene = scenes.compile_scene(overlay)
+    index = SceneIndex(scene)
+    for x in range(-20, 1420, 13):
+        for y in range(-20, 745, 13):
+            px, py = x + 0.37, y + 0.61
+            assert index.hits(px, py) == reference_hits(scene, px, py), (px, py)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_random_scenes_match_reference(seed):
+    rng = random.Random(seed)
+    scene = random_scene(rng, 40)
+    index = SceneIndex(scene)
+    for _ in range(3000):
+        x, y = rng.uniform(-100, 1300), rng.uniform(-100, 1000)
+        assert index.hits(x, y) == reference_hits(scene, x, y), (x, y)
+
+
+def test_triangle_shape():
+    index = SceneIndex({"triangles": [{"name": "t", "x": 0, "y": 0, "w": 100, "h": 100}]})
+    assert index.hit(50, 1) == "t"          # bovenkant is de brede zijde
+    assert index.hit(50, 99) == "t"         # punt onderaan
+    assert index.hit(5, 90) is None         # binnen de box, buiten de driehoek
+    assert index.hit(95, 90) is None
+
+
+def test_arrow_tolerance():
+    index = SceneIndex({"arrows": [{"name": "a", "x1": 0, "y1": 0, "x2": 100, "y2": 0, "linewidth": 4}]})
+    assert index.hit(50, 2 + ARROW_TOLERANCE_PX - 0.01) == "a"
+    assert index.hit(50, 2 + ARROW_TOLERANCE_PX + 0.01) is None
+    assert index.hit(-4, 0) == "a"           # voorbij het eindpunt, binnen de marge
+    assert index.hit(-6, 0) is None
+
+
+def test_topmost_first():
+    scene = {"rectangles": [{"name": "back", "x": 0, "y": 0, "w": 100, "h": 100},
+                            {"name": "front", "x": 10, "y": 10, "w": 20, "h": 20}],
+             "images": [{"name": "logo", "filename": "logo.png", "x": 15, "y": 15, "w": 5, "h": 5},
+                        {"name": "hidden", "x": 15, "y": 15, "w": 5, "h": 5}]}
+    index = SceneIndex(scene)
+    assert [index.names[i] for i in index.hits(17, 17)] == ["logo", "front", "back"]
+    assert index.hits(17, 17, limit=2) == index.hits(17, 17)[:2]
+    assert index.hit(50, 50) == "back"
+    assert index.hit(150, 50) is None
+
+
+def test_empty_scene():
+    index = SceneIndex({})
+    assert len(index) == 0
+    assert index.hit(0, 0) is None
@@ -0,0 +1,97 @@
+# backend/tests/test_metrics.py
+from __future__ import annotations
+import asyncio
+import json
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+import backend
+import metrics
+
+
+def sample(text, name, labels=""):
+    m = re.search(rf"^{re.escape(name + labels)} (\S+)$", text, re.M)
+    return float(m.group(1)) if m else None
+
+
+def test_record_and_render():
+    before = metrics.render()
+    req = sample(before, "alignment_requests_total", '{type="TESTTYPE"}') or 0.0
+    metrics.record("TESTTYPE", 0.003, 0.0002, 5000)
+    metrics.record("TESTTYPE", 0.3, 0.0002, 100, error=True)
+    metrics.count("TESTTYPE", error=True)
+    text = metrics.render()
+    assert sample(text, "alignment_requests_total", '{type="TESTTYPE"}') == req + 3
+    assert sample(text, "alignment_errors_total", '{type="TESTTYPE"}') >= 2
+    assert sample(text, "alignment_handler_seconds_bucket", '{type="TESTTYPE",le="0.005"}') >= 1
+    assert sample(text, "alignment_handler_seconds_bucket", '{type="TESTTYPE",le="+Inf"}') >= 2
+    assert sample(text, "alignment_handler_seconds_count", '{type="TESTTYPE"}') >= 2
+    assert sample(text, "alignment_response_bytes_bucket", '{type="TESTTYPE",le="4096"}') >= 1
+
+
+def test_render_format():
+    text = metrics.render()
+    assert text.endswith("\n")
+    for m in metrics.METRICS:
+        assert f"# HELP {m.name} " in text and f"# TYPE {m.name} {m.kind}\n" in text
+    for line in text.splitlines():
+        assert line.startswith("#") or re.match(r"^alignment_\w+(\{[^}]*\})? \S+$", line), line
+
+
+def test_collectors_fill_gauges():
+    text = metrics.render()
+    for name in ("alignment_sessions", "alignment_simulation_runs", "alignment_io_inflight",
+                 "alignment_asset_cache_hit_ratio"):
+        assert sample(text, name) is not None, name
+
+
+def test_handle_message_counts():
+    class FakeWS:
+        remote_address = ("test", 0)
+    before = sample(metrics.render(), "alignment_requests_total", '{type="ping"}') or 0.0
+    asyncio.run(backend.handle_message({"type": "ping"}, ws=FakeWS()))
+    assert sample(metrics.render(), "alignment_requests_total", '{type="ping"}') == before + 1
+
+
+def scrape(headers=None):
+    return asyncio.run(backend.process_request("/metrics", headers or {}))
+
+
+def test_metrics_off_without_token(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", "")
+    assert scrape()[0] == 404
+    assert scrape({"Authorization": "Bearer "})[0] == 404
+
+
+@pytest.mark.parametrize("auth", [None, "Bearer wrong", "secret", "Basic secret", "Bearer secret2"])
+def test_metrics_needs_the_token(monkeypatch, auth):
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", "secret")
+    assert scrape({"Authorization": auth} if auth else {})[0] == 404
+
+
+def test_metrics_with_token(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", "secret")
+    status, headers, body = scrape({"Authorization": "Bearer secret"})
+    assert status == 200
+    assert dict(headers)["Content-Type"] == metrics.CONTENT_TYPE
+    assert b"# TYPE alignment_requests_total counter" in body
+
+
+def test_merged_worker_snapshots(tmp_path, monkeypatch):
+    """Multi-worker: counters van een gestopte worker tellen mee, zijn gauges niet."""
+    monkeypatch.setenv("METRICS_DIR", str(tmp_path))
+    dead = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"],
+                          capture_output=True, text=True, check=True).stdout.strip()
+    (tmp_path / f"{dead}.json").write_text(json.dumps({
+        metrics.REQUESTS.name: [[["SNAPTYPE"], 7.0]],
+        metrics.SIM_RUNS.name: [[[], 1000]],
+    }))
+    metrics.flush()
+    assert (tmp_path / f"{os.getpid()}.json").exists()
+    text = metrics.render()
+    assert sample(text, "alignment_requests_total", '{type="SNAPTYPE"}') == 7.0
+    assert sample(text, "alignment_simulation_runs") < 1000
@@ -0,0 +1,128 @@
+# backend/tests/test_msglog.py
+from __future__ import annotations
+import logging
+import queue
+
+import pytest
+
+import msglog
+from msglog import RateLimiter
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(msglog, "time", c)
+    return c
+
+
+@pytest.fixture
+def limiter(clock, monkeypatch):
+    lim = RateLimiter(10)
+    monkeypatch.setattr(msglog, "_limiter", lim)
+    return lim
+
+
+def test_token_bucket_burst_and_refill(clock):
+    lim = RateLimiter(10)
+    assert sum(lim.allow() for _ in range(15)) == 10   # piek tot `rate`
+    assert lim.suppressed == 5
+    clock.now += 0.5
+    assert sum(lim.allow() for _ in range(15)) == 5    # 0.5 s * 10/s
+    clock.now += 60
+    assert sum(lim.allow() for _ in range(15)) == 10   # nooit meer dan `rate` gespaard
+
+
+def test_token_bucket_average_rate(clock):
+    lim = RateLimiter(20)
+    allowed = 0
+    for _ in range(1000):          # 10 s, 100 pogingen per seconde
+        clock.now += 0.01
+        allowed += lim.allow()
+    assert 200 <= allowed <= 220   # 20/s + de eerste piek
+
+
+def test_sampling(limiter, monkeypatch):
+    monkeypatch.setattr(msglog, "LOG_SAMPLE", 0.25)
+    monkeypatch.setattr(msglog.random, "random", lambda: 0.3)
+    assert not msglog.wanted("session-a")
+    monkeypatch.setattr(msglog.random, "random", lambda: 0.2)
+    assert msglog.wanted("session-a")
+
+
+def test_errors_skip_sampling_not_the_rate(limiter, monkeypatch):
+    monkeypatch.setattr(msglog, "LOG_SAMPLE", 0.0)
+    monkeypatch.setattr(msglog.random, "random", lambda: 0.0)
+    assert not msglog.wanted("session-a")
+    assert sum(msglog.wanted("session-a", error=True) for _ in range(50)) == 10
+    assert limiter.suppressed == 40
+
+
+def test_traced_session_is_always_logged(limiter, monkeypatch):
+    monkeypatch.setattr(msglog, "LOG_SAMPLE", 0.0)
+    msglog.trace("session-t")
+    try:
+        assert msglog.traced("session-t")
+        assert all(msglog.wanted("session-t") for _ in range(50))   # ook boven LOG_RATE
+        assert limiter.suppressed == 0
+    finally:
+        msglog.trace("session-t", False)
+    assert not msglog.traced("session-t") and not msglog.wanted("session-t")
+
+
+def test_message_line(limiter, monkeypatch):
+    monkeypatch.setattr(msglog, "LOG_SAMPLE", 0.01)
+    line = msglog.message_line("SHOWSTART", "abc", 40, 2_300_000, 3, 0.0011, 0.25, 0.0125)
+    assert line == ("msg type=SHOWSTART session=abc in=40 out=2300000 frames=3 "
+                    "queue_ms=1.10 build_ms=250.00 send_ms=12.50 sample=0.01")
+    assert msglog.message_line("X", None, 0, 0, 0, 0, 0, 0, error=True).endswith("error=1")
+    assert " session=- " in msglog.message_line("X", None, 0, 0, 0, 0, 0, 0)
+
+
+def test_message_line_reports_suppressed_once(limiter):
+    for _ in range(13):
+        limiter.allow()
+    assert "suppressed=3" in msglog.message_line("X", "s", 0, 0, 0, 0, 0, 0)
+    assert "suppressed" not in msglog.message_line("X", "s", 0, 0, 0, 0, 0, 0)
+
+
+def test_message_line_quotes_values():
+    assert "type=\"a b\"" in msglog.message_line("a b", "s", 0, 0, 0, 0, 0, 0)
+    assert "session=\"x=y\"" in msglog.message_line("X", "x=y", 0, 0, 0, 0, 0, 0)
+
+
+def test_excerpt(monkeypatch):
+    monkeypatch.setattr(msglog, "LOG_TRACE_CHARS", 5)
+    assert msglog.excerpt("abc") == "abc"
+    assert msglog.excerpt("abcdefgh") == "abcde… (8 chars)"
+    monkeypatch.setattr(msglog, "LOG_TRACE_CHARS", 0)
+    assert msglog.excerpt("abcdefgh") == "abcdefgh"
+
+
+def test_debug_token(monkeypatch):
+    monkeypatch.setattr(msglog, "LOG_DEBUG_TOKEN", "")
+    assert not msglog.debug_allowed("") and not msglog.debug_allowed(None)
+    monkeypatch.setattr(msglog, "LOG_DEBUG_TOKEN", "t0k")
+    assert msglog.debug_allowed("t0k")
+    assert not msglog.debug_allowed("nope") and not msglog.debug_allowed(True)
+
+
+def test_full_queue_drops_instead_of_blocking():
+    h = msglog._DroppingQueueHandler(queue.Queue(2))
+    logger = logging.getLogger("test-msglog-drop")
+    logger.propagate = False
+    logger.addHandler(h)
+    try:
+        for i in range(5):
+            logger.warning("record %d", i)
+    finally:
+        logger.removeHandler(h)
+    assert h.queue.qsize() == 2 and h.dropped == 3
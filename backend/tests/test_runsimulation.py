@@ -0,0 +1,27 @@
+# backend/tests/test_runsimulation.py
+from __future__ import annotations
+import asyncio
+import json
+
+import pytest
+
+import backend
+
+
+class FakeWS:
+    remote_address = ("test", 0)
+
+
+def send(msg, ws=None):
+    return json.loads(asyncio.run(backend.handle_message(msg, ws=ws or FakeWS())))
+
+
+@pytest.mark.parametrize("days", [0, -4, -5, -100])
+def test_invalid_days_is_an_error(days, series_dir):
+    reply = send({"messagetype": "RUNSIMULATION", "numbers": [days]})
+    assert reply["type"] == "error" and f"invalid number of days: {days}" in reply["error"]
+
+
+def test_reset(series_dir):
+    reply = send({"messagetype": "RUNSIMULATION", "numbers": [-1]})
+    assert reply["numbers"] == [0] and reply["summary"]["days"] == 0
@@ -0,0 +1,105 @@
+# backend/tests/test_scenediff.py
+from __future__ import annotations
+import copy
+
+import pytest
+
+import scenes
+from handlers import handle_SHOWCONTROL, handle_SHOWINFORMATION, handle_SHOWORGANIZATION, handle_SHOWPROCESS
+from scenediff import SCENE_KEYS, diff_scene, element_keys
+
+
+def apply_patch(scene, patch):
+    """Python-versie van DrawCanvas.applyPatch (zelfde regels als de client)."""
+    out = {}
+    for key in SCENE_KEYS:
+        items = scene.get(key) or []
+        p = patch.get(key)
+        if not p:
+            out[key] = items
+            continue
+        by_key = {k: dict(it) for k, it in zip(element_keys(items), items)}
+        for k in p.get("remove", []):
+            del by_key[k]
+        for c in p.get("change", []):
+            for f, v in c["fields"].items():
+                if v is None:
+                    by_key[c["key"]].pop(f, None)
+                else:
+                    by_key[c["key"]][f] = v
+        order = list(by_key)
+        for a in p.get("add", []):
+            by_key[a["key"]] = a["item"]
+            order.append(a["key"])
+        out[key] = [by_key[k] for k in p.get("order", order)]
+    return out
+
+
+def _scene(overlay):
+    return scenes.compile_scene(overlay)
+
+
+VIEWS = [handle_SHOWPROCESS.OVERLAY, handle_SHOWCONTROL.OVERLAY, handle_SHOWINFORMATION.OVERLAY,
+         handle_SHOWORGANIZATION.OVERLAY]
+
+OLD = {
+    "rectangles": [{"name": "a", "x": 0, "y": 0, "w": 10, "h": 10, "fill": "red"},
+                   {"name": "dup", "x": 1, "y": 1, "w": 1, "h": 1},
+                   {"name": "dup", "x": 2, "y": 2, "w": 2, "h": 2},
+                   {"name": "gone", "x": 5, "y": 5, "w": 5, "h": 5}],
+    "triangles": [{"name": "t", "x": 0, "y": 0, "w": 4, "h": 4, "text": "old"}],
+    "arrows": [{"name": "p", "x1": 0, "y1": 0, "x2": 1, "y2": 1}, {"name": "q", "x1": 2, "y1": 2, "x2": 3, "y2": 3}],
+    "images": [],
+}
+NEW = {
+    "rectangles": [{"name": "dup", "x": 1, "y": 1, "w": 1, "h": 1},
+                   {"name": "a", "x": 0, "y": 0, "w": 12, "h": 10},          # w anders, fill weg
+                   {"name": "dup", "x": 2, "y": 2, "w": 2, "h": 2},
+                   {"name": "dup", "x": 3, "y": 3, "w": 3, "h": 3},          # dup#3 nieuw
+                   {"name": "new", "x": 7, "y": 7, "w": 7, "h": 7}],
+    "triangles": [{"name": "t", "x": 0, "y": 0, "w": 4, "h": 4, "text": "new"}],
+    "arrows": [{"name": "q", "x1": 2, "y1": 2, "x2": 3, "y2": 3}, {"name": "p", "x1": 0, "y1": 0, "x2": 1, "y2": 1}],
+    "images": [{"name": "i", "filename": "x.png", "x": 0, "y": 0, "w": 1, "h": 1}],
+}
+
+
+def test_identical_scenes_give_empty_patch():
+    scene = _scene(handle_SHOWPROCESS.OVERLAY)
+    assert diff_scene(scene, copy.deepcopy(scene)) == {}
+
+
+def test_patch_contents():
+    patch = diff_scene(OLD, NEW)
+    rect = patch["rectangles"]
+    assert rect["remove"] == ["gone"]
+    assert rect["change"] == [{"key": "a", "fields": {"w": 12, "fill": None}}]
+    assert [a["key"] for a in rect["add"]] == ["dup#3", "new"]
+    assert rect["order"] == ["dup", "a", "dup#2", "dup#3", "new"]
+    assert patch["triangles"] == {"change": [{"key": "t", "fields": {"text": "new"}}]}
+    assert patch["arrows"] == {"order": ["q", "p"]}
+    assert patch["images"]["add"][0]["key"] == "i"
+
+
+@pytest.mark.parametrize("old,new", [(OLD, NEW), (NEW, OLD), ({}, NEW), (NEW, {})])
+def test_round_trip_crafted(old, new):
+    full = {k: new.get(k) or [] for k in SCENE_KEYS}
+    assert apply_patch(old, diff_scene(old, new)) == full
+
+
+@pytest.mark.parametrize("a", range(len(VIEWS)))
+@pytest.mark.parametrize("b", range(len(VIEWS)))
+def test_round_trip_views(a, b):
+    old, new = _scene(VIEWS[a]), _scene(VIEWS[b])
+    assert apply_patch(old, diff_scene(old, new)) == new
+
+
+def test_round_trip_in_drawcanvas(drawcanvas):
+    cases = [(OLD, NEW), (NEW, OLD), (_scene(handle_SHOWPROCESS.OVERLAY), _scene(handle_SHOWORGANIZATION.OVERLAY))]
+    for old, new in cases:
+        full = {k: new.get(k) or [] for k in SCENE_KEYS}
+        assert drawcanvas("applyPatch", old, diff_scene(old, new)) == full
+
+
+def test_element_keys_match_drawcanvas(drawcanvas):
+    items = NEW["rectangles"] + [{"x": 0}, {"name": ""}]
+    assert drawcanvas("sceneKeys", items) == element_keys(items)
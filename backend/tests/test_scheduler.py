@@ -0,0 +1,185 @@
+# backend/tests/test_scheduler.py
+from __future__ import annotations
+import asyncio
+import contextlib
+import json
+
+import backend
+from connstate import state_for
+from scheduler import ConnectionScheduler, is_view_request
+
+
+def view(mt="SHOWPROCESS", **extra):
+    return json.dumps({"messagetype": mt, "numbers": [], "texts": [], **extra})
+
+
+async def until(cond, timeout=10.0):
+    loop = asyncio.get_running_loop()
+    end = loop.time() + timeout
+    while not cond():
+        assert loop.time() < end, "timeout"
+        await asyncio.sleep(0.005)
+
+
+@contextlib.asynccontextmanager
+async def running(sched):
+    task = asyncio.ensure_future(sched.run())
+    try:
+        yield sched
+    finally:
+        sched.close()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+
+class FakeBuilds:
+    """build() die per request op een gate wacht en pas daarna state vastlegt (zoals backend._commit)."""
+
+    def __init__(self):
+        self.gates = {}
+        self.started = []
+        self.committed = []
+        self.delivered = []
+
+    def gate(self, key):
+        return self.gates.setdefault(key, asyncio.Event())
+
+    async def build(self, msg, frames):
+        key = msg.get("messagetype") or msg.get("type")
+        self.started.append(key)
+        await self.gate(key).wait()
+        self.committed.append(key)
+        return key
+
+    async def deliver(self, frames, resp):
+        self.delivered.append(resp)
+
+
+def test_is_view_request():
+    assert is_view_request({"messagetype": "SHOWCONTROL"})
+    assert not is_view_request({"messagetype": "RUNSIMULATION"})
+    assert not is_view_request({"type": "hello", "messagetype": "SHOWCONTROL"})
+    assert not is_view_request(None)
+
+
+def test_in_flight_view_is_cancelled_without_commit():
+    async def main():
+        b = FakeBuilds()
+        async with running(ConnectionScheduler(b.build, b.deliver)) as sched:
+            await sched.submit(view("SHOWPROCESS"))
+            await until(lambda: b.started == ["SHOWPROCESS"])
+            await sched.submit(view("SHOWCONTROL"))
+            b.gate("SHOWPROCESS").set()      # te laat: de build is al afgebroken
+            b.gate("SHOWCONTROL").set()
+            await until(lambda: b.delivered)
+            assert b.delivered == ["SHOWCONTROL"]
+            assert b.committed == ["SHOWCONTROL"]
+            assert sched.dropped == 1
+    asyncio.run(main())
+
+
+def test_queued_views_are_dropped_other_requests_kept_in_order():
+    async def main():
+        b = FakeBuilds()
+        for key in ("RUNSIMULATION", "ping", "SHOWINFORMATION", "SHOWORGANIZATION"):
+            b.gate(key).set()
+        async with running(ConnectionScheduler(b.build, b.deliver)) as sched:
+            await sched.submit(json.dumps({"messagetype": "RUNSIMULATION", "numbers": [1]}))
+            await until(lambda: b.started)   # RUNSIMULATION in bewerking (gate open, loopt direct door)
+            await sched.submit(view("SHOWPROCESS"))
+            await sched.submit(json.dumps({"type": "ping"}))
+            await sched.submit(view("SHOWCONTROL"))
+            await sched.submit(view("SHOWINFORMATION"))
+            await sched.submit(view("SHOWORGANIZATION"))
+            await until(lambda: len(b.delivered) == 3)
+            await asyncio.sleep(0.05)
+            assert b.delivered == ["RUNSIMULATION", "ping", "SHOWORGANIZATION"]
+            assert "SHOWPROCESS" not in b.committed and "SHOWCONTROL" not in b.committed
+            assert sched.dropped == 3
+    asyncio.run(main())
+
+
+def test_non_view_request_is_never_superseded():
+    async def main():
+        b = FakeBuilds()
+        async with running(ConnectionScheduler(b.build, b.deliver)) as sched:
+            await sched.submit(json.dumps({"messagetype": "RUNSIMULATION", "numbers": [1]}))
+            await until(lambda: b.started)
+            await sched.submit(view("SHOWPROCESS"))
+            b.gate("RUNSIMULATION").set()
+            b.gate("SHOWPROCESS").set()
+            await until(lambda: len(b.delivered) == 2)
+            assert b.delivered == ["RUNSIMULATION", "SHOWPROCESS"]
+            assert sched.dropped == 0
+    asyncio.run(main())
+
+
+def test_error_replies_in_order():
+    async def main():
+        b = FakeBuilds()
+        b.gate("ping").set()
+        async with running(ConnectionScheduler(b.build, b.deliver)) as sched:
+            await sched.submit(json.dumps({"type": "ping"}))
+            await sched.submit_reply("boom")
+            await sched.submit(json.dumps({"type": "ping"}))
+            await until(lambda: len(b.delivered) == 3)
+            assert b.delivered == ["ping", "boom", "ping"]
+    asyncio.run(main())
+
+
+class FakeWS:
+    """Genoeg van een verbinding voor handle_message (sleutel in connstate, inline transport)."""
+    remote_address = ("test", 0)
+
+
+def test_superseded_view_leaves_no_connection_state(monkeypatch):
+    """Echte handle_message in diff-mode: een afgebroken view mag known_assets/last_scene niet raken,
+    anders zou het volgende antwoord een patch zijn t.o.v. een scène die de client nooit kreeg."""
+    async def main():
+        ws = FakeWS()
+        st = state_for(ws)
+        real_fit = backend._fit_entries
+        entered, gate = asyncio.Event(), asyncio.Event()
+        calls = []
+
+        async def gated_fit(*args):
+            # eerste view blijft hangen vlak vóór _commit (na de handler, vóór de laatste await)
+            calls.append(args)
+            if len(calls) == 1:
+                entered.set()
+                await gate.wait()
+            return await real_fit(*args)
+        monkeypatch.setattr(backend, "_fit_entries", gated_fit)
+
+        delivered = []
+
+        async def deliver(frames, resp):
+            delivered.append(json.loads(resp))
+
+        async def build(msg, frames):
+            return await backend.handle_message(msg, ws=ws, frames=frames)
+
+        async with running(ConnectionScheduler(build, deliver)) as sched:
+            await sched.submit(json.dumps({"type": "hello", "diff": True}))
+            await until(lambda: delivered)
+            assert st.diff and st.last_scene is None
+
+            await sched.submit(view("SHOWPROCESS"))
+            await asyncio.wait_for(entered.wait(), 10)
+            await sched.submit(view("SHOWCONTROL"))
+            gate.set()
+            await until(lambda: len(delivered) == 2)
+            await asyncio.sleep(0.05)
+            assert sched.dropped == 1
+            reply = delivered[1]
+            assert reply["messagetype"] == "SHOWCONTROL"
+            assert "patch" not in reply and reply["rectangles"]   # volledige scène: er was nog geen scène
+            assert st.last_view is not None and st.last_view.messagetype == "SHOWCONTROL"
+            assert set(st.known_assets) == set(reply["png_hashes"])
+
+            # de volgende view is een patch t.o.v. SHOWCONTROL, de scène die de client echt heeft
+            await sched.submit(view("SHOWPROCESS"))
+            await until(lambda: len(delivered) == 3)
+            assert "patch" in delivered[2]
+            assert st.last_view.messagetype == "SHOWPROCESS"
+    asyncio.run(main())
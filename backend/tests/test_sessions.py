@@ -0,0 +1,103 @@
+# backend/tests/test_sessions.py
+from __future__ import annotations
+import time
+
+import numpy as np
+import pytest
+
+import simulate
+from sessions import SessionTable, UnknownSession, _key
+
+
+def advance(table, sid, days):
+    table.create(sid)
+    return table.update(sid, lambda s: simulate.SimulateKeyframes(s, days, table.every))
+
+
+def slot_of(table, sid):
+    return table._probe(_key(sid))[0]
+
+
+def test_new_session_starts_at_day_zero():
+    table = SessionTable(max_sessions=16, ttl_s=3600)
+    assert table.create("session-a") is False
+    assert table.create("session-a") is True
+    assert np.array_equal(table.get("session-a"), simulate.NewState())
+    assert table.history("session-a") == (0, 0)
+
+
+def test_ttl_eviction():
+    table = SessionTable(max_sessions=16, ttl_s=10)
+    advance(table, "session-old", 5)
+    advance(table, "session-new", 5)
+    table.seen[slot_of(table, "session-old")] = time.time() - 100
+    table._last_sweep = 0.0   # sweep nu, niet pas na SWEEP_INTERVAL_S
+    table.create("session-other")
+    assert table.evictions == 1
+    assert slot_of(table, "session-old") < 0
+    assert simulate.DayOf(table.get("session-new")) == 5
+    # een verlopen sessie begint niet stilletjes opnieuw op dag 0
+    with pytest.raises(UnknownSession):
+        table.get("session-old")
+    with pytest.raises(UnknownSession):
+        table.update("session-old", simulate.NewState)
+
+
+def test_lru_eviction():
+    table = SessionTable(max_sessions=3, ttl_s=3600)
+    now = time.time()
+    for sid, age in (("session-a", 30), ("session-b", 60), ("session-c", 10)):
+        advance(table, sid, 5)
+        table.seen[slot_of(table, sid)] = now - age
+    table.create("session-d")
+    assert table.evictions == 1
+    assert table.sessions() == 3
+    assert slot_of(table, "session-b") < 0
+    for sid in ("session-a", "session-c"):
+        assert simulate.DayOf(table.get(sid)) == 5
+
+
+def test_lru_counts_use():
+    table = SessionTable(max_sessions=2, ttl_s=3600)
+    now = time.time()
+    advance(table, "session-a", 5)
+    table.seen[slot_of(table, "session-a")] = now - 60
+    advance(table, "session-b", 5)
+    table.seen[slot_of(table, "session-b")] = now - 30
+    table.get("session-a")   # a is nu het laatst gebruikt
+    table.create("session-c")
+    assert slot_of(table, "session-b") < 0
+    assert simulate.DayOf(table.get("session-a")) == 5
+
+
+def test_many_sessions_stay_bounded():
+    table = SessionTable(max_sessions=8, ttl_s=3600)
+    for i in range(100):
+        advance(table, f"session-{i:04d}", 1)
+    assert table.sessions() == 8
+    assert table.evictions == 92
+    assert simulate.DayOf(table.get("session-0099")) == 1
+
+
+def test_unknown_session():
+    table = SessionTable(max_sessions=4, ttl_s=3600)
+    for call in (table.get, table.history, lambda sid: table.rewind(sid, 0), lambda sid: table.branch(sid, 0, "x")):
+        with pytest.raises(UnknownSession):
+            call("never-created")
+    assert table.sessions() == 0
+
+
+def test_slot_reused_between_lookup_and_lock(monkeypatch):
+    """Een andere worker verdringt de sessie tussen _probe en de slot-lock: geen state van de nieuwe sessie."""
+    table = SessionTable(max_sessions=4, ttl_s=3600)
+    advance(table, "session-a", 5)
+    slot = slot_of(table, "session-a")
+    locked = table._locked
+
+    def steal(s):
+        if s == slot and table.keys[slot] == _key("session-a"):
+            table.keys[slot] = _key("session-b")
+        return locked(s)
+    monkeypatch.setattr(table, "_locked", steal)
+    with pytest.raises(UnknownSession):
+        table.get("session-a")
@@ -0,0 +1,108 @@
+# backend/tests/test_simpool.py
+from __future__ import annotations
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+import websockets
+
+import backend
+import simpool
+import simulate
+
+
+@pytest.mark.parametrize("numbers,expected", [
+    ([-1], True), ([-2, 5], True), ([-3, 5], True), ([-1.0], True),
+    ([1], False), ([30], False), ([], False), (None, False), (["x"], False), ([None], False),
+    ([float("inf")], False), ([float("-inf")], False), ([float("nan")], False), ([10**400], False),
+])
+def test_is_reset(numbers, expected):
+    assert simpool.is_reset({"messagetype": "RUNSIMULATION", "numbers": numbers}) is expected
+
+
+def test_is_reset_other_messages():
+    assert not simpool.is_reset({"messagetype": "RUNSWEEP", "numbers": [-1]})
+    assert not simpool.is_reset({"type": "ping"})
+    assert not simpool.is_reset("RUNSIMULATION")
+
+
+def test_start_finish_cancel_session():
+    a, b = simpool.start("session-c"), simpool.start("session-c")
+    other = simpool.start("session-d")
+    try:
+        assert simpool.running() >= 3
+        assert simpool.cancel_session("session-c") == 2
+        assert a.cancelled and b.cancelled and not other.cancelled
+        assert simpool.cancel_session("session-none") == 0
+    finally:
+        for run in (a, b, other):
+            simpool.finish(run)
+    assert simpool.cancel_session("session-c") == 0
+
+
+def test_cancelled_run_does_not_advance():
+    run = simpool.SimRun("session-x")
+    run.cancel()
+    assert asyncio.run(run.advance(simulate.NewState(), 1, 5)) is None
+
+
+def test_cancel_during_pool_batch(monkeypatch):
+    """cancel() tijdens een batch in de pool: advance geeft None, niet het (late) resultaat."""
+    gate = threading.Event()
+
+    def slow(blob, days, every):
+        gate.wait(10)
+        return simpool._advance(blob, days, every)
+    ex = ThreadPoolExecutor(1)
+    monkeypatch.setattr(simpool, "SIM_PROCS", 1)
+    monkeypatch.setattr(simpool, "pool", lambda: ex)
+    monkeypatch.setattr(simpool, "_advance", slow)
+
+    async def main():
+        run = simpool.SimRun("session-x")
+        task = asyncio.ensure_future(run.advance(simulate.NewState(), simpool.SIM_INLINE_DAYS + 1, 5))
+        while run._fut is None:
+            await asyncio.sleep(0.001)
+        run.cancel()
+        return await task
+    try:
+        assert asyncio.run(main()) is None
+    finally:
+        gate.set()
+        ex.shutdown()
+
+
+def test_pool_batch_result(monkeypatch):
+    ex = ThreadPoolExecutor(1)
+    monkeypatch.setattr(simpool, "SIM_PROCS", 1)
+    monkeypatch.setattr(simpool, "pool", lambda: ex)
+    days = simpool.SIM_INLINE_DAYS + 3
+    try:
+        rows, series = asyncio.run(simpool.SimRun("session-x").advance(simulate.NewState(), days, 5))
+    finally:
+        ex.shutdown()
+    assert np.array_equal(rows[-1], simulate.SimulateDays(simulate.NewState(), days))
+    assert series.shape == (days, len(simulate.SERIES_FIELDS))
+
+
+def test_infinite_day_count_keeps_the_connection(series_dir):
+    """numbers [1e400] (inf na json.loads) gaat door de interrupt-hook: geen 1011, wel een antwoord."""
+    async def main():
+        server = await websockets.serve(backend.handler, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            async with websockets.connect(f"ws://127.0.0.1:{port}") as ws:
+                await ws.send('{"messagetype": "RUNSIMULATION", "numbers": [1e400]}')
+                first = json.loads(await asyncio.wait_for(ws.recv(), 10))
+                await ws.send(json.dumps({"type": "ping"}))
+                second = json.loads(await asyncio.wait_for(ws.recv(), 10))
+            return first, second
+        finally:
+            server.close()
+            await server.wait_closed()
+    first, second = asyncio.run(main())
+    assert first["messagetype"] == "RUNSIMULATION"   # int(inf) faalt: standaard 1 dag
+    assert second == {"type": "pong"}
@@ -0,0 +1,69 @@
+# backend/tests/test_simulate.py
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+import simulate
+
+
+def day_by_day(state, days, params=None):
+    for _ in range(days):
+        state = simulate.SimulateDays(state, 1, params)
+    return state
+
+
+@pytest.mark.parametrize("seed", [0, 1, 12345])
+@pytest.mark.parametrize("days", [1, 7, 30, 365])
+def test_batch_equals_day_by_day(seed, days):
+    start = simulate.NewState(seed)
+    assert np.array_equal(simulate.SimulateDays(start, days), day_by_day(start, days))
+
+
+def test_batch_split_anywhere():
+    start = simulate.NewState(7)
+    whole = simulate.SimulateDays(start, 100)
+    for cut in (1, 13, 50, 99):
+        assert np.array_equal(simulate.SimulateDays(simulate.SimulateDays(start, cut), 100 - cut), whole)
+
+
+def test_params_batch_equals_day_by_day():
+    params = {"LotSize": 50.0, "ForecastError": 0.2, "CoverDays": 5.0}
+    start = simulate.NewState(3)
+    assert np.array_equal(simulate.SimulateDays(start, 60, params), day_by_day(start, 60, params))
+    assert not np.array_equal(simulate.SimulateDays(start, 60, params), simulate.SimulateDays(start, 60))
+
+
+def test_input_not_modified():
+    start = simulate.NewState()
+    before = start.copy()
+    simulate.SimulateDays(start, 10)
+    assert np.array_equal(start, before)
+    assert simulate.SimulateDays(start, 0) is not start
+
+
+def test_series_rows():
+    start = simulate.NewState(2)
+    series = []
+    end = simulate.SimulateDays(start, 20, series=series)
+    assert len(series) == 20
+    assert [row[0] for row in series] == list(range(1, 21))
+    assert np.array_equal(np.array(series[-1]), simulate.SeriesRow(end))
+    assert np.array_equal(np.array(series[9]), simulate.SeriesRow(day_by_day(start, 10)))
+
+
+def test_keyframes():
+    start = simulate.SimulateDays(simulate.NewState(), 3)
+    rows = simulate.SimulateKeyframes(start, 30, every=14)
+    assert [simulate.DayOf(r) for r in rows] == [14, 28, 33]
+    for r in rows:
+        assert np.array_equal(r, simulate.SimulateDays(start, simulate.DayOf(r) - 3))
+
+
+def test_runs_equal_single_runs():
+    states = np.stack([simulate.SimulateDays(simulate.NewState(seed), seed) for seed in range(6)])
+    lot = np.array([1.0, 10.0, 50.0, 100.0, 5.0, 20.0])
+    out = simulate.SimulateRuns(states, 90, {"LotSize": lot, "ForecastError": 0.1})
+    for i, state in enumerate(states):
+        single = simulate.SimulateDays(state, 90, {"LotSize": float(lot[i]), "ForecastError": 0.1})
+        assert np.array_equal(out[i], single)
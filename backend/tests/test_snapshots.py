@@ -0,0 +1,76 @@
+# backend/tests/test_snapshots.py
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+import simulate
+from sessions import SessionTable
+
+
+def advance(table, sid, days):
+    table.create(sid)
+    return table.update(sid, lambda s: simulate.SimulateKeyframes(s, days, table.every))
+
+
+def at_day(day):
+    return simulate.SimulateDays(simulate.NewState(), day)
+
+
+@pytest.fixture
+def table():
+    # keyframes op 0, 5, 10, ...; de ring houdt er 4
+    return SessionTable(max_sessions=16, ttl_s=3600, ring=4, every=5)
+
+
+def test_rewind(table):
+    advance(table, "session-a", 12)
+    advance(table, "session-a", 11)
+    # keyframes 0, 5, 10, 15, 20; dag 20 heeft in de ring dag 0 vervangen
+    assert table.history("session-a") == (5, 23)
+    state = table.rewind("session-a", 13)
+    assert np.array_equal(state, at_day(13))
+    assert np.array_equal(table.get("session-a"), at_day(13))
+    # keyframes van na dag 13 horen bij de oude tijdlijn
+    assert table.history("session-a") == (5, 13)
+    # opnieuw vooruit: zelfde uitkomst als in één keer
+    advance(table, "session-a", 10)
+    assert np.array_equal(table.get("session-a"), at_day(23))
+
+
+def test_rewind_to_keyframe_day(table):
+    advance(table, "session-a", 12)
+    assert np.array_equal(table.rewind("session-a", 10), at_day(10))
+    assert np.array_equal(table.rewind("session-a", 0), at_day(0))
+
+
+def test_rewind_out_of_range(table):
+    advance(table, "session-a", 23)
+    with pytest.raises(ValueError, match="outside the simulated range"):
+        table.rewind("session-a", 24)
+    with pytest.raises(ValueError, match="no longer in the snapshot history"):
+        table.rewind("session-a", 3)
+    assert simulate.DayOf(table.get("session-a")) == 23
+
+
+def test_branch(table):
+    advance(table, "session-a", 23)
+    state = table.branch("session-a", 8, "session-b")
+    assert np.array_equal(state, at_day(8))
+    assert np.array_equal(table.get("session-b"), at_day(8))
+    assert np.array_equal(table.get("session-a"), at_day(23))
+    assert table.history("session-b") == (5, 8)
+    # de tak heeft een eigen tijdlijn
+    advance(table, "session-b", 2)
+    assert simulate.DayOf(table.get("session-b")) == 10
+    assert simulate.DayOf(table.get("session-a")) == 23
+    assert np.array_equal(table.rewind("session-b", 6), at_day(6))
+
+
+def test_branch_replaces_existing_session(table):
+    advance(table, "session-a", 12)
+    advance(table, "session-b", 30)
+    table.branch("session-a", 7, "session-b")
+    assert table.history("session-b") == (0, 7)
+    with pytest.raises(ValueError, match="outside the simulated range"):
+        table.rewind("session-b", 20)
@@ -0,0 +1,96 @@
+# backend/tests/test_sweep.py
+from __future__ import annotations
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+import backend
+import simulate
+from sweep import PERCENTILES, SWEEP_MAX_SEED, parse_grid, run_sweep
+
+
+def test_parse_grid():
+    assert parse_grid([]) == [{}]
+    assert parse_grid(["label", "LotSize=1,50", "ForecastError=-0.2,0.2"]) == [
+        {"LotSize": 1.0, "ForecastError": -0.2}, {"LotSize": 1.0, "ForecastError": 0.2},
+        {"LotSize": 50.0, "ForecastError": -0.2}, {"LotSize": 50.0, "ForecastError": 0.2}]
+
+
+@pytest.mark.parametrize("texts", [["Nope=1"], ["LotSize=a"], ["LotSize="], ["LotSize=0"], ["CoverDays=inf"],
+                                   ["CoverDays=" + ",".join(map(str, range(65)))]])
+def test_parse_grid_rejects(texts):
+    with pytest.raises(ValueError):
+        parse_grid(texts)
+
+
+def sweep(runs=20, days=30, seed=1, settings=({},), start=None):
+    start = simulate.NewState() if start is None else start
+    return asyncio.run(run_sweep(start, runs, days, seed, list(settings)))
+
+
+def test_sweep_percentiles():
+    out = sweep(settings=[{"LotSize": 1.0}, {"LotSize": 100.0}])
+    assert out["percentiles"] == list(PERCENTILES) and len(out["settings"]) == 2
+    for s in out["settings"]:
+        for values in s["kpis"].values():
+            assert len(values) == len(PERCENTILES) and values == sorted(values)
+    assert out["settings"][1]["params"]["LotSize"] == 100.0
+
+
+def test_sweep_matches_single_runs():
+    """Run i = seed + i vanaf de startstate, dus de mediaan van 1 run is gewoon die run."""
+    start = simulate.SimulateDays(simulate.NewState(), 10)
+    out = sweep(runs=1, days=15, seed=7, start=start)
+    single = start.copy()
+    single[simulate.SEED] = 7
+    single = simulate.SimulateDays(single, 15)
+    assert out["settings"][0]["kpis"]["Cash"][2] == round(float(single[simulate.FIELD["Cash"]]), 2)
+    assert out["start_day"] == 10
+
+
+def test_sweep_reproducible():
+    a, b = sweep(seed=42), sweep(seed=42)
+    assert a["settings"] == b["settings"]
+    assert sweep(seed=43)["settings"] != a["settings"]
+
+
+@pytest.mark.parametrize("runs,seed", [(10, -1), (10, SWEEP_MAX_SEED), (10, SWEEP_MAX_SEED - 9), (1, 10**30)])
+def test_sweep_seed_range(runs, seed):
+    with pytest.raises(ValueError, match="seed"):
+        sweep(runs=runs, seed=seed)
+
+
+def test_sweep_largest_seed():
+    out = sweep(runs=2, days=5, seed=SWEEP_MAX_SEED - 2)
+    assert out["seed"] == SWEEP_MAX_SEED - 2
+
+
+@pytest.mark.parametrize("runs,days", [(0, 10), (10, 0), (10**6, 10), (10_000, 10_000)])
+def test_sweep_size_limits(runs, days):
+    with pytest.raises(ValueError):
+        sweep(runs=runs, days=days)
+
+
+class FakeWS:
+    remote_address = ("test", 0)
+
+
+def runsweep(numbers, texts=()):
+    msg = {"messagetype": "RUNSWEEP", "numbers": numbers, "texts": list(texts)}
+    return json.loads(asyncio.run(backend.handle_message(msg, ws=FakeWS())))
+
+
+def test_runsweep():
+    reply = runsweep([10, 20, 3], ["LotSize=1,50"])
+    assert reply["numbers"] == [10, 20, 3]
+    assert reply["texts"] == ["LotSize=1", "LotSize=50"]
+    assert reply["sweep"]["runs"] == 10 and len(reply["sweep"]["settings"]) == 2
+    assert np.isfinite(reply["sweep"]["settings"][0]["kpis"]["Cash"]).all()
+
+
+@pytest.mark.parametrize("numbers", [[10, 10, 1e30], [10, 10, -1], [10, 10, float("inf")], ["x"]])
+def test_runsweep_bad_numbers(numbers):
+    reply = runsweep(numbers)
+    assert reply["type"] == "error"
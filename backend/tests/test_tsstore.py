@@ -0,0 +1,165 @@
+# backend/tests/test_tsstore.py
+from __future__ import annotations
+import asyncio
+import os
+import threading
+
+import numpy as np
+import pytest
+
+import sessions
+import simulate
+import tsstore
+
+CASH = tsstore.FIELDS.index("Cash")
+
+
+def rows(first, n):
+    """Kunstmatige dagrijen: veld j op dag d = d * (j + 1)."""
+    days = np.arange(first, first + n, dtype=np.float64)
+    return np.column_stack([days] + [days * (j + 1) for j in range(tsstore.NF)])
+
+
+def value(day):
+    return float(day * (CASH + 1))
+
+
+@pytest.fixture
+def series(series_dir):
+    tsstore.write("session-a", rows(0, 2500))   # over twee blokgrenzen (BLOCK_DAYS = 1024)
+    return "session-a"
+
+
+def test_whole_range_in_buckets(series):
+    out = tsstore.query(series, ["Cash"], 0, None, points=300)
+    assert out["bucket"] == 9                      # ceil(2500 / 300)
+    assert out["length"] == 2500
+    assert out["day"] == list(range(0, 2500, 9))   # 278 buckets, de laatste heeft 7 dagen
+    cash = out["fields"]["Cash"]
+    assert cash["min"] == [value(d) for d in out["day"]]
+    assert cash["max"] == [value(min(d + 8, 2499)) for d in out["day"]]
+    assert cash["mean"][0] == value(4)
+    assert cash["mean"][-1] == value((2493 + 2499) / 2)
+
+
+def test_end_is_inclusive(series):
+    out = tsstore.query(series, ["Cash"], 10, 19, points=5)
+    assert out["bucket"] == 2
+    assert out["day"] == [10, 12, 14, 16, 18]
+    assert out["fields"]["Cash"]["max"][-1] == value(19)
+
+
+def test_bucket_across_block_boundary(series):
+    b = tsstore.BLOCK_DAYS
+    out = tsstore.query(series, ["Cash"], b - 3, b + 2, points=1)
+    assert out["day"] == [b - 3]
+    assert out["fields"]["Cash"] == {"min": [value(b - 3)], "max": [value(b + 2)], "mean": [value(b - 0.5)]}
+
+
+def test_short_range_is_one_day_per_bucket(series):
+    out = tsstore.query(series, [], 100, 104)
+    assert out["bucket"] == 1
+    assert out["day"] == [100, 101, 102, 103, 104]
+    assert list(out["fields"]) == list(tsstore.FIELDS)
+    for j, name in enumerate(tsstore.FIELDS):
+        f = out["fields"][name]
+        assert f["min"] == f["max"] == f["mean"] == [float(d * (j + 1)) for d in range(100, 105)]
+
+
+def test_range_clipped_to_length(series):
+    out = tsstore.query(series, ["Cash"], 2490, 10_000, points=300)
+    assert out["day"] == list(range(2490, 2500))
+    out = tsstore.query(series, ["Cash"], 3000, None)
+    assert out["day"] == [] and out["fields"]["Cash"] == {"min": [], "max": [], "mean": []}
+
+
+def test_points_limits(series):
+    assert tsstore.query(series, ["Cash"], 0, None, points=0)["day"] == [0]
+    out = tsstore.query(series, ["Cash"], 0, None, points=10**9)
+    assert out["bucket"] == 1 and len(out["day"]) == 2500
+
+
+def test_unknown_field(series):
+    with pytest.raises(ValueError, match="unknown series field"):
+        tsstore.query(series, ["Nope"], 0, None)
+
+
+def test_unknown_session(series_dir):
+    out = tsstore.query("session-none", ["Cash"], 0, None)
+    assert out["length"] == 0 and out["day"] == []
+
+
+def test_rewrite_tail_and_truncate(series):
+    tail = rows(2000, 10)
+    tail[:, 1:] *= 2
+    tsstore.write(series, tail)                  # nieuwe staart vanaf dag 2000
+    assert tsstore.length(series) == 2010
+    assert tsstore.query(series, ["Cash"], 2009, None)["fields"]["Cash"]["min"] == [2 * value(2009)]
+    tsstore.truncate(series, 99)
+    assert tsstore.length(series) == 100
+    tsstore.write(series, rows(200, 5))          # gat: wordt niet geschreven
+    assert tsstore.length(series) == 100
+
+
+def test_branch_copies_history(series):
+    tsstore.branch(series, 1500, "session-b")
+    assert tsstore.length("session-b") == 1501
+    assert tsstore.query("session-b", ["Cash"], 1500, 1500)["fields"]["Cash"]["min"] == [value(1500)]
+
+
+def test_reset(series):
+    tsstore.reset(series, simulate.NewState())
+    assert tsstore.length(series) == 1
+
+
+def test_max_days(series_dir, monkeypatch):
+    monkeypatch.setattr(tsstore, "TS_MAX_DAYS", 100)
+    tsstore.write("session-a", rows(0, 150))
+    assert tsstore.length("session-a") == 100
+    tsstore.check_room(0, 99)
+    with pytest.raises(ValueError, match="series full"):
+        tsstore.check_room(50, 50)
+
+
+def test_sweep_removes_only_unknown_sessions(series_dir, monkeypatch):
+    table = sessions.SessionTable(max_sessions=16)
+    monkeypatch.setattr(sessions, "SESSIONS", table)
+    table.create("session-live")
+    for sid in ("session-live", "session-gone"):
+        tsstore.write(sid, rows(0, 10))
+    # lang niet geschreven, maar de sessie leeft nog: blijft staan
+    os.utime(series_dir / "session-live.ts", (0, 0))
+    tsstore._last_sweep = 0.0
+    tsstore.write("session-live", rows(10, 1))
+    assert tsstore.length("session-live") == 11
+    assert not (series_dir / "session-gone.ts").exists()
+
+
+def test_async_io_runs_in_the_pool(series_dir, monkeypatch):
+    threads = []
+    init = tsstore.SeriesFile.__init__
+
+    def spy(self, *args, **kwargs):
+        threads.append(threading.current_thread().name)
+        init(self, *args, **kwargs)
+    monkeypatch.setattr(tsstore.SeriesFile, "__init__", spy)
+
+    async def main():
+        await tsstore.awrite("session-a", rows(0, 50))
+        await tsstore.atruncate("session-a", 19)
+        await tsstore.abranch("session-a", 9, "session-b")
+        return await tsstore.aquery("session-b", ["Cash"], 0, None)
+    out = asyncio.run(main())
+    assert len(threads) == 5 and all(name.startswith("io") for name in threads)
+    assert out["length"] == 10 and out["fields"]["Cash"]["max"] == [value(d) for d in range(10)]
+    assert tsstore.length("session-a") == 20
+
+
+def test_async_io_keeps_call_order(series_dir):
+    """Een reset die na een write aangeroepen wordt, draait ook na die write (ook in de thread-pool)."""
+    async def main():
+        await asyncio.gather(*(tsstore.awrite("session-a", rows(0, 2000)) for _ in range(3)),
+                             tsstore.areset("session-a", simulate.NewState()))
+    asyncio.run(main())
+    assert tsstore.length("session-a") == 1
+    assert not tsstore._order
@@ -0,0 +1,110 @@
+# backend/tests/test_variants.py
+from __future__ import annotations
+import asyncio
+import io
+import json
+import random
+
+import pytest
+
+PIL = pytest.importorskip("PIL.Image")
+
+import backend  # noqa: E402
+from assetcache import VARIANT_WIDTHS, AssetCache, get_asset, png_size, size_class  # noqa: E402
+
+
+def noise_png(path, w, h, seed=0):
+    rng = random.Random(seed)
+    im = PIL.frombytes("RGB", (w, h), bytes(rng.getrandbits(8) for _ in range(w * h * 3)))
+    buf = io.BytesIO()
+    im.save(buf, format="PNG")
+    path.write_bytes(buf.getvalue())
+
+
+@pytest.fixture
+def assets(tmp_path):
+    noise_png(tmp_path / "big.png", 1000, 500)
+    # 1-bit, effen: kleiner dan elke (RGBA-)variant
+    PIL.new("1", (1000, 500), 1).save(tmp_path / "flat.png", optimize=True)
+    return tmp_path
+
+
+def test_png_size(assets):
+    assert png_size((assets / "big.png").read_bytes()) == (1000, 500)
+    assert png_size(b"not a png") is None
+
+
+@pytest.mark.parametrize("box,expected", [
+    ((100, 50), 320), ((320, 10), 320), ((321, 10), 640), ((10, 200), 640),   # hoogte bepaalt: 200 * 2 = 400
+    ((900, 450), 960), ((1000, 500), None), ((5000, 5000), None),
+])
+def test_size_class(box, expected):
+    assert size_class(1000, 500, *box) == expected
+
+
+def test_size_class_never_upscales():
+    assert size_class(300, 300, 100, 100) is None
+    assert all(size_class(4000, 1000, w, 1) in VARIANT_WIDTHS for w in (1, 319, 2000, 2560))
+
+
+def test_variant_is_resized_and_cached(assets):
+    cache = AssetCache()
+    orig = cache.get(assets, "big.png")
+    v = cache.get_variant(assets, "big.png", 320)
+    assert v is not orig and v.variant == 320
+    assert png_size(v.data) == (320, 160)
+    assert v.digest != orig.digest and v.name == orig.name
+    assert cache.get_variant(assets, "big.png", 320) is v
+    assert cache.lookup("big.png", v.digest) is v
+    assert cache.issued("big.png", v.digest, 320) and not cache.issued("big.png", v.digest, 640)
+
+
+def test_variant_without_gain_is_the_original(assets):
+    cache = AssetCache()
+    orig = cache.get(assets, "flat.png")
+    assert cache.get_variant(assets, "flat.png", 320) is orig
+    assert cache.get_variant(assets, "flat.png", 320) is orig   # onthouden, niet opnieuw schalen
+
+
+def test_best_fit_respects_min_bytes(assets, monkeypatch):
+    import assetcache
+    cache = AssetCache()
+    monkeypatch.setattr(assetcache, "VARIANT_MIN_BYTES", 10**9)
+    assert cache.best_fit(assets, "big.png", 100, 50).variant == 0
+    monkeypatch.setattr(assetcache, "VARIANT_MIN_BYTES", 0)
+    assert cache.best_fit(assets, "big.png", 100, 50).variant == 320
+    assert cache.best_fit(assets, "big.png", 2000, 1000).variant == 0
+
+
+def test_variant_url_served():
+    v = backend.ASSET_CACHE.get_variant(backend.ASSETS_DIR, "Start.png", 640)
+    assert v.variant == 640
+    status, headers, body = asyncio.run(backend.process_request(backend.asset_url(v), {}))
+    assert status == 200 and body == bytes(v.data)
+    assert dict(headers)["ETag"] == f'"{v.digest}"'
+
+
+class FakeWS:
+    remote_address = ("test", 0)
+
+
+def _show_start(ws):
+    async def main():
+        return json.loads(await backend.handle_message({"messagetype": "SHOWSTART"}, ws=ws))
+    return asyncio.run(main())
+
+
+def test_known_asset_filter_uses_variant_digest():
+    """Eén filter, op de hash van wat echt meegaat: Start.png gaat als variant (box 1200 x 700)."""
+    orig = get_asset(backend.ASSETS_DIR, "Start.png")
+    ws = FakeWS()
+    first = _show_start(ws)
+    sent = first["png_hashes"]["Start.png"]
+    assert sent != orig.digest and "Start.png" in first["png_payloads"]
+    # de client heeft nu de variant: niet opnieuw
+    assert _show_start(ws)["png_payloads"] == {}
+    # meldt de client alleen het origineel, dan krijgt hij de variant (andere hash) alsnog
+    ws2 = FakeWS()
+    asyncio.run(backend.handle_message({"type": "hello", "assets": {"Start.png": orig.digest}}, ws=ws2))
+    again = _show_start(ws2)
+    assert again["png_hashes"] == {"Start.png": sent} and "Start.png" in again["png_payloads"]
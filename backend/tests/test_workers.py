@@ -0,0 +1,161 @@
+# backend/tests/test_workers.py
+from __future__ import annotations
+import base64
+import io
+import os
+import random
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import assetcache
+import simulate
+import workers
+from assetcache import AssetCache
+from assetpack import AssetPack, variant_key, write_pack
+from sessions import SessionTable, fcntl
+
+
+@pytest.fixture
+def assets(tmp_path):
+    d = tmp_path / "assets"
+    d.mkdir()
+    for i in range(3):
+        (d / f"a{i}.bin").write_bytes(bytes([i]) * 1000)
+    return d
+
+
+@pytest.fixture
+def pack(assets, tmp_path):
+    cache = AssetCache()
+    entries = [cache.get(assets, f"a{i}.bin") for i in range(3)]
+    write_pack(tmp_path / "assets.apak", entries, [(variant_key("a0.bin", 320), "a0.bin")])
+    return AssetPack(tmp_path / "assets.apak"), entries
+
+
+def test_pack_round_trip(pack):
+    p, entries = pack
+    assert len(p) == 4
+    for e in entries:
+        meta = p.meta(e.name)
+        assert (meta["digest"], meta["variant"], meta["size"]) == (e.digest, 0, e.size)
+        assert bytes(p.data(meta)) == e.data
+        assert base64.b64decode(bytes(p.b64(meta))) == e.data
+        assert p.variant_of(e.name, e.digest) == 0
+    assert p.meta("a0.bin@320") == {"alias": "a0.bin"}
+    assert p.variant_of("a0.bin", "0" * 16) is None
+    assert "nope.bin" not in p
+
+
+def test_not_a_pack(tmp_path):
+    (tmp_path / "x.apak").write_bytes(b"NOPE" + bytes(8))
+    with pytest.raises(ValueError):
+        AssetPack(tmp_path / "x.apak")
+
+
+def test_attach_pack(pack, assets):
+    p, entries = pack
+    cache = AssetCache()
+    cache.attach_pack(p)
+    e = cache.get(assets, "a1.bin")
+    assert e.shared and isinstance(e.data, memoryview)
+    assert bytes(e.data) == entries[1].data and e.digest == entries[1].digest
+    # alleen de base64 telt mee voor het budget van deze worker
+    assert cache.stats()["bytes"] == e.nbytes == len(entries[1].b64)
+    assert cache.issued("a1.bin", e.digest, 0)
+
+
+def test_attach_pack_rereads_changed_file(pack, assets):
+    p, _ = pack
+    cache = AssetCache()
+    cache.attach_pack(p)
+    f = assets / "a2.bin"
+    f.write_bytes(b"changed")
+    os.utime(f, ns=(1, 1))
+    e = cache.get(assets, "a2.bin")
+    assert not e.shared and e.data == b"changed"
+
+
+def test_shared_entries_count_against_budget(pack, assets):
+    p, entries = pack
+    cache = AssetCache(max_bytes=2 * len(entries[0].b64))
+    cache.attach_pack(p)
+    for i in range(3):
+        cache.get(assets, f"a{i}.bin")
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["bytes"] <= cache.max_bytes
+
+
+def test_build_pack(tmp_path, monkeypatch):
+    Image = pytest.importorskip("PIL.Image")
+    rng = random.Random(0)
+    d = tmp_path / "assets"
+    d.mkdir()
+    buf = io.BytesIO()
+    Image.frombytes("RGB", (1000, 500), bytes(rng.getrandbits(8) for _ in range(1000 * 500 * 3))).save(buf, "PNG")
+    (d / "big.png").write_bytes(buf.getvalue())
+    (d / "small.bin").write_bytes(b"x" * 10)
+    (d / ".hidden").write_bytes(b"x")
+    cache = AssetCache()
+    monkeypatch.setattr(workers, "ASSET_CACHE", cache)
+    monkeypatch.setattr(assetcache, "ASSET_CACHE", cache)
+    size = workers.build_pack(d, tmp_path / "assets.apak")
+    p = AssetPack(tmp_path / "assets.apak")
+    assert size == (tmp_path / "assets.apak").stat().st_size
+    assert "big.png" in p and "small.bin" in p and ".hidden" not in p
+    assert p.meta("big.png@320")["variant"] == 320
+
+
+@pytest.mark.parametrize("raw,expected", [
+    (None, 1), ("", 1), ("4", 4), (" 2 ", 2), ("-3", 1), ("abc", 1),
+    ("auto", os.cpu_count() or 1), ("0", os.cpu_count() or 1),
+])
+def test_worker_count(raw, expected):
+    assert workers.worker_count(raw) == expected
+
+
+def advance(table, sid, days):
+    table.create(sid)
+    return table.update(sid, lambda s: simulate.SimulateKeyframes(s, days, table.every))
+
+
+needs_fcntl = pytest.mark.skipif(fcntl is None, reason="shared session table needs fcntl")
+
+
+@needs_fcntl
+def test_shared_session_table(tmp_path):
+    path = tmp_path / "sessions.tbl"
+    SessionTable(max_sessions=16, path=path, create=True)
+    a = SessionTable(max_sessions=16, path=path)
+    b = SessionTable(max_sessions=16, path=path)
+    advance(a, "session-a", 7)
+    assert simulate.DayOf(b.get("session-a")) == 7
+    advance(b, "session-a", 3)
+    assert np.array_equal(a.get("session-a"), simulate.SimulateDays(simulate.NewState(), 10))
+    assert a.sessions() == b.sessions() == 1
+
+
+@needs_fcntl
+def test_shared_session_table_layout_mismatch(tmp_path):
+    path = tmp_path / "sessions.tbl"
+    SessionTable(max_sessions=16, path=path, create=True)
+    with pytest.raises(ValueError):
+        SessionTable(max_sessions=4096, path=path)
+    with pytest.raises(ValueError):
+        SessionTable(max_sessions=16, path=path, every=3)
+
+
+@needs_fcntl
+def test_shared_session_table_across_processes(tmp_path):
+    """Een worker is een ander proces: zijn commit is direct zichtbaar in de tabel van de supervisor."""
+    path = tmp_path / "sessions.tbl"
+    table = SessionTable(max_sessions=16, path=path, create=True)
+    script = ("import sys, simulate; from sessions import SessionTable;"
+              "t = SessionTable(max_sessions=16, path=sys.argv[1]); t.create('session-w');"
+              "t.update('session-w', lambda s: simulate.SimulateDays(s, 4))")
+    subprocess.run([sys.executable, "-c", script, str(path)], cwd=Path(__file__).resolve().parent.parent,
+                   check=True, timeout=60)
+    assert simulate.DayOf(table.get("session-w")) == 4
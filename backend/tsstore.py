@@ -0,0 +1,321 @@
+# backend/tsstore.py
+from __future__ import annotations
+import atexit
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import asyncio
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, TypeVar
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - zonder fcntl geen lock (Windows, één proces)
+    fcntl = None
+
+import simulate
+from workpool import run
+
+T = TypeVar("T")
+
+# Tijdreeksen per sessie voor de dashboards: per dag de SERIES_FIELDS (voorraden + KPI's) van de
+# simulatie. Eén bestand per sessie in TS_DIR, gemapt met mmap; kolomsgewijs in blokken van
+# BLOCK_DAYS dagen (per blok eerst alle dagen van veld 0, dan veld 1, ...), dus een bereik van één
+# KPI is een aaneengesloten stuk geheugen en het bestand groeit per blok zonder te herschrijven.
+#
+#   b"TSER" | u32 velden | u32 BLOCK_DAYS | u64 lengte (dagen) | padding tot HEADER_BYTES | blokken
+#
+# Rij d = de state aan het eind van dag d (rij 0 = beginstate). Schrijven gebeurt op dagnummer:
+# schrijven vanaf dag d maakt d..eind de nieuwe staart (append na een run; na rewind/reset is de
+# oude staart daarmee vervallen). In multi-worker mode zetten de workers TS_DIR op dezelfde map;
+# een fcntl-lock per bestand houdt schrijvers uit elkaar. Bestanden van sessies die de sessietabel
+# (sessions.py) niet meer kent worden opgeruimd.
+# Vanaf de event loop: de a*-varianten (awrite, areset, ...) doen open/flock/pwrite/mmap in de
+# thread-pool (workpool.py), per sessie in de volgorde waarin ze aangeroepen zijn.
+
+BLOCK_DAYS = 1024
+HEADER_BYTES = 64
+_HEADER = struct.Struct("<4sIIQ")
+_MAGIC = b"TSER"
+# standaard zoveel buckets in een query-antwoord
+DEFAULT_POINTS = 300
+MAX_POINTS = 5000
+SWEEP_INTERVAL_S = 60.0
+# langste tijdreeks per sessie in dagen (elke dag kost NF * 8 bytes op schijf); RUNSIMULATION
+# weigert runs die daarboven uitkomen (check_room), write() schrijft er nooit voorbij
+TS_MAX_DAYS = int(os.getenv("TS_MAX_DAYS", "36500"))
+
+FIELDS = simulate.SERIES_FIELDS[1:]   # Day is de index, geen kolom
+NF = len(FIELDS)
+_BLOCK_BYTES = NF * BLOCK_DAYS * 8
+
+
+class SeriesFile:
+    """Eén sessie; open() ... close() rond elke bewerking (bestanden kunnen door andere workers groeien)."""
+
+    def __init__(self, path: Path, create: bool = False):
+        self.path = path
+        flags = os.O_RDWR | (os.O_CREAT if create else 0)
+        self.fd = os.open(path, flags, 0o644)
+        if fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+        size = os.fstat(self.fd).st_size
+        if size < HEADER_BYTES:
+            os.ftruncate(self.fd, HEADER_BYTES)
+            os.pwrite(self.fd, _HEADER.pack(_MAGIC, NF, BLOCK_DAYS, 0), 0)
+            size = HEADER_BYTES
+        magic, nf, block, length = _HEADER.unpack(os.pread(self.fd, _HEADER.size, 0))
+        if magic != _MAGIC or (nf, block) != (NF, BLOCK_DAYS):
+            self.close()
+            raise ValueError(f"series file {path}: layout mismatch")
+        self.length = length
+        self._mm: Optional[mmap.mmap] = None
+        self._blocks = (size - HEADER_BYTES) // _BLOCK_BYTES
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self.fd >= 0:
+            os.close(self.fd)  # geeft ook de flock vrij
+            self.fd = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _view(self, blocks: int) -> np.ndarray:
+        """(blokken, velden, BLOCK_DAYS)-view op het bestand; groeit het bestand waar nodig."""
+        if blocks > self._blocks:
+            os.ftruncate(self.fd, HEADER_BYTES + blocks * _BLOCK_BYTES)
+            self._blocks = blocks
+            if self._mm is not None:
+                self._mm.close()
+                self._mm = None
+        if self._mm is None:
+            self._mm = mmap.mmap(self.fd, HEADER_BYTES + self._blocks * _BLOCK_BYTES)
+        return np.frombuffer(self._mm, dtype=np.float64, offset=HEADER_BYTES,
+                             count=self._blocks * NF * BLOCK_DAYS).reshape(self._blocks, NF, BLOCK_DAYS)
+
+    def _set_length(self, length: int) -> None:
+        self.length = length
+        os.pwrite(self.fd, _HEADER.pack(_MAGIC, NF, BLOCK_DAYS, length), 0)
+
+    def write(self, rows: np.ndarray) -> None:
+        """rows (n x SERIES_FIELDS, Day eerst, oplopend en aaneengesloten) vanaf dag rows[0, 0]."""
+        first = int(rows[0, 0])
+        if first > self.length:
+            raise ValueError(f"series gap: day {first} after {self.length} stored days")
+        end = first + len(rows)
+        view = self._view(-(-end // BLOCK_DAYS))
+        cols = np.ascontiguousarray(rows[:, 1:].T)
+        day = first
+        while day < end:
+            b, i = divmod(day, BLOCK_DAYS)
+            n = min(BLOCK_DAYS - i, end - day)
+            view[b, :, i:i + n] = cols[:, day - first:day - first + n]
+            day += n
+        self._set_length(end)
+
+    def truncate(self, days: int) -> None:
+        if days < self.length:
+            self._set_length(max(0, days))
+
+    def column(self, field: int, start: int, end: int) -> np.ndarray:
+        """Dagen start..end-1 van één veld (kopie)."""
+        if end <= start:
+            return np.empty(0)
+        view = self._view(self._blocks)
+        b0, b1 = start // BLOCK_DAYS, (end - 1) // BLOCK_DAYS + 1
+        col = view[b0:b1, field, :].reshape(-1)
+        return col[start - b0 * BLOCK_DAYS:end - b0 * BLOCK_DAYS].copy()
+
+
+_dir: Optional[Path] = None
+_last_sweep = 0.0
+
+
+def series_dir() -> Path:
+    """TS_DIR (gedeeld in multi-worker mode), anders een eigen tijdelijke map voor dit proces."""
+    global _dir
+    if _dir is None:
+        env = os.getenv("TS_DIR")
+        if env:
+            _dir = Path(env)
+            _dir.mkdir(parents=True, exist_ok=True)
+        else:
+            _dir = Path(tempfile.mkdtemp(prefix="alignment-series-"))
+            atexit.register(shutil.rmtree, _dir, True)
+    return _dir
+
+
+def _path(session_id: str) -> Path:
+    return series_dir() / f"{session_id}.ts"
+
+
+def write(session_id: str, rows) -> None:
+    """Dagrijen (SERIES_FIELDS) van deze sessie wegschrijven; alles na de laatste rij vervalt."""
+    rows = np.asarray(rows, dtype=np.float64)
+    if rows.ndim != 2 or not len(rows):
+        return
+    rows = rows[:max(0, TS_MAX_DAYS - int(rows[0, 0]))]
+    if not len(rows):
+        return
+    with SeriesFile(_path(session_id), create=True) as f:
+        if int(rows[0, 0]) > f.length:
+            return  # geschiedenis ontbreekt (bv. sessie van vóór deze store): niet met gaten vullen
+        f.write(rows)
+    _maybe_sweep()
+
+
+def check_room(day: int, days: int) -> None:
+    """ValueError als `days` dagen vanaf dag `day` de tijdreeks langer maken dan TS_MAX_DAYS."""
+    if day + days >= TS_MAX_DAYS:
+        raise ValueError(f"series full: day {day} + {days} days exceeds {TS_MAX_DAYS} "
+                         f"(reset, rewind or branch first)")
+
+
+def truncate(session_id: str, day: int) -> None:
+    """Alles na `day` weg (rewind)."""
+    try:
+        with SeriesFile(_path(session_id)) as f:
+            f.truncate(day + 1)
+    except FileNotFoundError:
+        pass
+
+
+def reset(session_id: str, state: np.ndarray) -> None:
+    """Nieuwe tijdlijn vanaf `state` (reset naar dag 0)."""
+    with SeriesFile(_path(session_id), create=True) as f:
+        f.truncate(0)
+        f.write(simulate.SeriesRow(state)[None, :])
+
+
+def branch(session_id: str, day: int, new_id: str) -> None:
+    """Geschiedenis t/m `day` van deze sessie kopiëren naar sessie `new_id`."""
+    try:
+        with SeriesFile(_path(session_id)) as src:
+            n = min(src.length, day + 1)
+            cols = [src.column(i, 0, n) for i in range(NF)]
+    except FileNotFoundError:
+        return
+    rows = np.column_stack([np.arange(n, dtype=np.float64)] + cols)
+    with SeriesFile(_path(new_id), create=True) as f:
+        f.truncate(0)
+        if n:
+            f.write(rows)
+
+
+def length(session_id: str) -> int:
+    try:
+        with SeriesFile(_path(session_id)) as f:
+            return f.length
+    except FileNotFoundError:
+        return 0
+
+
+def query(session_id: str, fields: Sequence[str], start: int, end: Optional[int],
+          points: int = DEFAULT_POINTS) -> Dict[str, Any]:
+    """Dagen start..end (inclusief) in hooguit `points` buckets; per veld min/max/mean per bucket.
+    Past het bereik er al in, dan is elke bucket één dag (min = max = mean)."""
+    unknown = [f for f in fields if f not in FIELDS]
+    if unknown:
+        raise ValueError(f"unknown series field(s): {', '.join(unknown)} (known: {', '.join(FIELDS)})")
+    fields = list(fields) or list(FIELDS)
+    points = max(1, min(int(points), MAX_POINTS))
+    try:
+        f = SeriesFile(_path(session_id))
+    except FileNotFoundError:
+        return {"day": [], "bucket": 1, "length": 0, "fields": {name: {"min": [], "max": [], "mean": []}
+                                                                for name in fields}}
+    with f:
+        stop = f.length if end is None else min(f.length, int(end) + 1)
+        start = max(0, int(start))
+        cols = {name: f.column(FIELDS.index(name), start, stop) for name in fields}
+        total = f.length
+    n = max(0, stop - start)
+    bucket = max(1, -(-n // points))
+    edges = np.arange(0, n, bucket)
+    out: Dict[str, Any] = {"day": (start + edges).tolist(), "bucket": bucket, "length": total, "fields": {}}
+    counts = np.diff(np.append(edges, n))
+    for name, col in cols.items():
+        if not n:
+            out["fields"][name] = {"min": [], "max": [], "mean": []}
+            continue
+        out["fields"][name] = {
+            "min": np.minimum.reduceat(col, edges).tolist(),
+            "max": np.maximum.reduceat(col, edges).tolist(),
+            "mean": np.round(np.add.reduceat(col, edges) / counts, 4).tolist(),
+        }
+    return out
+
+
+# ---- async (event loop) ----
+# per sessie: [lock, aantal wachtenden]; een reset mag niet vóór een eerder aangeroepen write draaien
+_order: Dict[str, List[Any]] = {}
+
+
+async def _in_order(session_id: str, fn: Callable[..., T], *args: Any) -> T:
+    entry = _order.get(session_id)
+    if entry is None:
+        entry = _order[session_id] = [asyncio.Lock(), 0]
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            return await run(fn, *args)
+    finally:
+        entry[1] -= 1
+        if not entry[1]:
+            del _order[session_id]
+
+
+async def awrite(session_id: str, rows) -> None:
+    await _in_order(session_id, write, session_id, rows)
+
+
+async def atruncate(session_id: str, day: int) -> None:
+    await _in_order(session_id, truncate, session_id, day)
+
+
+async def areset(session_id: str, state: np.ndarray) -> None:
+    await _in_order(session_id, reset, session_id, state)
+
+
+async def abranch(session_id: str, day: int, new_id: str) -> None:
+    await _in_order(session_id, branch, session_id, day, new_id)
+
+
+async def aquery(session_id: str, fields: Sequence[str], start: int, end: Optional[int],
+                 points: int = DEFAULT_POINTS) -> Dict[str, Any]:
+    return await run(query, session_id, fields, start, end, points)
+
+
+def _maybe_sweep() -> None:
+    """Reeksen van sessies die de sessietabel niet meer kent (verlopen of verdrongen) weggooien.
+    Niet op mtime: een sessie die lang niet simuleerde maar nog wel leeft houdt haar reeks."""
+    global _last_sweep
+    now = time.time()
+    if now - _last_sweep < SWEEP_INTERVAL_S:
+        return
+    _last_sweep = now
+    import sessions
+    table = sessions.registry()
+    for p in series_dir().glob("*.ts"):
+        if p.stem in table:
+            continue
+        try:
+            p.unlink()
+        except OSError:
+            pass
+
+
+__all__ = ["FIELDS", "BLOCK_DAYS", "DEFAULT_POINTS", "MAX_POINTS", "TS_MAX_DAYS", "SeriesFile", "series_dir", "write",
+           "check_room", "truncate", "reset", "branch", "length", "query", "awrite", "atruncate", "areset", "abranch",
+           "aquery"]
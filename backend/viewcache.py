@@ -0,0 +1,162 @@
+# backend/viewcache.py
+from __future__ import annotations
+import importlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+from weakref import WeakKeyDictionary
+
+import ModelData_RectangelsLinesAndTriangles as model
+from protocol import dumps
+from compact import encode_scene
+from scenediff import diff_scene
+from hittest import SceneIndex
+from workpool import single_flight
+
+# Cache voor de "statische" views (SHOWPROCESS/CONTROL/INFORMATION/ORGANIZATION).
+# De scène (rectangles/triangles/arrows/images) wordt één keer gebouwd en meteen naar een
+# JSON-fragment geserialiseerd; per request plakken we alleen numbers/texts en de PNG-velden
+# ervoor/erachter. Bij een gewijzigde ModelData-file (mtime) wordt de module herladen en alles
+# opnieuw gebouwd. PNG-inhoud hoort niet in het fragment: die loopt per request via de asset-cache.
+# Sleutels zijn vrij (bv. (view, canvasbreedte, canvashoogte), zie scenes.py); de cache is LRU-begrensd
+# omdat clients hun eigen canvasmaat mogen opgeven.
+
+SCENE_KEYS = ("rectangles", "triangles", "arrows", "images")
+
+
+class PreparedView:
+    """Eén gebouwde scène: jsonable dict + vooraf geserialiseerd geometrie-fragment."""
+    __slots__ = ("messagetype", "scene", "pngs", "geometry_json", "_compact_json", "_patches", "_index",
+                 "__weakref__")
+
+    def __init__(self, messagetype: str, scene: Dict[str, List[Dict[str, Any]]]):
+        self.messagetype = messagetype
+        # via JSON normaliseren: enums -> strings, tuples -> lists (zelfde als wat de client ziet)
+        self.scene = json.loads(json.dumps({k: scene.get(k) or [] for k in SCENE_KEYS}))
+        self.pngs: Tuple[str, ...] = tuple(dict.fromkeys(
+            im["filename"] for im in self.scene["images"] if im.get("filename")))
+        # ', "rectangles": [...], "triangles": [...], "arrows": [...], "images": [...]'
+        self.geometry_json = "".join(
+            f", {json.dumps(k)}: {json.dumps(self.scene[k])}" for k in SCENE_KEYS)
+        self._compact_json: str | None = None
+        # vorige view -> patch-JSON (scenediff.py); weak zodat uit de cache gevallen views verdwijnen
+        self._patches: "WeakKeyDictionary[PreparedView, str]" = WeakKeyDictionary()
+        self._index: SceneIndex | None = None
+
+    def fragment(self, fmt: str = "full") -> str:
+        """Geserialiseerde geometrie in het gevraagde wire-format (compact: lazy, één keer)."""
+        if fmt != "compact":
+            return self.geometry_json
+        if self._compact_json is None:
+            enc = encode_scene(self.scene)
+            self._compact_json = ', "format": "compact"' + "".join(
+                f", {json.dumps(k)}: {json.dumps(v)}" for k, v in enc.items())
+        return self._compact_json
+
+    def index(self) -> SceneIndex:
+        """Grid-index voor hit-tests (hittest.py): lazy, één keer per gebouwde view."""
+        if self._index is None:
+            self._index = SceneIndex(self.scene)
+        return self._index
+
+    @property
+    def indexed(self) -> bool:
+        return self._index is not None
+
+    def patch_json_from(self, prev_view: "PreparedView | None", prev_scene: Dict[str, Any]) -> str:
+        """JSON van de patch vanaf de vorige scène; tussen twee gecachte views maar één keer berekend."""
+        if prev_view is None:
+            return json.dumps(diff_scene(prev_scene, self.scene))
+        p = self._patches.get(prev_view)
+        if p is None:
+            p = self._patches[prev_view] = json.dumps(diff_scene(prev_view.scene, self.scene))
+        return p
+
+    def respond(self, numbers, texts, png_payloads: Dict[str, str]) -> "ViewResponse":
+        return ViewResponse(self, numbers, texts, png_payloads)
+
+
+class ViewResponse:
+    """Handler-resultaat voor een gecachte view; backend.handle_text_message plakt de JSON."""
+    __slots__ = ("view", "numbers", "texts", "png_payloads")
+
+    def __init__(self, view: PreparedView, numbers, texts, png_payloads: Dict[str, str]):
+        self.view = view
+        self.numbers = numbers
+        self.texts = texts
+        self.png_payloads = png_payloads
+
+    def to_json(self, tail: Dict[str, Any], fmt: str = "full", patch_json: str | None = None) -> str:
+        """Zelfde sleutelvolgorde als Message.to_jsonable(); `tail` = png_payloads (+ png_hashes/urls).
+        Met `patch_json` gaat alleen de patch mee i.p.v. de geometrie (scenediff.py)."""
+        return "".join((
+            '{"messagetype": ', json.dumps(self.view.messagetype),
+            ', "numbers": ', json.dumps(self.numbers),
+            ', "texts": ', json.dumps(self.texts),
+            self.view.fragment(fmt) if patch_json is None else ', "patch": ' + patch_json,
+            ", ", dumps(tail)[1:],
+        ))
+
+
+def _model_mtime() -> int:
+    try:
+        return os.stat(model.__file__).st_mtime_ns
+    except OSError:
+        return 0
+
+
+class ViewCache:
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._views: "OrderedDict[Hashable, PreparedView]" = OrderedDict()
+        self._mtime = _model_mtime()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, build: Callable[[], PreparedView]) -> PreparedView:
+        self._check_model()
+        with self._lock:
+            v = self._views.get(key)
+            if v is not None:
+                self._views.move_to_end(key)
+                return v
+        v = build()
+        with self._lock:
+            self._views[key] = v
+            while len(self._views) > self.max_entries:
+                self._views.popitem(last=False)
+        return v
+
+    async def aget(self, key: Hashable, build: Callable[[], PreparedView]) -> PreparedView:
+        """get() met de build in de thread-pool; gelijktijdige builds van dezelfde key maar één keer."""
+        self._check_model()
+        with self._lock:
+            v = self._views.get(key)
+            if v is not None:
+                self._views.move_to_end(key)
+                return v
+        return await single_flight(("view", key), self.get, key, build)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._views.clear()
+
+    def _check_model(self) -> None:
+        mtime = _model_mtime()
+        if mtime == self._mtime:
+            return
+        self._mtime = mtime
+        try:
+            importlib.reload(model)
+        except Exception:
+            # halfweg opgeslagen/kapotte file: oude data houden, volgende request opnieuw proberen
+            self._mtime = 0
+            return
+        self.invalidate()
+
+
+VIEW_CACHE = ViewCache(int(os.getenv("VIEW_CACHE_ENTRIES", "64")))
+
+
+__all__ = ["PreparedView", "ViewResponse", "ViewCache", "VIEW_CACHE", "model"]
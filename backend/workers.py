@@ -0,0 +1,152 @@
+# backend/workers.py
+from __future__ import annotations
+import asyncio
+import logging
+import multiprocessing
+import os
+import shutil
+import signal
+import socket
+import tempfile
+import time
+from multiprocessing.connection import wait
+from pathlib import Path
+from typing import Dict, Optional
+
+from assetcache import ASSET_CACHE, prewarm
+from assetpack import AssetPack, write_pack
+from sessions import SessionTable, fcntl
+
+# Multi-worker mode: WORKERS=N (of "auto" = aantal cores) start N processen die elk een
+# websockets-server draaien op dezelfde poort (SO_REUSEPORT; de kernel verdeelt de verbindingen).
+# De supervisor (dit proces) bouwt vooraf één read-only asset-pack (assetpack.py, mmap) en de
+# gedeelde sessietabel met de simulatie-state (sessions.py), en herstart workers die omvallen
+# (met backoff als ze direct weer crashen). Per-verbinding state (connstate.py) blijft gewoon in de
+# worker die de verbinding heeft: een WS-verbinding verhuist nooit van proces.
+
+log = logging.getLogger("alignment-backend")
+
+# een worker die korter leefde dan dit telt als crash-loop: volgende start met (verdubbelende) vertraging
+MIN_UPTIME_S = 5.0
+MAX_BACKOFF_S = 30.0
+
+
+def worker_count(raw: Optional[str]) -> int:
+    """WORKERS-setting: getal, of "auto"/"0" voor het aantal cores; ongeldig -> 1."""
+    raw = (raw or "1").strip().lower()
+    if raw in ("auto", "0"):
+        return os.cpu_count() or 1
+    try:
+        return max(1, int(raw))
+    except ValueError:
+        return 1
+
+
+def build_pack(assets_dir: Path, path: Path) -> int:
+    """Alle assets + varianten inlezen en als gedeelde pack wegschrijven; geeft de grootte."""
+    for f in sorted(assets_dir.iterdir()):
+        if f.is_file() and not f.name.startswith("."):
+            ASSET_CACHE.get(assets_dir, f.name)
+    prewarm(assets_dir)
+    return write_pack(path, ASSET_CACHE.entries(), ASSET_CACHE.no_gain_keys())
+
+
+def _worker_main(idx: int, pack_path: str, sessions_path: str) -> None:
+    # Ctrl-C gaat naar de hele procesgroep; afsluiten regelt de supervisor (SIGTERM)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    import backend
+    import sessions
+    ASSET_CACHE.attach_pack(AssetPack(Path(pack_path)))
+    sessions.attach_shared(Path(sessions_path))
+    log.info("worker %d (pid %d) starting", idx, os.getpid())
+    asyncio.run(backend.main(reuse_port=True, prewarm_assets=False))
+
+
+class _Slot:
+    __slots__ = ("idx", "proc", "started", "backoff", "restart_at")
+
+    def __init__(self, idx: int):
+        self.idx = idx
+        self.proc: Optional[multiprocessing.Process] = None
+        self.started = 0.0
+        self.backoff = 0.0
+        self.restart_at = 0.0
+
+
+def run_workers(n: int, assets_dir: Path) -> None:
+    """Supervisor: bouwt de gedeelde state, start n workers en houdt ze in de lucht tot SIGINT/SIGTERM."""
+    if not hasattr(socket, "SO_REUSEPORT") or fcntl is None:
+        log.warning("multi-worker mode needs SO_REUSEPORT and fcntl; running a single process")
+        import backend
+        asyncio.run(backend.main())
+        return
+
+    rundir = Path(tempfile.mkdtemp(prefix="alignment-backend-"))
+    pack_path = rundir / "assets.apak"
+    sessions_path = rundir / "sessions.tbl"
+    t0 = time.perf_counter()
+    size = build_pack(assets_dir, pack_path)
+    SessionTable(path=sessions_path, create=True)
+    ASSET_CACHE.clear()  # de supervisor zelf serveert niets
+    log.info("asset pack %s: %.1f MB in %.2fs", pack_path, size / 1e6, time.perf_counter() - t0)
+
+    # de simulatie-pools van de workers (simpool.py) delen samen de cores
+    os.environ.setdefault("SIM_PROCS", str(max(1, (os.cpu_count() or 1) // n)))
+    # en samen één map met tijdreeksen (tsstore.py), zodat elke worker elke sessie kan bevragen
+    os.environ.setdefault("TS_DIR", str(rundir / "series"))
+    # /metrics telt de snapshots van alle workers op (metrics.py)
+    os.environ.setdefault("METRICS_DIR", str(rundir / "metrics"))
+    ctx = multiprocessing.get_context("spawn")
+    slots: Dict[int, _Slot] = {i: _Slot(i) for i in range(n)}
+    stopping = False
+
+    def _stop(signum, _frame):
+        nonlocal stopping
+        stopping = True
+
+    prev = {s: signal.signal(s, _stop) for s in (signal.SIGINT, signal.SIGTERM)}
+
+    def _start(slot: _Slot) -> None:
+        # geen daemon: een worker start zelf een process-pool voor de simulatie (simpool.py);
+        # opruimen doet de finally hieronder
+        slot.proc = ctx.Process(target=_worker_main, args=(slot.idx, str(pack_path), str(sessions_path)),
+                                name=f"worker-{slot.idx}")
+        slot.proc.start()
+        slot.started = time.monotonic()
+
+    try:
+        for slot in slots.values():
+            _start(slot)
+        log.info("supervisor (pid %d) started %d workers", os.getpid(), n)
+        while not stopping:
+            running = [s.proc.sentinel for s in slots.values() if s.proc is not None]
+            wait(running, timeout=0.5)
+            now = time.monotonic()
+            for slot in slots.values():
+                if stopping:
+                    break
+                if slot.proc is not None and not slot.proc.is_alive():
+                    code = slot.proc.exitcode
+                    slot.proc = None
+                    crashed_fast = now - slot.started < MIN_UPTIME_S
+                    slot.backoff = min(MAX_BACKOFF_S, max(1.0, slot.backoff * 2)) if crashed_fast else 0.0
+                    slot.restart_at = now + slot.backoff
+                    log.warning("worker %d exited (code %s); restarting in %.0fs", slot.idx, code, slot.backoff)
+                if slot.proc is None and now >= slot.restart_at:
+                    _start(slot)
+    finally:
+        for slot in slots.values():
+            if slot.proc is not None and slot.proc.is_alive():
+                slot.proc.terminate()
+        for slot in slots.values():
+            if slot.proc is not None:
+                slot.proc.join(timeout=5)
+                if slot.proc.is_alive():
+                    slot.proc.kill()
+        for s, h in prev.items():
+            signal.signal(s, h)
+        shutil.rmtree(rundir, ignore_errors=True)
+        log.info("supervisor stopped")
+
+
+__all__ = ["worker_count", "build_pack", "run_workers"]
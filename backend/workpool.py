@@ -0,0 +1,45 @@
+# backend/workpool.py
+from __future__ import annotations
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, TypeVar
+
+# Begrensde thread-pool voor blokkerend werk dat niet op de event loop hoort: asset lezen +
+# base64, varianten schalen (Pillow), scènes bouwen en grote json-dumps. Zo blijft één SHOWSTART
+# (2.3 MB lezen/encoden) de andere verbindingen niet ophouden.
+# single_flight(key, ...) voegt gelijktijdige identieke jobs samen: de eerste doet het werk,
+# de rest wacht op hetzelfde resultaat. Een gecancelde wachter (scheduler.py) cancelt de
+# gedeelde job niet.
+
+T = TypeVar("T")
+
+IO_THREADS = int(os.getenv("IO_THREADS", str(min(8, (os.cpu_count() or 1) + 2))))
+# json-dumps vanaf (ongeveer) deze omvang in de pool; kleinere antwoorden direct op de loop
+BIG_DUMPS_BYTES = int(os.getenv("BIG_DUMPS_BYTES", str(256 * 1024)))
+
+POOL = ThreadPoolExecutor(max_workers=IO_THREADS, thread_name_prefix="io")
+
+_inflight: Dict[Hashable, "asyncio.Future[Any]"] = {}
+
+
+async def run(fn: Callable[..., T], *args: Any) -> T:
+    """fn(*args) in de pool uitvoeren en het resultaat afwachten."""
+    return await asyncio.get_running_loop().run_in_executor(POOL, fn, *args)
+
+
+async def single_flight(key: Hashable, fn: Callable[..., T], *args: Any) -> T:
+    """Als run(), maar één uitvoering per `key` tegelijk; gelijktijdige callers delen het resultaat."""
+    fut = _inflight.get(key)
+    if fut is None:
+        fut = asyncio.get_running_loop().run_in_executor(POOL, fn, *args)
+        _inflight[key] = fut
+        fut.add_done_callback(lambda _f: _inflight.pop(key, None))
+    return await asyncio.shield(fut)
+
+
+def inflight() -> int:
+    return len(_inflight)
+
+
+__all__ = ["IO_THREADS", "BIG_DUMPS_BYTES", "POOL", "run", "single_flight", "inflight"]
@@ -10,15 +10,73 @@
 (function (global) {
   'use strict';
 
-  function createRenderer(canvas) {
+  // Compact wire-format (backend/compact.py) → gewone lijsten objecten.
+  //   styles: [{font, fontsize, ...}], rectangles: {count, style: [idx], columns: {name: [...], x: [...]}}
+  const SCENE_KEYS = ['rectangles', 'triangles', 'arrows', 'images'];
+  function decodeCompact(msg) {
+    if (!msg || msg.format !== 'compact') return msg;
+    const styles = msg.styles || [];
+    const out = Object.assign({}, msg);
+    for (const key of SCENE_KEYS) {
+      const enc = msg[key];
+      if (!enc || Array.isArray(enc)) continue;
+      const cols = Object.entries(enc.columns || {});
+      const items = new Array(enc.count);
+      for (let i = 0; i < enc.count; i++) {
+        const obj = Object.assign({}, styles[enc.style[i]]);
+        for (const [f, col] of cols) obj[f] = col[i];
+        items[i] = obj;
+      }
+      out[key] = items;
+    }
+    delete out.format;
+    delete out.styles;
+    return out;
+  }
+
+  // Scène-diff (backend/scenediff.py): elementen herkend aan name, dubbele namen → "name#2", ...
+  function sceneKeys(items) {
+    const seen = new Map();
+    return items.map(it => {
+      const name = String(it.name ?? '');
+      const n = (seen.get(name) || 0) + 1;
+      seen.set(name, n);
+      return n === 1 ? name : `${name}#${n}`;
+    });
+  }
+
+  function applyPatch(scene, patch) {
+    const out = {};
+    for (const key of SCENE_KEYS) {
+      const items = scene[key] || [];
+      const p = patch[key];
+      if (!p) { out[key] = items; continue; }
+      const keys = sceneKeys(items);
+      const byKey = new Map(keys.map((k, i) => [k, Object.assign({}, items[i])]));
+      for (const k of p.remove || []) byKey.delete(k);
+      for (const c of p.change || []) {
+        const it = byKey.get(c.key);
+        if (!it) continue;
+        for (const [f, v] of Object.entries(c.fields)) { if (v === null) delete it[f]; else it[f] = v; }
+      }
+      const order = [...byKey.keys()];
+      for (const a of p.add || []) { byKey.set(a.key, a.item); order.push(a.key); }
+      out[key] = (p.order || order).map(k => byKey.get(k)).filter(Boolean);
+    }
+    return out;
+  }
+
+  function createRenderer(canvas, { assetBase = '' } = {}) {
     if (!canvas) throw new Error('DrawCanvas: canvas element is required');
     const ctx = canvas.getContext('2d');
 
     // Client-side cache op bestandsnaam → ImageBitmap
     const imageCache = new Map();
+    // bestandsnaam → content-hash (uit msg.png_hashes); wordt bij elke request naar de backend gemeld
+    const assetHashes = new Map();
 
-    function loadFromPayload(filename, b64) {
-      if (imageCache.has(filename)) return imageCache.get(filename);
+    function loadFromPayload(filename, b64, hash) {
+      if (imageCache.has(filename) && (!hash || assetHashes.get(filename) === hash)) return imageCache.get(filename);
       const p = new Promise((resolve, reject) => {
         const img = new Image();
         img.onload = () => resolve(img);
@@ -26,9 +84,49 @@
         img.src = "data:image/png;base64," + b64;
       });
       imageCache.set(filename, p);
+      if (hash) assetHashes.set(filename, hash);
       return p;
     }
 
+    // Transport "url": backend stuurt /assets/<hash>/<naam>; browser/CDN cachen de PNG zelf
+    function loadFromUrl(filename, url, hash) {
+      if (imageCache.has(filename) && (!hash || assetHashes.get(filename) === hash)) return imageCache.get(filename);
+      const p = new Promise((resolve, reject) => {
+        const img = new Image();
+        img.crossOrigin = 'anonymous';
+        img.onload = () => resolve(img);
+        img.onerror = reject;
+        img.src = assetBase + url;
+      });
+      imageCache.set(filename, p);
+      if (hash) assetHashes.set(filename, hash);
+      return p;
+    }
+
+    // Binary asset-frame van de backend (transport "binary", zie protocol.pack_asset_frame_header):
+    //   "ASET" | u16 naamlengte | naam | u8 hashlengte | hash | u32 datalengte | PNG-bytes
+    const textDecoder = new TextDecoder();
+    function acceptAssetFrame(buf) {
+      const dv = new DataView(buf);
+      if (textDecoder.decode(new Uint8Array(buf, 0, 4)) !== 'ASET') return null;
+      let off = 4;
+      const nlen = dv.getUint16(off); off += 2;
+      const filename = textDecoder.decode(new Uint8Array(buf, off, nlen)); off += nlen;
+      const hlen = dv.getUint8(off); off += 1;
+      const hash = textDecoder.decode(new Uint8Array(buf, off, hlen)); off += hlen;
+      const dlen = dv.getUint32(off); off += 4;
+      const blob = new Blob([new Uint8Array(buf, off, dlen)], { type: 'image/png' });
+      const p = createImageBitmap(blob);
+      imageCache.set(filename, p);
+      assetHashes.set(filename, hash);
+      return filename;
+    }
+
+    // { filename: hash } van alles wat we al hebben → backend stuurt die PNG's niet opnieuw
+    function knownAssets() {
+      return Object.fromEntries(assetHashes);
+    }
+
     // ---- Helpers ----------------------------------------------------------
     function applyLineType(ctx, linetype) {
       if (linetype === 'DASHED') ctx.setLineDash([8, 6]);
@@ -50,9 +148,23 @@
       ctx.clearRect(0, 0, canvas.width, canvas.height);
     }
 
+    // Laatst getoonde scène; een "patch"-bericht wordt hierop toegepast
+    let retained = null;
+
+    // compact/patch → volledig bericht met gewone lijsten, en onthouden als huidige scène
+    function retain(msg) {
+      msg = decodeCompact(msg);
+      const scene = msg.patch
+        ? applyPatch(retained || {}, msg.patch)
+        : Object.fromEntries(SCENE_KEYS.map(k => [k, msg[k] || []]));
+      retained = scene;
+      return Object.assign({}, msg, scene);
+    }
+
     // ---- Rendering --------------------------------------------------------
     async function render(msg) {
       // msg: { images, rectangles, triangles, arrows, png_payloads, ... }
+      msg = retain(msg);
       clear();
 
       // 0) Images cachen
@@ -60,11 +172,16 @@
       const images = msg.images || [];
       
       if (msg.png_payloads) { // Cache bijwerken met evt. nieuwe payloads
+        const hashes = msg.png_hashes || {};
         for (const [fn, b64] of Object.entries(msg.png_payloads)) {
-          // alleen nieuw cachen; overschrijven kan ook als je versiebeheer wilt
-          if (!imageCache.has(fn)) loadFromPayload(fn, b64);
+          // nieuw of gewijzigd (andere hash) → (opnieuw) cachen
+          loadFromPayload(fn, b64, hashes[fn]);
         }
       }
+      if (msg.png_urls) {
+        const hashes = msg.png_hashes || {};
+        for (const [fn, url] of Object.entries(msg.png_urls)) loadFromUrl(fn, url, hashes[fn]);
+      }
 
       // 1) Canvas leegmaken
       ctx.clearRect(0, 0, canvas.width, canvas.height);
@@ -164,12 +281,14 @@
       }
     }
 
-    return {render, clear, imageCache, resetCache() { imageCache.clear(); } // handig als je ooit wilt resetten
+    return {render, retain, clear, imageCache, knownAssets, acceptAssetFrame,
+      hasScene() { return retained !== null; },
+      resetCache() { imageCache.clear(); assetHashes.clear(); retained = null; } // handig als je ooit wilt resetten
       
     };
   }
 
-  const DrawCanvas = { createRenderer };
+  const DrawCanvas = { createRenderer, decodeCompact, applyPatch, sceneKeys };
   if (typeof module !== 'undefined') module.exports = DrawCanvas;
   else global.DrawCanvas = DrawCanvas;
 })(this);
\ No newline at end of file
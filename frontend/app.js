@@ -6,12 +6,6 @@
   const canvas = document.getElementById("TheMainArea");
   const ctx = canvas.getContext("2d");
 
-  // Renderer beschikbaar maken voor de hele module
-  let renderer = null;
-  if (window.DrawCanvas && typeof window.DrawCanvas.createRenderer === 'function') {
-    renderer = window.DrawCanvas.createRenderer(canvas);
-  }
-
   const log = (t) => { if (logEl) logEl.textContent += t + "\n"; };
 
   // ====== WebSocket URL (prod = WSS) ======
@@ -21,6 +15,19 @@
     (location.hostname === 'localhost' || location.hostname === '127.0.0.1')
       ? 'ws://localhost:8765/'
       : `wss://${PROD_WS_HOST}/`; // trailing slash zodat upgrade op "/" plaatsvindt
+  // zelfde host via HTTP(S): /assets/<hash>/<naam> (transport "url")
+  const ASSET_BASE = WS_URL.replace(/^ws/, 'http').replace(/\/$/, '');
+
+  // sessie-id (localStorage): de backend koppelt de simulatie-state hieraan, ook na een reconnect
+  const SESSION_KEY = 'alignment.session';
+  const loadSession = () => { try { return localStorage.getItem(SESSION_KEY) || undefined; } catch { return undefined; } };
+  const saveSession = (id) => { try { localStorage.setItem(SESSION_KEY, id); } catch { /* private mode */ } };
+
+  // Renderer beschikbaar maken voor de hele module
+  let renderer = null;
+  if (window.DrawCanvas && typeof window.DrawCanvas.createRenderer === 'function') {
+    renderer = window.DrawCanvas.createRenderer(canvas, { assetBase: ASSET_BASE });
+  }
 
   // ====== WEBSOCKET AANMAKEN  met log-listeners
   const ws = new WebSocket(WS_URL);
@@ -48,6 +55,11 @@
   // ====== send helper (voor jouw bestaande 'messagetype'-berichten) ======
   function send(obj) {
     if (ws.readyState === WebSocket.OPEN) {
+      // meld welke PNG's we al hebben (filename → hash), dan stuurt de backend alleen nieuwe/gewijzigde
+      if (obj.messagetype && renderer) {
+        obj.assets = renderer.knownAssets();
+        if (!renderer.hasScene()) obj.full = true;   // diff-mode: nog niets om een patch op toe te passen
+      }
       ws.send(JSON.stringify(obj));
     } else {
       log("❌ Kan niet versturen: WS niet open");
@@ -56,7 +68,11 @@
 
   // Berichten van backend verwerken
   ws.addEventListener("message", async (ev) => {
-    if (typeof ev.data !== "string") return;
+    if (typeof ev.data !== "string") {
+      // binary frame = PNG-asset (transport "binary"); komt vóór de JSON die ernaar verwijst
+      if (renderer && ev.data instanceof ArrayBuffer) renderer.acceptAssetFrame(ev.data);
+      return;
+    }
     const msg = JSON.parse(ev.data);
 
     // demo: ping/pong laten zien
@@ -67,6 +83,13 @@
     
     if (msg.type === 'asset') {
       console.log('WS asset ontvangen:', msg.name, msg.mime, (msg.data_b64 || '').length, 'bytes(b64)');
+      return;
+    }
+
+    if (msg.type === 'hello') {         // handshake-bevestiging van de backend
+      if (msg.resumed === false && loadSession()) log('sessie was verlopen: begint opnieuw op dag 0');
+      if (msg.session) saveSession(msg.session);
+      return;
     }
 
     // jouw eerdere RUNSIMULATION-logica behouden
@@ -79,11 +102,47 @@
         const formatted = simDate.toLocaleDateString(undefined, { year: '2-digit', month: 'short', day: '2-digit' });
         h3.textContent = `Date: ${formatted} (days simulated: ${simDayNumber})`;
       }
+      // streaming (hello "stream"): tussentijdse updates zetten alleen de datum, het eindbericht heeft de samenvatting
+      if (msg.progress) return;
+      if (msg.session) saveSession(msg.session);   // na een branch (numbers [-3, dag]) speel je verder in de nieuwe sessie
+      if (msg.summary && msg.summary.updates) log(`▶️ Simulation → ${msg.summary.days} days in ${msg.summary.ms} ms (${msg.summary.updates} live updates)`);
       log(`▶️ Simulation → day counter = ${simDayNumber}`);
       return;
     }
 
+    // Monte Carlo-sweep: percentielen per KPI per instelling (geen scène)
+    if (msg.messagetype === "RUNSWEEP") {
+      const sw = msg.sweep || {};
+      const pct = sw.percentiles || [];
+      const at = (p) => pct.indexOf(p);
+      (sw.settings || []).forEach((s, i) => {
+        const cash = s.kpis.Cash || [];
+        log(`🎲 ${msg.texts[i]} (${sw.runs} runs x ${sw.days} d): Cash p50 ${cash[at(50)]}, p5 ${cash[at(5)]}, p95 ${cash[at(95)]}`);
+      });
+      return;
+    }
+
+    // hit-test: element onder de klik (texts = alle geraakte namen, bovenste eerst)
+    if (msg.messagetype === "HITTEST") {
+      log(msg.hit ? `🎯 ${msg.hit.name} (${msg.hit.kind})` : `🎯 niets op (${msg.numbers.join(', ')})`);
+      return;
+    }
+
+    // tijdreeks van de sessie: per veld min/max/gemiddelde per bucket van `bucket` dagen
+    if (msg.messagetype === "QUERYSERIES") {
+      const ser = msg.series || {};
+      Object.entries(ser.fields || {}).forEach(([name, f]) => {
+        const last = f.mean.length - 1;
+        log(`📈 ${name}: ${f.mean.length} points x ${ser.bucket} d, min ${Math.min(...f.min)}, max ${Math.max(...f.max)}, last ${f.mean[last]}`);
+      });
+      return;
+    }
+
+    // proces-views: klikken op het canvas vraagt de backend welk element eronder ligt
+    if (String(msg.messagetype).startsWith("SHOW")) currentView = HIT_VIEWS.includes(msg.messagetype) ? msg.messagetype : null;
+
     if (msg.messagetype === "SHOWSTRATEGY") {
+      if (renderer) renderer.retain(msg);   // scène bijhouden voor de volgende patch
       drawAssetOnCanvas('Strategy.png');
       return;
     }
@@ -184,11 +243,28 @@ async function drawAssetOnCanvas(name) {
   ws.addEventListener('open', () => {
     if (statusEl) statusEl.textContent = "WS open";
     log("🎉 Verbonden met backend");
+    // handshake: PNG's als content-hashed URL's → browser/CDN cachen ze, ook over sessies heen
+    // ('binary' = binary WS-frames, 'inline' = base64 in de JSON); scène in compact kolom-formaat
+    // diff: volgende views komen als patch op de vorige scène; dpr: backend kiest passende PNG-varianten
+    // stream: lange simulaties sturen tussentijds de dag + gewijzigde KPI's (h3 loopt live mee)
+    ws.send(JSON.stringify({ type: 'hello', transport: 'url', format: 'compact', diff: true, dpr: window.devicePixelRatio || 1,
+                              stream: true, session: loadSession(), assets: renderer ? renderer.knownAssets() : {} }));
     ws.send(JSON.stringify({ type: 'ping' }));   // demo, mag weg als je wilt
     setLogoFromWS();                             // logo via WS laten zetten
     drawAssetOnCanvas('Start.png');              // startbeeld één keer tekenen
   });
 
+  // ====== Klik op het canvas → HITTEST (de backend heeft een index over de scène) ======
+  const HIT_VIEWS = ["SHOWPROCESS", "SHOWCONTROL", "SHOWINFORMATION", "SHOWORGANIZATION"];
+  let currentView = null;
+  canvas.addEventListener("click", (e) => {
+    if (!currentView) return;
+    const r = canvas.getBoundingClientRect();   // CSS-pixels → canvas-pixels (scène-coördinaten)
+    const x = (e.clientX - r.left) * canvas.width / r.width;
+    const y = (e.clientY - r.top) * canvas.height / r.height;
+    send({ messagetype: "HITTEST", numbers: [Math.round(x), Math.round(y)], texts: [currentView] });
+  });
+
   // ====== Admin knoppen (indien aanwezig in DOM) ======
   function bindClick(id, days, label) {
     const el = document.getElementById(id);